@@ -0,0 +1,29 @@
+import os
+from typing import Any, Dict, Iterator, List, Tuple
+
+from serialization import encoded_size
+
+# Synchronous Lambda invokes accept at most 6 MB of payload
+MAX_CHUNK_BYTES = int(os.getenv('BATCH_MAX_CHUNK_BYTES', str(5 * 1024 * 1024)))
+MAX_CHUNK_RECORDS = int(os.getenv('BATCH_MAX_CHUNK_RECORDS', '500'))
+
+
+def chunk_records(records: List[Dict[str, Any]], max_records: int = MAX_CHUNK_RECORDS,
+                  max_bytes: int = MAX_CHUNK_BYTES) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """Yield (offset, chunk) pairs that fit a single Lambda payload.
+
+    A record larger than max_bytes on its own still gets a chunk to itself,
+    so the Lambda reports the error for that record.
+    """
+    chunk: List[Dict[str, Any]] = []
+    offset = 0
+    size = 0
+    for index, record in enumerate(records):
+        record_size = encoded_size(record) + 2
+        if chunk and (len(chunk) >= max_records or size + record_size > max_bytes):
+            yield offset, chunk
+            chunk, offset, size = [], index, 0
+        chunk.append(record)
+        size += record_size
+    if chunk:
+        yield offset, chunk
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from botocore.config import Config
+
+from metrics import DESERIALIZE_SECONDS, INVOKE_SECONDS
+from resilience import FunctionHealth, ResiliencePolicy
+from serialization import decode_result, dumps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = float(os.getenv('LAMBDA_TIMEOUT', '30'))
+DEFAULT_CONCURRENCY = int(os.getenv('LAMBDA_MAX_CONCURRENCY', '32'))
+MAX_WORKERS = int(os.getenv('LAMBDA_MAX_WORKERS', '64'))
+
+
+class DispatchTimeout(Exception):
+    pass
+
+
+class CircuitOpen(Exception):
+    """The function failed repeatedly and is not being called for now."""
+
+    def __init__(self, function_name: str, retry_after: float):
+        super().__init__(f"{function_name} is unavailable (circuit open), retry in {retry_after:.0f}s")
+        self.function_name = function_name
+        self.retry_after = retry_after
+
+
+def parse_overrides(value: Optional[str], cast=int) -> Dict[str, Any]:
+    """Parse "email-parser=16,lead-scorer=8" style settings."""
+    overrides = {}
+    for entry in (value or '').split(','):
+        if '=' not in entry:
+            continue
+        name, raw = entry.split('=', 1)
+        overrides[name.strip()] = cast(raw.strip())
+    return overrides
+
+
+def function_failed(response: Dict[str, Any], result: Any) -> bool:
+    """Whether the function ran but failed: an unhandled error or a 5xx body.
+
+    Lambda answers these with HTTP 200, so without this check the circuit
+    breaker would count a crashing function as healthy.
+    """
+    if response.get('FunctionError'):
+        return True
+    status = result.get('statusCode') if isinstance(result, dict) else None
+    return isinstance(status, int) and status >= 500
+
+
+def lambda_client_config(max_pool_connections: int = MAX_WORKERS,
+                         read_timeout: float = DEFAULT_TIMEOUT) -> Config:
+    # One pooled connection per executor thread so invokes never queue on
+    # urllib3, and a read timeout that matches the dispatcher deadline.
+    return Config(
+        max_pool_connections=max_pool_connections,
+        connect_timeout=2,
+        read_timeout=read_timeout,
+        tcp_keepalive=True,
+        retries={'max_attempts': 2, 'mode': 'standard'},
+    )
+
+
+class LambdaDispatcher:
+    """Runs synchronous boto3 invokes on a bounded thread pool.
+
+    Each function gets its own concurrency limit and deadline so a slow
+    function cannot starve the others or the event loop. The resilience
+    policy (resilience.py) tracks each function's latency to shorten those
+    deadlines, hedge slow calls and stop calling functions that keep failing.
+    """
+
+    def __init__(self, client, max_workers: int = MAX_WORKERS,
+                 default_limit: int = DEFAULT_CONCURRENCY,
+                 default_timeout: float = DEFAULT_TIMEOUT,
+                 limits: Optional[Dict[str, int]] = None,
+                 timeouts: Optional[Dict[str, float]] = None,
+                 policy: Optional[ResiliencePolicy] = None):
+        self.client = client
+        self.default_limit = default_limit
+        self.default_timeout = default_timeout
+        self.limits = limits or {}
+        self.timeouts = timeouts or {}
+        self.policy = policy or ResiliencePolicy()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='lambda-invoke')
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    @classmethod
+    def from_env(cls, client) -> 'LambdaDispatcher':
+        return cls(
+            client,
+            limits=parse_overrides(os.getenv('LAMBDA_CONCURRENCY')),
+            timeouts=parse_overrides(os.getenv('LAMBDA_TIMEOUTS'), cast=float),
+            policy=ResiliencePolicy.from_env(),
+        )
+
+    def _semaphore(self, function_name: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(function_name)
+        if semaphore is None:
+            limit = self.limits.get(function_name, self.default_limit)
+            semaphore = self._semaphores[function_name] = asyncio.Semaphore(limit)
+        return semaphore
+
+    def _invoke_sync(self, function_name: str, payload: bytes) -> Tuple[Dict[str, Any], bool, float, float]:
+        started = time.perf_counter()
+        response = self.client.invoke(
+            FunctionName=function_name,
+            InvocationType='RequestResponse',
+            Payload=payload
+        )
+        invoked = time.perf_counter()
+        result = decode_result(response['Payload'].read())
+        return result, function_failed(response, result), invoked - started, time.perf_counter() - invoked
+
+    async def _invoke(self, function_name: str, payload: bytes, label: str) -> Tuple[Dict[str, Any], bool]:
+        """The function's result, and whether it reports a failure of the function itself."""
+        async with self._semaphore(function_name):
+            loop = asyncio.get_running_loop()
+            result, failed, invoke_time, decode_time = await loop.run_in_executor(
+                self._executor, self._invoke_sync, function_name, payload)
+        # Observed on the event loop so the metrics need no locking
+        INVOKE_SECONDS.labels(label).observe(invoke_time)
+        DESERIALIZE_SECONDS.labels(label).observe(decode_time)
+        self.policy.function(function_name).latency.observe(invoke_time)
+        return result, failed
+
+    async def _hedged(self, health: FunctionHealth, function_name: str, payload: bytes, label: str,
+                      delay: float) -> Tuple[Dict[str, Any], bool]:
+        """Invoke, and if no answer came within delay, invoke again; the first success wins."""
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(self._invoke(function_name, payload, label))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            # No duplicate when the function is already at its concurrency
+            # limit: it would only queue behind the calls that are slow
+            if done or self._semaphore(function_name).locked() or not health.take_hedge():
+                return await primary
+            backup = asyncio.ensure_future(self._invoke(function_name, payload, label))
+            pending.add(backup)
+            error = failed = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is not None:
+                        error = error or future.exception()
+                    elif future.result()[1]:
+                        # A failed answer only counts if the other call fails too
+                        failed = failed or future.result()
+                    else:
+                        if future is backup:
+                            # The abandoned call took at least this long;
+                            # leaving it out would make the tail look faster
+                            health.latency.observe(time.perf_counter() - started)
+                            health.hedge_won()
+                        return future.result()
+            if failed is not None:
+                return failed
+            raise error
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def invoke(self, function_name: str, parameters: Dict[str, Any],
+                     label: Optional[str] = None, hedge: bool = False) -> Dict[str, Any]:
+        """Invoke function_name; hedge=True allows a duplicate call (idempotent tasks only)."""
+        health = self.policy.function(function_name)
+        if not health.breaker.allow():
+            raise CircuitOpen(function_name, health.breaker.retry_after())
+        health.begin()
+        timeout = health.timeout(self.timeouts.get(function_name, self.default_timeout))
+        payload = dumps(parameters)
+        label = label or function_name
+        delay = health.hedge_delay() if hedge else None
+        call = self._invoke(function_name, payload, label) if delay is None else \
+            self._hedged(health, function_name, payload, label, delay)
+        try:
+            result, failed = await asyncio.wait_for(call, timeout)
+        except asyncio.TimeoutError:
+            health.failure(timeout)
+            # The worker thread finishes on its own once botocore's read
+            # timeout fires; we only stop waiting for it here.
+            raise DispatchTimeout(f"{function_name} did not respond within {timeout:g}s")
+        except asyncio.CancelledError:
+            health.breaker.abandon()
+            raise
+        except Exception:
+            health.failure()
+            raise
+        # The function's own error response still goes back to the caller
+        if failed:
+            health.failure()
+        else:
+            health.success()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.policy.stats()
+        for function_name, function_stats in stats.items():
+            configured = self.timeouts.get(function_name, self.default_timeout)
+            function_stats['timeout_s'] = round(self.policy.function(function_name).timeout(configured), 3)
+        return stats
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,360 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import boto3
+
+import task_ids
+from serialization import dumps, loads
+from task_store import MemoryTaskStore, Record, TaskStore, parse_cursor
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 25  # BatchWriteItem limit
+MAX_ITEM_BYTES = 350 * 1024  # headroom under DynamoDB's 400 KB item limit
+# Listings query this index: one partition per creation day, sorted by id
+CREATED_INDEX = 'tasks-by-created'
+DAY_MS = 86400 * 1000
+MAX_KEY = (1 << 128) - 1
+# Other workers may still change tasks in these states
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+def created_key(task_id: str) -> Optional[int]:
+    return task_ids.id_value(task_id)
+
+
+def to_item(record: Record, ttl: float) -> Dict[str, Any]:
+    body = dumps(record)
+    if len(body) > MAX_ITEM_BYTES:
+        body = dumps(dict(record, result=None, result_truncated=True))
+    item = {
+        'taskId': {'S': record['task_id']},
+        'taskType': {'S': str(record.get('task_type'))},
+        'status': {'S': str(record.get('status'))},
+        'record': {'S': body.decode()},
+        'expiresAt': {'N': str(int(time.time() + ttl))},
+    }
+    key = created_key(record['task_id'])
+    # Ids minted elsewhere carry no creation time and stay out of the index
+    if key is not None:
+        item['createdDay'] = {'S': str((key >> task_ids.TIME_SHIFT) // DAY_MS)}
+        item['createdKey'] = {'S': task_ids.encode(key)}
+    return item
+
+
+def from_item(item: Dict[str, Any]) -> Record:
+    return loads(item['record']['S'])
+
+
+def create_table(client, table_name: str = 'automation-tasks') -> None:
+    """Create the tasks table on DynamoDB Local or moto, as the CDK stack defines it."""
+    client.create_table(
+        TableName=table_name,
+        BillingMode='PAY_PER_REQUEST',
+        AttributeDefinitions=[
+            {'AttributeName': 'taskId', 'AttributeType': 'S'},
+            {'AttributeName': 'createdDay', 'AttributeType': 'S'},
+            {'AttributeName': 'createdKey', 'AttributeType': 'S'},
+        ],
+        KeySchema=[{'AttributeName': 'taskId', 'KeyType': 'HASH'}],
+        GlobalSecondaryIndexes=[{
+            'IndexName': CREATED_INDEX,
+            'KeySchema': [
+                {'AttributeName': 'createdDay', 'KeyType': 'HASH'},
+                {'AttributeName': 'createdKey', 'KeyType': 'RANGE'},
+            ],
+            'Projection': {'ProjectionType': 'ALL'},
+        }],
+    )
+
+
+class DynamoTaskStore(TaskStore):
+    """Write-behind task store backed by the automation-tasks table.
+
+    Writes land in a MemoryTaskStore cache immediately and are buffered
+    (repeated updates to one task coalesce) until a background thread
+    flushes them with BatchWriteItem, at most flush_interval seconds later.
+    Tasks this process wrote are read from the cache, which always has
+    their latest state. Other workers' tasks are fetched with GetItem on a
+    cache miss and fetched again once refresh_interval has passed while
+    they are still queued or running. Listings query the table's
+    creation-time index, with this process's unflushed writes laid over
+    the result, so every worker lists the same tasks.
+
+    Reads from the table block on the network: the event loop calls
+    get_async() and list_async(), which run them on a thread.
+    """
+
+    def __init__(self, table_name: str = 'automation-tasks', client=None,
+                 cache: Optional[MemoryTaskStore] = None, flush_interval: float = 1.0,
+                 refresh_interval: float = 1.0, max_attempts: int = 5):
+        self.table_name = table_name
+        self.client = client or boto3.client('dynamodb')
+        self.cache = cache or MemoryTaskStore()
+        self.flush_interval = flush_interval
+        self.refresh_interval = refresh_interval
+        self.max_attempts = max_attempts
+        # Cached tasks read from the table, with when they were read; the
+        # rest of the cache was written by this process
+        self._fetched: 'OrderedDict[str, float]' = OrderedDict()
+        self._pending: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self.flushed = 0
+        self.failed_writes = 0
+        self._thread = threading.Thread(target=self._flush_loop, name='task-store-flush', daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_env(cls, cache: MemoryTaskStore) -> 'DynamoTaskStore':
+        client = boto3.client(
+            'dynamodb',
+            region_name=os.getenv('AWS_REGION', 'us-east-1'),
+            endpoint_url=os.getenv('DYNAMODB_ENDPOINT_URL') or None
+        )
+        return cls(
+            table_name=os.getenv('TASKS_TABLE', 'automation-tasks'),
+            client=client,
+            cache=cache,
+            flush_interval=float(os.getenv('TASK_STORE_FLUSH_INTERVAL', '1.0')),
+            refresh_interval=float(os.getenv('TASK_STORE_REFRESH_INTERVAL', '1.0')),
+        )
+
+    def _enqueue(self, record: Record):
+        item = to_item(record, self.cache.ttl)
+        with self._lock:
+            self._pending[record['task_id']] = item
+            self._pending.move_to_end(record['task_id'])
+            full = len(self._pending) >= BATCH_SIZE
+        if full:
+            self._wake.set()
+
+    def put(self, record: Record) -> None:
+        self._fetched.pop(record['task_id'], None)
+        self.cache.put(record)
+        self._enqueue(record)
+
+    def update(self, task_id: str, fields: Record) -> Optional[Record]:
+        record = self.cache.update(task_id, fields)
+        if record is None:
+            record = self.get(task_id)
+            if record is None:
+                return None
+            record = self.cache.update(task_id, fields)
+        self._fetched.pop(task_id, None)
+        self._enqueue(record)
+        return record
+
+    def _cached(self, task_id: str) -> Tuple[Optional[Record], bool]:
+        """The cached record, and whether it is current enough to serve."""
+        record = self.cache.get(task_id)
+        if record is None:
+            return None, False
+        fetched = self._fetched.get(task_id)
+        fresh = (fetched is None or record.get('status') not in ACTIVE_STATUSES
+                 or time.monotonic() - fetched < self.refresh_interval)
+        return record, fresh
+
+    def _read(self, task_id: str) -> Optional[Record]:
+        """Network only (no cache access), so it can run on a thread."""
+        with self._lock:
+            item = self._pending.get(task_id)
+        if item is None:
+            item = self.client.get_item(TableName=self.table_name, Key={'taskId': {'S': task_id}}).get('Item')
+        return from_item(item) if item is not None else None
+
+    def _remember(self, record: Record) -> Record:
+        task_id = record['task_id']
+        if task_id in self.cache and task_id not in self._fetched:
+            # Written here while the read was in flight: the cache is newer
+            return self.cache.get(task_id) or record
+        self.cache.put(record)
+        self._fetched[task_id] = time.monotonic()
+        self._fetched.move_to_end(task_id)
+        if len(self._fetched) > 2 * self.cache.max_tasks:
+            for stale in [stale for stale in self._fetched if stale not in self.cache]:
+                del self._fetched[stale]
+        return record
+
+    def get(self, task_id: str) -> Optional[Record]:
+        record, fresh = self._cached(task_id)
+        if fresh:
+            return record
+        fetched = self._read(task_id)
+        return self._remember(fetched) if fetched is not None else record
+
+    async def get_async(self, task_id: str) -> Optional[Record]:
+        record, fresh = self._cached(task_id)
+        if fresh:
+            return record
+        fetched = await asyncio.to_thread(self._read, task_id)
+        return self._remember(fetched) if fetched is not None else record
+
+    def delete(self, task_id: str) -> None:
+        self.cache.delete(task_id)
+        self._fetched.pop(task_id, None)
+        with self._lock:
+            self._pending.pop(task_id, None)
+        self.client.delete_item(TableName=self.table_name, Key={'taskId': {'S': task_id}})
+
+    def _query(self, limit: int, low: int, high: int, task_type: Optional[str],
+               status: Optional[str]) -> List[Record]:
+        """Up to limit stored records with keys in [low, high], newest first.
+
+        Walks the index one creation day at a time, back to the oldest day
+        that can hold unexpired tasks. Network only, like _read.
+        """
+        now = time.time()
+        oldest = max(low >> task_ids.TIME_SHIFT, int((now - self.cache.ttl) * 1000))
+        newest = min(high >> task_ids.TIME_SHIFT, int(now * 1000) + DAY_MS)
+        filters, names = ['expiresAt > :now'], {}
+        values = {':now': {'N': str(int(now))}, ':low': {'S': task_ids.encode(low)},
+                  ':high': {'S': task_ids.encode(high)}}
+        if task_type is not None:
+            filters.append('taskType = :type')
+            values[':type'] = {'S': task_type}
+        if status is not None:
+            filters.append('#status = :status')
+            names['#status'] = 'status'
+            values[':status'] = {'S': status}
+        records: List[Record] = []
+        for day in range(newest // DAY_MS, oldest // DAY_MS - 1, -1):
+            values[':day'] = {'S': str(day)}
+            request = {
+                'TableName': self.table_name,
+                'IndexName': CREATED_INDEX,
+                'KeyConditionExpression': 'createdDay = :day AND createdKey BETWEEN :low AND :high',
+                'FilterExpression': ' AND '.join(filters),
+                'ExpressionAttributeValues': values,
+                'ScanIndexForward': False,
+            }
+            if names:
+                request['ExpressionAttributeNames'] = names
+            while True:
+                response = self.client.query(Limit=limit - len(records), **request)
+                records.extend(from_item(item) for item in response.get('Items', []))
+                if len(records) >= limit:
+                    return records[:limit]
+                if 'LastEvaluatedKey' not in response:
+                    break
+                request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+            request.pop('ExclusiveStartKey', None)
+        return records
+
+    @staticmethod
+    def _bounds(cursor: Optional[str], since: Optional[float], until: Optional[float]) -> Tuple[int, int]:
+        high = MAX_KEY
+        before = parse_cursor(cursor)
+        if before is not None:
+            high = min(high, before - 1)
+        if until is not None:
+            high = min(high, task_ids.time_key(until) + (1 << task_ids.TIME_SHIFT) - 1)
+        low = task_ids.time_key(since) if since is not None else 0
+        return low, high
+
+    def _merge(self, stored: List[Record], limit: int, low: int, high: int, task_type: Optional[str],
+               status: Optional[str]) -> Tuple[List[Record], Optional[str]]:
+        """Lay this process's writes over a page read from the table."""
+        records = {record['task_id']: record for record in stored}
+        with self._lock:
+            pending = {task_id: item for task_id, item in self._pending.items()
+                       if low <= (created_key(task_id) or -1) <= high}
+        for task_id, item in pending.items():
+            if task_id not in records:
+                records[task_id] = from_item(item)
+        page = []
+        for task_id, record in records.items():
+            if task_id in self.cache and task_id not in self._fetched:
+                record = self.cache.get(task_id)
+            elif task_id not in pending:
+                record = self._remember(record)
+            if task_type is not None and record.get('task_type') != task_type:
+                continue
+            if status is not None and record.get('status') != status:
+                continue
+            page.append((created_key(task_id), record))
+        page.sort(key=lambda pair: pair[0], reverse=True)
+        if len(page) <= limit and len(stored) <= limit:
+            return [record for _, record in page], None
+        # More are stored below the last key returned
+        last_key = page[limit - 1][0] if len(page) >= limit else created_key(stored[-1]['task_id'])
+        return [record for _, record in page[:limit]], str(last_key)
+
+    def list(self, limit: int = 100, cursor: Optional[str] = None, task_type: Optional[str] = None,
+             status: Optional[str] = None, since: Optional[float] = None,
+             until: Optional[float] = None) -> Tuple[List[Record], Optional[str]]:
+        low, high = self._bounds(cursor, since, until)
+        stored = self._query(limit + 1, low, high, task_type, status)
+        return self._merge(stored, limit, low, high, task_type, status)
+
+    async def list_async(self, limit: int = 100, cursor: Optional[str] = None, task_type: Optional[str] = None,
+                         status: Optional[str] = None, since: Optional[float] = None,
+                         until: Optional[float] = None) -> Tuple[List[Record], Optional[str]]:
+        low, high = self._bounds(cursor, since, until)
+        stored = await asyncio.to_thread(self._query, limit + 1, low, high, task_type, status)
+        return self._merge(stored, limit, low, high, task_type, status)
+
+    def load(self, limit: Optional[int] = None):
+        """Warm the cache with the newest tasks in the table, e.g. after a restart."""
+        limit = limit or self.cache.max_tasks
+        loaded = 0
+        for record in reversed(self._query(limit, 0, MAX_KEY, None, None)):
+            self._remember(record)
+            loaded += 1
+        return loaded
+
+    def _write_batch(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        requests = [{'PutRequest': {'Item': item}} for item in items]
+        for attempt in range(self.max_attempts):
+            response = self.client.batch_write_item(RequestItems={self.table_name: requests})
+            requests = response.get('UnprocessedItems', {}).get(self.table_name, [])
+            if not requests:
+                return []
+            time.sleep(min(0.05 * 2 ** attempt, 1.0))
+        return [request['PutRequest']['Item'] for request in requests]
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, OrderedDict()
+        items = list(pending.values())
+        for start in range(0, len(items), BATCH_SIZE):
+            batch = items[start:start + BATCH_SIZE]
+            try:
+                leftover = self._write_batch(batch)
+            except Exception as e:
+                logger.error("Task store flush failed for %s tasks: %s", len(batch), e)
+                leftover = batch
+            self.flushed += len(batch) - len(leftover)
+            if leftover:
+                self.failed_writes += len(leftover)
+                with self._lock:
+                    # Requeue unless a newer version was written meanwhile
+                    for item in leftover:
+                        self._pending.setdefault(item['taskId']['S'], item)
+
+    def _flush_loop(self):
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        self._stopping = True
+        self._wake.set()
+        self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+        return dict(self.cache.stats(), backend='dynamodb', pending_writes=pending,
+                    flushed=self.flushed, failed_writes=self.failed_writes)
+
+    def __contains__(self, task_id: str) -> bool:
+        return self.get(task_id) is not None
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Set, Tuple
+
+from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+Record = Dict[str, Any]
+
+# (sequence, task_type, encoded SSE frame)
+Event = Tuple[int, Optional[str], bytes]
+
+# Results bigger than this are left out of events; clients fetch them with
+# GET /tasks/{task_id}, the same way oversized DynamoDB items are truncated
+MAX_RESULT_BYTES = int(os.getenv('EVENTS_MAX_RESULT_BYTES', str(16 * 1024)))
+
+
+class _Subscriber:
+    __slots__ = ('queue', 'task_type', 'dropped')
+
+    def __init__(self, max_pending: int, task_type: Optional[str]):
+        self.queue: 'asyncio.Queue[Optional[Event]]' = asyncio.Queue(max_pending + 1)
+        self.task_type = task_type
+        self.dropped = False
+
+
+def _frame(event_id: str, kind: str, data: bytes) -> bytes:
+    # Newlines in JSON are whitespace or escaped, so flattening them keeps
+    # a raw result spliced in from a Lambda payload on one SSE data line
+    if b'\n' in data:
+        data = data.replace(b'\r', b' ').replace(b'\n', b' ')
+    return f"id: {event_id}\nevent: {kind}\ndata: ".encode() + data + b"\n\n"
+
+
+class EventBroadcaster:
+    """Fans task lifecycle events out to server-sent-event subscribers.
+
+    Every event is encoded to its SSE frame once, at publish time, and the
+    same bytes are handed to each subscriber. A bounded ring of recent
+    frames lets a reconnecting client resume from its Last-Event-ID.
+    Subscribers that fall max_pending events behind are disconnected
+    rather than buffered; their EventSource reconnects and catches up from
+    the ring, or receives a "reset" event telling it to reload GET /tasks
+    when it has fallen out of it.
+    """
+
+    def __init__(self, history: int = 1000, max_pending: int = 256, heartbeat: float = 15.0):
+        self.history = history
+        self.max_pending = max_pending
+        self.heartbeat = heartbeat
+        # Event ids are "<epoch>-<sequence>"; a new epoch after a restart
+        # tells resuming clients that the ring they knew is gone
+        self.epoch = format(time.time_ns() // 1_000_000, 'x')
+        self._sequence = 0
+        self._ring: Deque[Event] = deque(maxlen=history)
+        self._subscribers: Set[_Subscriber] = set()
+        self.published = 0
+        self.dropped = 0
+
+    @classmethod
+    def from_env(cls) -> 'EventBroadcaster':
+        return cls(
+            history=int(os.getenv('EVENTS_HISTORY', '1000')),
+            max_pending=int(os.getenv('EVENTS_MAX_PENDING', '256')),
+            heartbeat=float(os.getenv('EVENTS_HEARTBEAT', '15')),
+        )
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    @property
+    def last_event_id(self) -> str:
+        return f"{self.epoch}-{self._sequence}"
+
+    def publish(self, task_id: str, task_type: Optional[str], fields: Record) -> None:
+        """Announce a task change; fields holds only what changed."""
+        delta = dict(fields, task_id=task_id, task_type=task_type)
+        data = dumps(delta)
+        if len(data) > MAX_RESULT_BYTES and delta.get('result') is not None:
+            delta['result'] = None
+            delta['result_truncated'] = True
+            data = dumps(delta)
+        self._sequence += 1
+        event = (self._sequence, task_type, _frame(self.last_event_id, 'task', data))
+        self._ring.append(event)
+        self.published += 1
+        for subscriber in list(self._subscribers):
+            if subscriber.task_type is not None and subscriber.task_type != task_type:
+                continue
+            if subscriber.queue.qsize() >= self.max_pending:
+                self._drop(subscriber)
+            else:
+                subscriber.queue.put_nowait(event)
+
+    def _drop(self, subscriber: _Subscriber):
+        subscriber.dropped = True
+        self._subscribers.discard(subscriber)
+        self.dropped += 1
+        # The spare slot guarantees the sentinel fits
+        subscriber.queue.put_nowait(None)
+
+    def _replay(self, last_event_id: Optional[str]) -> Optional[list]:
+        """Ring events after last_event_id, or None when they are no longer all there."""
+        epoch, _, sequence = (last_event_id or '').partition('-')
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        after = int(sequence)
+        if after > self._sequence:
+            return None
+        if self._ring and after < self._ring[0][0] - 1:
+            return None
+        return [event for event in self._ring if event[0] > after]
+
+    async def subscribe(self, last_event_id: Optional[str] = None,
+                        task_type: Optional[str] = None) -> AsyncIterator[bytes]:
+        subscriber = _Subscriber(self.max_pending, task_type)
+        # Registering and taking the replay happen in the same step, so
+        # every event lands in exactly one of the two
+        self._subscribers.add(subscriber)
+        missed = self._replay(last_event_id) if last_event_id else []
+        try:
+            yield f"retry: 1000\n: {self.subscribers} subscribers\n\n".encode()
+            if missed is None:
+                yield _frame(self.last_event_id, 'reset', b'{}')
+            else:
+                for _, event_type, frame in missed:
+                    if task_type is None or event_type == task_type:
+                        yield frame
+            queue = subscriber.queue
+            while True:
+                if queue.empty():
+                    try:
+                        pending = [await asyncio.wait_for(queue.get(), self.heartbeat)]
+                    except asyncio.TimeoutError:
+                        yield b": keepalive\n\n"
+                        continue
+                else:
+                    pending = []
+                # Everything that piled up goes out as one write
+                while not queue.empty():
+                    pending.append(queue.get_nowait())
+                frames = [event[2] for event in pending if event is not None]
+                if frames:
+                    yield b''.join(frames)
+                if pending[-1] is None:
+                    if subscriber.dropped:
+                        logger.warning("Dropped slow event subscriber (%s events behind)", self.max_pending)
+                    return
+        finally:
+            self._subscribers.discard(subscriber)
+
+    def close(self) -> None:
+        for subscriber in list(self._subscribers):
+            self._subscribers.discard(subscriber)
+            subscriber.queue.put_nowait(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'subscribers': self.subscribers,
+            'published': self.published,
+            'dropped_subscribers': self.dropped,
+            'last_event_id': self.last_event_id,
+            'history': len(self._ring),
+        }
@@ -0,0 +1,345 @@
+import csv
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+
+import task_ids
+from local_engine import load_handler
+from pipeline import TaskPipeline, task_record
+from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+Record = Dict[str, Any]
+
+# Rendered output is handed to the server in chunks of about this size, so
+# the first chunk leaves long before the last line is totalled
+CHUNK_BYTES = int(os.getenv('INVOICE_EXPORT_CHUNK_BYTES', str(64 * 1024)))
+
+# The request body is parsed whole before the export starts, so the line
+# items one export may hold are capped
+MAX_ITEMS = int(os.getenv('INVOICE_EXPORT_MAX_ITEMS', '100000'))
+
+
+def _money(cents: int) -> str:
+    return f"{cents // 100}.{cents % 100:02d}"
+
+
+class Renderer:
+    """Collects encoded output until the exporter takes it as one chunk.
+
+    Subclasses render one format from the same calls: begin, then per
+    invoice start, line... and finish (or error), and end.
+    """
+
+    media_type = 'application/octet-stream'
+    extension = 'bin'
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self.pending = 0
+        self.written = 0
+
+    def emit(self, data: bytes) -> None:
+        self._parts.append(data)
+        self.pending += len(data)
+        self.written += len(data)
+
+    def take(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts.clear()
+        self.pending = 0
+        return data
+
+    def begin(self) -> None:
+        pass
+
+    def start(self, index: int, head: Record) -> None:
+        pass
+
+    def line(self, head: Record, number: int, item: Record, quantity: Any, price: Any, cents: int) -> None:
+        raise NotImplementedError
+
+    def finish(self, head: Record, summary: Record) -> None:
+        pass
+
+    def error(self, index: int, head: Optional[Record], message: str) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+class CsvRenderer(Renderer):
+    """One row per line item, followed by subtotal, tax and total rows."""
+
+    media_type = 'text/csv; charset=utf-8'
+    extension = 'csv'
+    columns = ('invoice_index', 'invoice_number', 'record', 'line', 'description', 'quantity', 'price', 'amount')
+
+    def __init__(self):
+        super().__init__()
+        self._index = 0
+        self._writer = csv.writer(self)
+
+    def write(self, text: str) -> None:
+        # csv.writer's file interface
+        self.emit(text.encode())
+
+    def begin(self) -> None:
+        self._writer.writerow(self.columns)
+
+    def start(self, index: int, head: Record) -> None:
+        self._index = index
+
+    def line(self, head, number, item, quantity, price, cents):
+        self._writer.writerow((self._index, head['invoice_number'], 'item', number,
+                               item.get('description', 'No description'), quantity, price, _money(cents)))
+
+    def finish(self, head, summary):
+        number = head['invoice_number']
+        self._writer.writerows((
+            (self._index, number, 'subtotal', '', 'Subtotal', '', '', f"{summary['subtotal']:.2f}"),
+            (self._index, number, 'tax', '', f"Tax ({summary['tax_region']})", '', summary['tax_rate'],
+             f"{summary['tax_amount']:.2f}"),
+            (self._index, number, 'total', '', 'Total', '', '', f"{summary['total']:.2f}"),
+        ))
+
+    def error(self, index, head, message):
+        self._writer.writerow((index, head['invoice_number'] if head else '', 'error', '', message, '', '', ''))
+
+
+class NdjsonRenderer(Renderer):
+    """An "invoice" record, its "item" records and a "summary" per invoice.
+
+    Items have the fields of the invoice JSON's items, so a consumer can
+    rebuild the generate_invoice response from the stream.
+    """
+
+    media_type = 'application/x-ndjson'
+    extension = 'ndjson'
+
+    def start(self, index, head):
+        self.emit(dumps({'type': 'invoice', 'index': index, **head}) + b'\n')
+
+    def line(self, head, number, item, quantity, price, cents):
+        self.emit(dumps({
+            'type': 'item',
+            'invoice_number': head['invoice_number'],
+            'line': number,
+            'description': item.get('description', 'No description'),
+            'quantity': float(quantity),
+            'price': float(price),
+            'total': cents / 100,
+        }) + b'\n')
+
+    def finish(self, head, summary):
+        self.emit(dumps({'type': 'summary', 'invoice_number': head['invoice_number'], **summary}) + b'\n')
+
+    def error(self, index, head, message):
+        self.emit(dumps({'type': 'error', 'index': index,
+                         'invoice_number': head['invoice_number'] if head else None, 'error': message}) + b'\n')
+
+
+def _pdf_text(text: str) -> bytes:
+    data = text.replace('\r', ' ').replace('\n', ' ').encode('cp1252', 'replace')
+    return data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+class PdfRenderer(Renderer):
+    """A minimal PDF 1.4 writer: standard fonts, one content stream per page.
+
+    Each page is written out as soon as it fills up. The page tree, which
+    has to list every page, goes last and is found through the xref table,
+    so only the page object numbers and offsets are kept in memory.
+    Line items are set in Courier so the columns line up without font
+    metrics.
+    """
+
+    media_type = 'application/pdf'
+    extension = 'pdf'
+    # US Letter, 12pt leading from the top margin down to the bottom one
+    page_width, page_height = 612, 792
+    lines_per_page = 58
+    # Objects 1-5 are the catalog, the page tree and three fonts
+    fonts = {b'F1': b'Courier', b'F2': b'Helvetica-Bold', b'F3': b'Courier-Bold'}
+    row = '{:<44.44} {:>10.10} {:>12.12} {:>14.14}'
+
+    def __init__(self):
+        super().__init__()
+        self._offsets: Dict[int, int] = {}
+        self._next_object = 3 + len(self.fonts)
+        self._pages: List[int] = []
+        self._ops: List[bytes] = []
+        self._head: Optional[Record] = None
+
+    def _object(self, number: int, body: bytes) -> None:
+        self._offsets[number] = self.written
+        self.emit(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+
+    def _flush_page(self) -> None:
+        if not self._ops:
+            return
+        content = b'BT 12 TL 50 %d Td\n' % (self.page_height - 40) + b'\n'.join(self._ops) + b'\nET'
+        fonts = b' '.join(b'/%s %d 0 R' % (name, 3 + offset) for offset, name in enumerate(self.fonts))
+        contents, page = self._next_object, self._next_object + 1
+        self._next_object += 2
+        self._object(contents, b'<< /Length %d >>\nstream\n' % len(content) + content + b'\nendstream')
+        self._object(page, b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << %s >> >> '
+                           b'/Contents %d 0 R >>' % (self.page_width, self.page_height, fonts, contents))
+        self._pages.append(page)
+        self._ops.clear()
+
+    def _text(self, text: str, font: bytes = b'F1', size: int = 9) -> None:
+        if len(self._ops) >= self.lines_per_page:
+            self._flush_page()
+            if self._head is not None:
+                self._columns(f"Invoice {self._head['invoice_number']} (continued)")
+        self._ops.append(b'/%s %d Tf (%s) \'' % (font, size, _pdf_text(text)))
+
+    def _columns(self, title: str) -> None:
+        self._ops.append(b'/F2 11 Tf (%s) \'' % _pdf_text(title))
+        self._ops.append(b'/F3 9 Tf (%s) \'' % _pdf_text(self.row.format('Description', 'Quantity', 'Price', 'Amount')))
+
+    def begin(self):
+        self.emit(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self._object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        for offset, base_font in enumerate(self.fonts.values()):
+            self._object(3 + offset, b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>'
+                         % base_font)
+
+    def start(self, index, head):
+        # Every invoice starts on a new page
+        self._flush_page()
+        self._text(f"Invoice {head['invoice_number']}", b'F2', 14)
+        self._text('')
+        self._text(f"Date: {head['date']}    Due: {head['due_date']}")
+        client = head['client']
+        for text in (client['name'], client['email'], client['address']):
+            if text:
+                self._text(str(text))
+        self._text('')
+        self._columns('Items')
+        self._head = head
+
+    def line(self, head, number, item, quantity, price, cents):
+        self._text(self.row.format(str(item.get('description', 'No description')), str(quantity), str(price),
+                                   _money(cents)))
+
+    def finish(self, head, summary):
+        self._head = None
+        self._text('')
+        for label, amount in (('Subtotal', summary['subtotal']),
+                              (f"Tax {summary['tax_rate'] * 100:g}% ({summary['tax_region']})", summary['tax_amount']),
+                              ('Total', summary['total'])):
+            self._text(f"{label:>67.67} {amount:>14.2f}", b'F3' if label == 'Total' else b'F1')
+
+    def error(self, index, head, message):
+        if head is None:
+            self._flush_page()
+            self._text(f"Invoice #{index + 1}", b'F2', 14)
+        self._head = None
+        self._text('')
+        self._text(f"Could not be completed: {message}", b'F3')
+
+    def end(self):
+        self._flush_page()
+        if not self._pages:
+            self._text('No invoices')
+            self._flush_page()
+        kids = b' '.join(b'%d 0 R' % page for page in self._pages)
+        self._object(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self._pages)))
+        xref = self.written
+        count = self._next_object
+        entries = [b'0000000000 65535 f \n'] + [b'%010d 00000 n \n' % self._offsets[number]
+                                                for number in range(1, count)]
+        self.emit(b'xref\n0 %d\n' % count + b''.join(entries))
+        self.emit(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (count, xref))
+
+
+RENDERERS = {'csv': CsvRenderer, 'ndjson': NdjsonRenderer, 'pdf': PdfRenderer}
+
+
+def render_invoices(invoices: Iterable[Record], fmt: str, stats: Optional[Record] = None) -> Iterator[bytes]:
+    """Yield an export of invoices chunk by chunk.
+
+    Line items are totalled by the invoice Lambda's own engine, loaded
+    in-process, while the output is written; nothing but the current
+    chunk and running totals is held. An invalid invoice is reported in
+    place (an error row, record or page) and the export carries on.
+    """
+    handler = load_handler('invoice-generator')
+    engine = handler.InvoiceEngine()
+    renderer = RENDERERS[fmt]()
+    stats = {} if stats is None else stats
+    stats.update(invoices=0, lines=0, failed=0)
+    renderer.begin()
+    for index, invoice in enumerate(invoices):
+        head = None
+        try:
+            client_info, items = handler.validate_event(invoice)
+            head = engine.header(client_info)
+            renderer.start(index, head)
+            subtotal = 0
+            for number, (item, quantity, price, cents) in enumerate(engine.iter_lines(items), 1):
+                subtotal += cents
+                renderer.line(head, number, item, quantity, price, cents)
+                if renderer.pending >= CHUNK_BYTES:
+                    yield renderer.take()
+            renderer.finish(head, engine.summary(client_info, subtotal, len(items)))
+            stats['invoices'] += 1
+            stats['lines'] += len(items)
+        except (ValueError, TypeError, AttributeError, ArithmeticError) as e:
+            stats['failed'] += 1
+            renderer.error(index, head, f"Invoice generation failed: {str(e)}" if head else str(e))
+        if renderer.pending >= CHUNK_BYTES:
+            yield renderer.take()
+    renderer.end()
+    yield renderer.take()
+    stats['bytes'] = renderer.written
+
+
+def export_response(pipeline: TaskPipeline, invoices: List[Record], fmt: str) -> StreamingResponse:
+    """Stream invoices as CSV, NDJSON or PDF and record the export as a task.
+
+    The task keeps counts only, not the rendered document or the items.
+    """
+    renderer = RENDERERS.get(fmt)
+    if renderer is None:
+        raise HTTPException(status_code=400, detail=f"Unknown export format: {fmt} (expected one of {', '.join(RENDERERS)})")
+    items = sum(len(invoice.get('items') or ()) if isinstance(invoice, dict) else 0 for invoice in invoices)
+    if items > MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Export has {items} line items, more than {MAX_ITEMS}")
+    task_id = task_ids.new_task_id('invoice_export')
+    started = time.perf_counter()
+    pipeline.put(task_record(task_id, 'invoice_export', 'running'))
+    logger.info("Exporting %s invoices as %s: %s", len(invoices), fmt, task_id,
+                extra={'task_id': task_id, 'task_type': 'invoice_export'})
+    stats: Record = {}
+
+    async def stream():
+        finished = False
+        try:
+            # Rendering is CPU work, so chunks are produced in the thread pool
+            async for chunk in iterate_in_threadpool(render_invoices(invoices, fmt, stats)):
+                yield chunk
+            finished = True
+        finally:
+            pipeline.update(task_id, {
+                'status': 'completed' if finished else 'failed',
+                'result': dict(stats, format=fmt),
+                'error': None if finished else 'Export interrupted',
+            })
+            logger.info("Export %s: %s, %s", 'completed' if finished else 'interrupted', task_id, dict(stats),
+                        extra=dict(stats, task_id=task_id, task_type='invoice_export',
+                                   duration_ms=round((time.perf_counter() - started) * 1000, 3)))
+
+    return StreamingResponse(stream(), media_type=renderer.media_type, headers={
+        'X-Task-Id': task_id,
+        'Content-Disposition': f'attachment; filename="{task_id}.{renderer.extension}"',
+    })
@@ -0,0 +1,572 @@
+import logging
+import math
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from local_engine import load_handler
+from shared_store import SharedObjectClient, SharedObjectServer
+
+logger = logging.getLogger(__name__)
+
+Record = Dict[str, Any]
+
+
+def load_scorer():
+    """The lead-scorer's lead_rules and lead_columnar modules.
+
+    They are the Lambda's own modules, so the index validates and scores
+    leads exactly like the function does.
+    """
+    # Puts lambda-functions/lead-scorer on sys.path
+    load_handler('lead-scorer')
+    import lead_columnar
+    import lead_rules
+    return lead_rules, lead_columnar
+
+
+def lead_id_of(event: Record) -> Optional[str]:
+    """A lead_score event's lead id: "lead_id" next to lead_data or inside it."""
+    lead_id = event.get('lead_id')
+    if lead_id is None:
+        lead_id = (event.get('lead_data') or {}).get('lead_id')
+    return None if lead_id is None else str(lead_id)
+
+
+def scored_leads(events: List[Record], results: List[Record]) -> List[Tuple[str, Record]]:
+    """(lead_id, lead_data) of every successfully scored event that carries a lead id."""
+    leads = []
+    for event, result in zip(events, results):
+        lead_id = lead_id_of(event)
+        if lead_id is not None and (result or {}).get('success'):
+            leads.append((lead_id, event.get('lead_data') or {}))
+    return leads
+
+
+def changed_ranges(old_thresholds: tuple, old_points: tuple,
+                   new_thresholds: tuple, new_points: tuple) -> List[Tuple[float, float]]:
+    """Value ranges (low, high] in which a lead earns different points under the new tiers.
+
+    Between two consecutive thresholds of either version every value falls
+    in the same old tier and the same new tier, so one comparison per gap
+    decides it; unchanged tiers give no ranges at all.
+    """
+    ranges: List[Tuple[float, float]] = []
+    low = -math.inf
+    for high in sorted(set(old_thresholds) | set(new_thresholds)) + [math.inf]:
+        # Thresholds are strict lower bounds: (low, high] lies above the
+        # thresholds <= low
+        if old_points[bisect_right(old_thresholds, low)] != new_points[bisect_right(new_thresholds, low)]:
+            if ranges and ranges[-1][1] == low:
+                ranges[-1] = (ranges[-1][0], high)
+            else:
+                ranges.append((low, high))
+        low = high
+    return ranges
+
+
+class ValueIndex:
+    """Rows ordered by one numeric column, to find the leads with a value in (low, high].
+
+    Rows added or changed since the last sort wait in an unsorted tail that
+    every lookup also checks. Only a lookup re-sorts, once the tail holds
+    more than a sixteenth of the rows, so ingesting leads never pays for
+    the order. Entries left behind by changed values are filtered against
+    the live column.
+    """
+
+    def __init__(self, values: array):
+        self.values = values
+        self.sorted_values = array(values.typecode)
+        self.sorted_rows = array('i')
+        self.recent = array('i')
+
+    def add(self, row: int) -> None:
+        self.recent.append(row)
+
+    def rebuild(self) -> None:
+        values = self.values
+        np = load_scorer()[1].load_numpy()
+        if np is not None:
+            column = np.frombuffer(values, dtype=values.typecode)
+            order = np.argsort(column, kind='stable')
+            self.sorted_rows = array('i', order.astype(np.int32).tobytes())
+            self.sorted_values = array(values.typecode, column[order].tobytes())
+        else:
+            order = sorted(range(len(values)), key=values.__getitem__)
+            self.sorted_rows = array('i', order)
+            self.sorted_values = array(values.typecode, [values[row] for row in order])
+        self.recent = array('i')
+
+    def between(self, low: float, high: float) -> set:
+        if len(self.recent) > max(1024, len(self.values) // 16):
+            self.rebuild()
+        values = self.values
+        start = bisect_right(self.sorted_values, low)
+        end = bisect_right(self.sorted_values, high, start)
+        rows = {row for row in self.sorted_rows[start:end] if low < values[row] <= high}
+        rows.update(row for row in self.recent if low < values[row] <= high)
+        return rows
+
+
+class Buckets:
+    """Rows grouped by key (a score, or an industry and score), in the order they joined.
+
+    Lead scores are small integers, a sum of rule points, so reading the
+    score groups from the highest down yields the top K leads after
+    visiting about K rows. A row that moves is appended to its new group
+    and its old entry left behind: slot[row] holds the sequence number of
+    its live entry, stale entries are skipped when read and dropped once
+    they make up half a group.
+    """
+
+    def __init__(self):
+        self.groups: Dict[Any, Tuple[array, array]] = {}
+        self.stale: Dict[Any, int] = {}
+        self.slot = array('q')
+        self.sequence = 0
+
+    def add(self, row: int, key: Any) -> None:
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = (array('i'), array('q'))
+            self.stale[key] = 0
+        self.sequence += 1
+        group[0].append(row)
+        group[1].append(self.sequence)
+        self.slot[row] = self.sequence
+
+    def discard(self, row: int, key: Any) -> None:
+        self.slot[row] = 0
+        rows = self.groups[key][0]
+        self.stale[key] += 1
+        if self.stale[key] * 2 > len(rows):
+            self._compact(key)
+
+    def _compact(self, key: Any) -> None:
+        slot = self.slot
+        live = [(row, sequence) for row, sequence in zip(*self.groups[key]) if slot[row] == sequence]
+        if not live:
+            del self.groups[key], self.stale[key]
+            return
+        self.groups[key] = (array('i', [row for row, _ in live]), array('q', [sequence for _, sequence in live]))
+        self.stale[key] = 0
+
+    def members(self, key: Any) -> Iterator[int]:
+        group = self.groups.get(key)
+        if group is None:
+            return
+        slot = self.slot
+        for row, sequence in zip(*group):
+            if slot[row] == sequence:
+                yield row
+
+
+class LeadIndex:
+    """The latest score of every lead id, kept ready for top-K and count queries.
+
+    Each lead's normalised inputs are stored column by column next to its
+    score; score groups answer top-K (overall, per industry, per quality
+    band) and a (industry, score) histogram answers the counts. Quality
+    bands are read off the score at query time, so new band cutoffs cost
+    nothing.
+
+    When the scoring rules change, only leads whose points can differ are
+    rescored: those with a size or budget inside a range where the old and
+    new tiers disagree, those in an industry that joined or left the
+    high-value list, and those at an engagement level or decision-maker
+    flag whose points changed.
+    """
+
+    def __init__(self, rules=None):
+        self.lead_rules, self.lead_columnar = load_scorer()
+        self.rules = rules or self.lead_rules.get_rules()
+        self.rows: Dict[str, int] = {}
+        self.ids: List[str] = []
+        self.company_size = array('q')
+        self.budget = array('d')
+        self.industry = array('i')
+        self.engagement = array('b')
+        self.decision_maker = array('b')
+        self.score = array('i')
+        self.industries: List[str] = []
+        self.industry_codes: Dict[str, int] = {}
+        self.levels: List[str] = []
+        self.level_codes: Dict[str, int] = {}
+        # (column, code) -> rows that ever had that industry, engagement
+        # level or decision-maker flag, for rule changes that target one
+        self.groups: Dict[Tuple[str, int], array] = {}
+        self.sizes = ValueIndex(self.company_size)
+        self.budgets = ValueIndex(self.budget)
+        self.by_score = Buckets()
+        self.by_industry = Buckets()
+        self.counts: Dict[Tuple[int, int], int] = {}
+        self.score_counts: Dict[int, int] = {}
+        self.rescores = 0
+        # Queries and updates may come from several threads: the API's
+        # thread pool and the event loop, or the launcher's connections
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, lead_id: str) -> bool:
+        return lead_id in self.rows
+
+    def _code(self, name: str, codes: Dict[str, int], names: List[str]) -> int:
+        code = codes.get(name)
+        if code is None:
+            code = codes[name] = len(names)
+            names.append(name)
+        return code
+
+    def _join(self, column: str, code: int, row: int) -> None:
+        rows = self.groups.get((column, code))
+        if rows is None:
+            rows = self.groups[(column, code)] = array('i')
+        rows.append(row)
+
+    def group(self, column: str, code: Optional[int]) -> Iterator[int]:
+        """Rows whose industry, engagement or decision_maker column currently holds code."""
+        values = getattr(self, column)
+        return (row for row in self.groups.get((column, code), ()) if values[row] == code)
+
+    def _scores(self, rows: List[int]) -> List[int]:
+        """Scores of rows under the current rules, from the lead-scorer's own score_arrays."""
+        rules = self.rules
+        codes = {level: code for code, level in enumerate(rules.engagement_points)}
+        default = codes[rules.default_engagement]
+        levels = [codes.get(level, default) for level in self.levels]
+        high_value = [name in rules.high_value_industries for name in self.industries]
+        industry, engagement = self.industry, self.engagement
+        scores, _ = self.lead_columnar.score_arrays(
+            [self.company_size[row] for row in rows], [self.budget[row] for row in rows],
+            [high_value[industry[row]] for row in rows], [levels[engagement[row]] for row in rows],
+            [self.decision_maker[row] for row in rows], rules)
+        return [int(score) for score in scores]
+
+    def _count(self, code: int, score: int, delta: int) -> None:
+        for counts, key in ((self.counts, (code, score)), (self.score_counts, score)):
+            count = counts.get(key, 0) + delta
+            if count:
+                counts[key] = count
+            else:
+                del counts[key]
+
+    def _move(self, row: int, old_code: int, old_score: int) -> None:
+        code, score = self.industry[row], self.score[row]
+        if score != old_score:
+            self.by_score.discard(row, old_score)
+            self.by_score.add(row, score)
+        if (code, score) != (old_code, old_score):
+            self.by_industry.discard(row, (old_code, old_score))
+            self.by_industry.add(row, (code, score))
+            self._count(old_code, old_score, -1)
+            self._count(code, score, 1)
+
+    def upsert_many(self, leads: Iterable[Tuple[str, Record]]) -> int:
+        """Index (lead id, lead_data) pairs; returns how many were valid.
+
+        lead_data is validated and normalised by the lead-scorer's own
+        columnar code, so a lead the function rejects is not indexed.
+        """
+        ids, lead_data = [], []
+        for lead_id, data in leads:
+            ids.append(str(lead_id))
+            lead_data.append(data)
+        columns = self.lead_columnar.columns_from_leads(lead_data, self.rules)
+        errors = columns.errors
+        levels = columns.engagement_levels
+        indexed = 0
+        # row -> (industry code, score) before this batch; None for new rows
+        touched: Dict[int, Optional[Tuple[int, int]]] = {}
+        for position, lead_id in enumerate(ids):
+            if errors and position in errors:
+                continue
+            budget = columns.budget[position]
+            # NaN cannot be ordered; -inf earns no budget points either
+            row, before = self._put(lead_id, columns.company_size[position], budget if budget == budget else -math.inf,
+                                    columns.industries[position], levels[columns.engagement[position]],
+                                    columns.decision_maker[position])
+            touched.setdefault(row, before)
+            indexed += 1
+        # Scored together once every row holds its final values
+        rows = list(touched)
+        for row, score in zip(rows, self._scores(rows)):
+            self.score[row] = score
+            before = touched[row]
+            if before is None:
+                self.by_score.add(row, score)
+                self.by_industry.add(row, (self.industry[row], score))
+                self._count(self.industry[row], score, 1)
+            else:
+                self._move(row, *before)
+        return indexed
+
+    def upsert(self, lead_id: str, lead_data: Record) -> bool:
+        return self.upsert_many([(lead_id, lead_data)]) == 1
+
+    def _put(self, lead_id: str, company_size: int, budget: float, industry: str, level: str,
+             decision_maker: int) -> Tuple[int, Optional[Tuple[int, int]]]:
+        """Store one lead's columns; returns its row and its (industry, score) if it had one."""
+        code = self._code(industry, self.industry_codes, self.industries)
+        level_code = self._code(level, self.level_codes, self.levels)
+        row = self.rows.get(lead_id)
+        if row is None:
+            row = self.rows[lead_id] = len(self.ids)
+            self.ids.append(lead_id)
+            self.company_size.append(company_size)
+            self.budget.append(budget)
+            self.industry.append(code)
+            self.engagement.append(level_code)
+            self.decision_maker.append(decision_maker)
+            self.score.append(0)
+            self.by_score.slot.append(0)
+            self.by_industry.slot.append(0)
+            self.sizes.add(row)
+            self.budgets.add(row)
+            self._join('industry', code, row)
+            self._join('engagement', level_code, row)
+            self._join('decision_maker', decision_maker, row)
+            return row, None
+
+        before = self.industry[row], self.score[row]
+        if company_size != self.company_size[row]:
+            self.company_size[row] = company_size
+            self.sizes.add(row)
+        if budget != self.budget[row]:
+            self.budget[row] = budget
+            self.budgets.add(row)
+        if code != before[0]:
+            self.industry[row] = code
+            self._join('industry', code, row)
+        if level_code != self.engagement[row]:
+            self.engagement[row] = level_code
+            self._join('engagement', level_code, row)
+        if decision_maker != self.decision_maker[row]:
+            self.decision_maker[row] = decision_maker
+            self._join('decision_maker', decision_maker, row)
+        return row, before
+
+    @property
+    def rules_version(self) -> Any:
+        return self.rules.version
+
+    def observe(self, events: List[Record], results: List[Record]) -> None:
+        """TaskPipeline observer: index every successfully scored event that carries a lead id."""
+        leads = scored_leads(events, results)
+        if leads:
+            self.index(leads)
+
+    def index(self, leads: List[Tuple[str, Record]]) -> int:
+        """Upsert (lead_id, lead_data) pairs under the current rules."""
+        with self._lock:
+            self.refresh()
+            return self.upsert_many(leads)
+
+    def refresh(self, force: bool = False) -> Optional[Record]:
+        """Pick up a new version of the rules file and rescore; None if it did not change.
+
+        get_rules() re-checks the file every LEAD_SCORING_RULES_REFRESH
+        seconds; force reads it now.
+        """
+        with self._lock:
+            lead_rules = self.lead_rules
+            rules = lead_rules.load_rules(lead_rules.RULES_PATH) if force else lead_rules.get_rules()
+            if rules is self.rules:
+                return None
+            return self.rescore(rules)
+
+    def rescore(self, rules) -> Record:
+        started = time.perf_counter()
+        old = self.rules
+        candidates = set()
+        for values, name in ((self.sizes, 'size'), (self.budgets, 'budget')):
+            for low, high in changed_ranges(getattr(old, f'{name}_thresholds'), getattr(old, f'{name}_points'),
+                                            getattr(rules, f'{name}_thresholds'), getattr(rules, f'{name}_points')):
+                candidates.update(values.between(low, high))
+        if old.industry_points != rules.industry_points:
+            industries = old.high_value_industries | rules.high_value_industries
+        else:
+            industries = old.high_value_industries ^ rules.high_value_industries
+        for name in industries:
+            candidates.update(self.group('industry', self.industry_codes.get(name)))
+
+        def level_points(compiled, level):
+            points = compiled.engagement_points.get(level)
+            return compiled.engagement_points[compiled.default_engagement] if points is None else points
+
+        for code, level in enumerate(self.levels):
+            if level_points(old, level) != level_points(rules, level):
+                candidates.update(self.group('engagement', code))
+        if old.decision_maker_points != rules.decision_maker_points:
+            candidates.update(self.group('decision_maker', 1))
+
+        self.rules = rules
+        changed = 0
+        rows = list(candidates)
+        for row, score in zip(rows, self._scores(rows)):
+            old_score = self.score[row]
+            if score != old_score:
+                self.score[row] = score
+                self._move(row, self.industry[row], old_score)
+                changed += 1
+        self.rescores += 1
+        elapsed = time.perf_counter() - started
+        logger.info("Lead index rescored for rules %s -> %s: %s of %s checked leads changed in %.1fms",
+                    old.version, rules.version, changed, len(candidates), elapsed * 1000)
+        return {
+            'previous_version': old.version,
+            'rules_version': rules.version,
+            'leads': len(self.ids),
+            'checked': len(candidates),
+            'changed': changed,
+            'elapsed_ms': round(elapsed * 1000, 3),
+        }
+
+    def band_range(self, quality: str) -> Tuple[float, float]:
+        """Scores [low, high) that fall in a quality band."""
+        rules = self.rules
+        if quality not in rules.quality_bands:
+            raise ValueError(f"Unknown quality band: {quality}")
+        band = rules.quality_bands.index(quality)
+        cutoffs = rules.quality_cutoffs
+        return (cutoffs[band - 1] if band else -math.inf), (cutoffs[band] if band < len(cutoffs) else math.inf)
+
+    def top(self, k: int = 100, industry: Optional[str] = None, quality: Optional[str] = None) -> List[Record]:
+        """The k highest-scoring leads, optionally in one industry and/or quality band.
+
+        Ties keep the order in which leads reached their score.
+        """
+        with self._lock:
+            low, high = self.band_range(quality) if quality else (-math.inf, math.inf)
+            if industry is None:
+                buckets = self.by_score
+                keys = [(score, score) for score in self.score_counts]
+            else:
+                code = self.industry_codes.get(industry.lower().strip())
+                if code is None:
+                    return []
+                buckets = self.by_industry
+                keys = [(key[1], key) for key in self.counts if key[0] == code]
+            rows: List[int] = []
+            for score, key in sorted(keys, reverse=True):
+                if not low <= score < high:
+                    continue
+                for row in buckets.members(key):
+                    rows.append(row)
+                    if len(rows) >= k:
+                        return [self.lead(row) for row in rows]
+            return [self.lead(row) for row in rows]
+
+    def lead(self, row: int) -> Record:
+        score = self.score[row]
+        budget = self.budget[row]
+        return {
+            'lead_id': self.ids[row],
+            'score': score,
+            'quality': self.rules.quality(score),
+            'lead_data': {
+                'company_size': self.company_size[row],
+                'industry': self.industries[self.industry[row]],
+                'budget': budget if budget > -math.inf else None,
+                'engagement_level': self.levels[self.engagement[row]],
+                'is_decision_maker': bool(self.decision_maker[row]),
+            },
+        }
+
+    def get(self, lead_id: str) -> Optional[Record]:
+        with self._lock:
+            row = self.rows.get(lead_id)
+            return None if row is None else self.lead(row)
+
+    def stats(self, industry: Optional[str] = None) -> Record:
+        """Lead counts per quality band, overall and per industry."""
+        with self._lock:
+            rules = self.rules
+            bands = rules.quality_bands
+            by_quality = dict.fromkeys(bands, 0)
+            by_industry: Dict[str, Dict[str, int]] = {}
+            wanted = None if industry is None else self.industry_codes.get(industry.lower().strip(), -1)
+            band_of: Dict[int, str] = {}
+            for (code, score), count in self.counts.items():
+                if wanted is not None and code != wanted:
+                    continue
+                band = band_of.get(score)
+                if band is None:
+                    band = band_of[score] = rules.quality(score)
+                by_quality[band] += count
+                name = self.industries[code]
+                if name not in by_industry:
+                    by_industry[name] = dict.fromkeys(bands, 0)
+                by_industry[name][band] += count
+            return {
+                'leads': sum(by_quality.values()),
+                'rules_version': rules.version,
+                'by_quality': by_quality,
+                'by_industry': by_industry,
+            }
+
+
+class LeadIndexServer(SharedObjectServer):
+    """Hosts the LeadIndex in the serve.py launcher, so every worker indexes
+    into and answers /leads from the same leads."""
+
+    kind = 'lead index'
+    methods = frozenset(('index', 'refresh', 'top', 'get', 'stats', 'rules_version', '__len__'))
+
+
+class SharedLeadIndex(SharedObjectClient):
+    """Client side of LeadIndexServer, with the LeadIndex methods main.py uses.
+
+    observe() picks the scored leads out of the task results in the worker
+    and sends only those.
+    """
+
+    kind = 'lead index'
+
+    @classmethod
+    def from_env(cls) -> 'SharedLeadIndex':
+        authkey = os.getenv('LEAD_INDEX_AUTHKEY')
+        if not authkey:
+            raise ValueError("LEAD_INDEX_ADDRESS needs LEAD_INDEX_AUTHKEY (set by serve.py)")
+        return cls(os.environ['LEAD_INDEX_ADDRESS'], bytes.fromhex(authkey))
+
+    def __len__(self) -> int:
+        return self._call('__len__')
+
+    @property
+    def rules_version(self) -> Any:
+        return self._call('rules_version')
+
+    def observe(self, events: List[Record], results: List[Record]) -> None:
+        leads = scored_leads(events, results)
+        if leads:
+            self.index(leads)
+
+    def index(self, leads: List[Tuple[str, Record]]) -> int:
+        return self._call('index', leads)
+
+    def refresh(self, force: bool = False) -> Optional[Record]:
+        return self._call('refresh', force)
+
+    def top(self, k: int = 100, industry: Optional[str] = None, quality: Optional[str] = None) -> List[Record]:
+        return self._call('top', k, industry, quality)
+
+    def get(self, lead_id: str) -> Optional[Record]:
+        return self._call('get', lead_id)
+
+    def stats(self, industry: Optional[str] = None) -> Record:
+        return self._call('stats', industry)
+
+
+def lead_index_from_env():
+    """LEAD_INDEX=false: None; under serve.py: the launcher's index; otherwise one per process."""
+    if os.getenv('LEAD_INDEX', 'true').lower() != 'true':
+        return None
+    if os.getenv('LEAD_INDEX_ADDRESS'):
+        return SharedLeadIndex.from_env()
+    return LeadIndex()
@@ -0,0 +1,206 @@
+import asyncio
+import importlib.util
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional
+
+from dispatcher import DispatchTimeout, parse_overrides
+from metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+LAMBDA_DIR = os.getenv('LAMBDA_FUNCTIONS_DIR') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lambda-functions')
+
+ROUTES = ('local', 'lambda', 'auto')
+# auto routing sends payloads up to this size to the local engine and
+# larger ones (multi-MB emails, big batches) to Lambda
+AUTO_LOCAL_MAX_BYTES = int(os.getenv('LOCAL_ENGINE_AUTO_MAX_BYTES', str(256 * 1024)))
+
+LOCAL_SECONDS = Histogram('task_local_seconds', 'In-process handler execution, pool wait included', ('task_type',))
+
+# directory -> loaded lambda_function module; one cache per process
+_handlers: Dict[str, Any] = {}
+
+
+class LocalContext:
+    """Just enough of the Lambda context object for the handlers."""
+
+    def __init__(self, function_name: str, timeout: float = 30.0):
+        self.aws_request_id = f"local-{uuid.uuid4()}"
+        self.function_name = function_name
+        self.function_version = '$LOCAL'
+        self.memory_limit_in_mb = 0
+        self.log_group_name = self.log_stream_name = 'local'
+        self._deadline = time.monotonic() + timeout
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+def load_handler(directory: str):
+    """Import lambda-functions/<directory>/lambda_function.py under a unique name."""
+    module = _handlers.get(directory)
+    if module is not None:
+        return module
+    path = os.path.join(LAMBDA_DIR, directory)
+    if path not in sys.path:
+        # Handlers import their sibling modules (email_scanner, lead_rules...)
+        sys.path.insert(0, path)
+    name = f"local_{directory.replace('-', '_')}_lambda_function"
+    spec = importlib.util.spec_from_file_location(name, os.path.join(path, 'lambda_function.py'))
+    module = importlib.util.module_from_spec(spec)
+    # The handlers set the root logger to INFO for CloudWatch; keep the
+    # backend's own level
+    root = logging.getLogger()
+    level = root.level
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        root.setLevel(level)
+    sys.modules[name] = module
+    _handlers[directory] = module
+    return module
+
+
+def run_handler(directory: str, event: Dict[str, Any], timeout: float = 30.0) -> Dict[str, Any]:
+    """Executor entry point; module level so process pools can pickle it."""
+    return load_handler(directory).lambda_handler(event, LocalContext(directory, timeout))
+
+
+def _warm(directories: Iterable[str]) -> int:
+    for directory in directories:
+        load_handler(directory)
+    return os.getpid()
+
+
+def payload_exceeds(value: Any, limit: int) -> bool:
+    """Cheap size estimate of a JSON payload that stops as soon as it passes limit."""
+    remaining = limit
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            remaining -= len(item) + 2
+        elif isinstance(item, dict):
+            remaining -= 2 * len(item) + 2
+            for key, child in item.items():
+                remaining -= len(key) + 4
+                stack.append(child)
+        elif isinstance(item, (list, tuple)):
+            remaining -= len(item) + 2
+            stack.extend(item)
+        else:
+            remaining -= 8
+        if remaining < 0:
+            return True
+    return False
+
+
+class LocalEngine:
+    """Runs the Lambda handlers in-process on a pool sized to the host.
+
+    Process pools (the default) give CPU-bound handlers real parallelism;
+    thread pools avoid the pickling cost for tiny payloads. Each worker
+    imports the handlers once and keeps them warm, so there is no cold
+    start and no network round trip.
+    """
+
+    def __init__(self, mode: str = 'process', workers: Optional[int] = None, timeout: float = 30.0,
+                 start_method: str = 'spawn'):
+        if mode not in ('process', 'thread'):
+            raise ValueError(f"Unknown LOCAL_ENGINE_MODE: {mode}")
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.start_method = start_method
+        self._executor: Optional[Executor] = None
+
+    @classmethod
+    def from_env(cls) -> 'LocalEngine':
+        workers = os.getenv('LOCAL_ENGINE_WORKERS')
+        return cls(
+            mode=os.getenv('LOCAL_ENGINE_MODE', 'process'),
+            workers=int(workers) if workers else None,
+            timeout=float(os.getenv('LAMBDA_TIMEOUT', '30')),
+            start_method=os.getenv('LOCAL_ENGINE_START_METHOD', 'spawn'),
+        )
+
+    def start(self, directories: Iterable[str] = ()) -> None:
+        if self._executor is not None:
+            return
+        directories = list(directories)
+        if self.mode == 'thread':
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='local-engine')
+            _warm(directories)
+        else:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=_warm,
+                initargs=(directories,),
+            )
+        logger.info("Local engine started: %s %s workers", self.workers, self.mode)
+
+    async def invoke(self, directory: str, event: Dict[str, Any], label: Optional[str] = None) -> Dict[str, Any]:
+        if self._executor is None:
+            self.start()
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, run_handler, directory, event, self.timeout)
+        try:
+            # Same deadline and error as the Lambda path; a handler already
+            # running keeps its worker until it returns, but the request and
+            # the queued ones behind it are not held hostage
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise DispatchTimeout(f"{label or directory} did not finish locally within {self.timeout:g}s") from None
+        finally:
+            LOCAL_SECONDS.labels(label or directory).observe(time.perf_counter() - started)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class TaskRouter:
+    """Chooses local, lambda or auto execution per task type.
+
+    TASK_ROUTING="email_parse=local,lead_score=auto" overrides
+    TASK_ROUTING_DEFAULT. Without a Lambda client, "auto" always resolves
+    to local and "lambda" falls back to the mock responses.
+    """
+
+    def __init__(self, default: str = 'lambda', routes: Optional[Dict[str, str]] = None,
+                 auto_max_bytes: int = AUTO_LOCAL_MAX_BYTES):
+        for route in [default, *(routes or {}).values()]:
+            if route not in ROUTES:
+                raise ValueError(f"Unknown task route: {route} (expected one of {', '.join(ROUTES)})")
+        self.default = default
+        self.routes = routes or {}
+        self.auto_max_bytes = auto_max_bytes
+
+    @classmethod
+    def from_env(cls) -> 'TaskRouter':
+        return cls(
+            default=os.getenv('TASK_ROUTING_DEFAULT', 'lambda'),
+            routes=parse_overrides(os.getenv('TASK_ROUTING'), cast=str),
+        )
+
+    @property
+    def uses_local(self) -> bool:
+        return self.default != 'lambda' or any(route != 'lambda' for route in self.routes.values())
+
+    def route(self, task_type: str, parameters: Any, has_lambda: bool) -> str:
+        route = self.routes.get(task_type, self.default)
+        if route == 'auto':
+            if not has_lambda:
+                return 'local'
+            return 'lambda' if payload_exceeds(parameters, self.auto_max_bytes) else 'local'
+        return route
@@ -0,0 +1,194 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import zlib
+from typing import Dict, Optional
+
+from dispatcher import parse_overrides
+from serialization import dumps
+
+# Attributes every LogRecord has; anything else on a record came from
+# extra= (uvicorn adds an ANSI-coloured copy of its messages)
+RECORD_FIELDS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {
+    'message', 'asctime', 'color_message'}
+# uvicorn gives these their own synchronous stream handlers
+UVICORN_LOGGERS = ('uvicorn', 'uvicorn.error', 'uvicorn.access')
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and every extra= field.
+
+    Request paths pass task_id, task_type and duration_ms as extra fields,
+    so log pipelines can filter and aggregate on them without parsing the
+    message.
+    """
+
+    _second = -1
+    _stamp = ''
+
+    def format(self, record: logging.LogRecord) -> str:
+        second = int(record.created)
+        if second != self._second:
+            self._second, self._stamp = second, time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+        entry = {
+            'time': self._stamp + '.%03dZ' % record.msecs,
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return dumps(entry).decode()
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of the records at each level; WARNING and above are always kept.
+
+    Records with a task_id are kept or dropped by a hash of the id, so a
+    task that is sampled keeps all of its lines.
+    """
+
+    def __init__(self, rates: Dict[int, float]):
+        super().__init__()
+        self.rates = {level: rate for level, rate in rates.items() if level < logging.WARNING and rate < 1}
+        self.dropped = 0
+
+    @classmethod
+    def parse(cls, value: Optional[str]) -> 'SamplingFilter':
+        """From "info=0.1,debug=0.01" style settings."""
+        rates = {}
+        for name, rate in parse_overrides(value, cast=float).items():
+            level = logging.getLevelName(name.upper())
+            if not isinstance(level, int):
+                raise ValueError(f"Unknown log level in LOG_SAMPLE_RATES: {name}")
+            rates[level] = rate
+        return cls(rates)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(record.levelno)
+        if rate is None:
+            return True
+        task_id = getattr(record, 'task_id', None)
+        if task_id:
+            keep = zlib.crc32(str(task_id).encode()) < rate * 0x100000000
+        else:
+            keep = random.random() < rate
+        if not keep:
+            self.dropped += 1
+        return keep
+
+
+class BackgroundHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener thread unformatted.
+
+    Messages are %-formatted and written by the listener, so a log call
+    costs the request thread a record and a queue put. Log arguments are
+    therefore formatted after the call returns: pass values, not objects
+    that are changed afterwards. When the listener falls behind by
+    max_pending records, new records are counted and dropped instead of
+    blocking the event loop.
+    """
+
+    def __init__(self, max_pending: int = 10000):
+        super().__init__(queue.SimpleQueue())
+        self.max_pending = max_pending
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.queue.qsize() >= self.max_pending:
+            self.dropped += 1
+            return
+        self.queue.put_nowait(record)
+
+
+_handler: Optional[BackgroundHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_sampler: Optional[SamplingFilter] = None
+
+
+def configure(level: str = 'INFO', fmt: str = 'json', sampler: Optional[SamplingFilter] = None,
+              max_pending: int = 10000, stream=None) -> BackgroundHandler:
+    """Send all logging through one background thread that formats and writes it.
+
+    Replaces the root logger's handlers (and uvicorn's) with a
+    BackgroundHandler; the listener writes to stream (stderr) as JSON
+    lines, or in logging's basic text format with fmt='text'.
+    """
+    global _handler, _listener, _sampler
+    shutdown()
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(logging.BASIC_FORMAT))
+    _handler = BackgroundHandler(max_pending)
+    _sampler = sampler
+    if sampler is not None and sampler.rates:
+        _handler.addFilter(sampler)
+    _listener = logging.handlers.QueueListener(_handler.queue, output)
+    _listener.start()
+
+    # Neither output format shows the caller, thread or process, so
+    # records skip looking them up (the logging HOWTO's optimisations)
+    logging._srcfile = None
+    logging.logThreads = logging.logProcesses = logging.logMultiprocessing = False
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    root.setLevel(level.upper())
+    route_uvicorn()
+    return _handler
+
+
+def configure_from_env(level: Optional[str] = None) -> BackgroundHandler:
+    return configure(
+        level=level or os.getenv('LOG_LEVEL', 'INFO'),
+        fmt=os.getenv('LOG_FORMAT', 'json').lower(),
+        sampler=SamplingFilter.parse(os.getenv('LOG_SAMPLE_RATES')),
+        max_pending=int(os.getenv('LOG_QUEUE_SIZE', '10000')),
+    )
+
+
+def route_uvicorn() -> None:
+    """Let uvicorn's error and access logs propagate to the background handler.
+
+    uvicorn configures its loggers when its Config is created, which can be
+    after this module configured logging, so the lifespan calls this again.
+    """
+    for name in UVICORN_LOGGERS:
+        uvicorn_logger = logging.getLogger(name)
+        for handler in uvicorn_logger.handlers[:]:
+            uvicorn_logger.removeHandler(handler)
+        uvicorn_logger.propagate = True
+
+
+def shutdown() -> None:
+    """Write out every queued record and stop the listener thread."""
+    global _handler, _listener
+    if _listener is not None:
+        _listener.stop()
+        logging.getLogger().removeHandler(_handler)
+        _handler = _listener = None
+
+
+def stats() -> Dict[str, int]:
+    return {
+        'pending': _handler.queue.qsize() if _handler else 0,
+        'dropped': _handler.dropped if _handler else 0,
+        'sampled_out': _sampler.dropped if _sampler else 0,
+    }
+
+
+atexit.register(shutdown)
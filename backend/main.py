@@ -1,20 +1,125 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import boto3
-import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 import asyncio
-from datetime import datetime, timezone
+from datetime import datetime
 import logging
 import os
-from mock_responses import mock_email_parse, mock_invoice_generate, mock_lead_score
+import time
+from contextlib import asynccontextmanager
+from dispatcher import LambdaDispatcher, lambda_client_config
+from task_store import create_task_store, parse_cursor
+from task_registry import default_registry
+from pipeline import TaskPipeline, task_record
+from local_engine import LocalEngine, TaskRouter
+from events import EventBroadcaster
+from invoice_export import export_response
+from lead_index import LeadIndex, SharedLeadIndex, lead_index_from_env
+from serialization import FastJSONResponse
+from result_cache import ResultCache
+import task_ids
+import logs
+import metrics
+from metrics import MetricsMiddleware
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Log records are formatted and written by a background thread, as JSON
+# lines by default (LOG_FORMAT, LOG_SAMPLE_RATES, see logs.py)
+logs.configure_from_env()
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Automation Dashboard API")
+# AWS Lambda client with error handling (fallback to mock for demo)
+if os.getenv('USE_MOCK_RESPONSES', 'false').lower() == 'true':
+    logger.info("USE_MOCK_RESPONSES is set, using mock responses")
+    lambda_client = None
+else:
+    try:
+        lambda_client = boto3.client(
+            'lambda',
+            region_name=os.getenv('AWS_REGION', 'us-east-1'),
+            config=lambda_client_config()
+        )
+    except Exception as e:
+        logger.warning("AWS Lambda client not available, using mock responses: %s", e)
+        lambda_client = None
+
+dispatcher = LambdaDispatcher.from_env(lambda_client) if lambda_client else None
+
+# Task types (built-ins plus TASK_PLUGINS modules, see task_registry.py)
+registry = default_registry()
+
+# Content-addressed cache of task results (see result_cache.py)
+result_cache = ResultCache.from_env(registry.cacheable())
+
+# Bounded task storage with TTL/LRU eviction, optionally persisted to DynamoDB
+# (TASK_STORE=dynamodb, see task_store.py and dynamo_store.py)
+tasks = create_task_store()
+
+# Per task type: run the real handlers in-process, on Lambda, or pick by
+# payload size (TASK_ROUTING, see local_engine.py)
+router = TaskRouter.from_env()
+# LAMBDA_FALLBACK=local runs tasks in-process while their Lambda's circuit
+# breaker is open (see resilience.py)
+lambda_fallback = os.getenv('LAMBDA_FALLBACK', 'local')
+local_engine = LocalEngine.from_env() if router.uses_local or (dispatcher and lambda_fallback == 'local') else None
+
+# Task lifecycle events pushed to dashboards over GET /events (see events.py)
+events = EventBroadcaster.from_env()
+
+pipeline = TaskPipeline(registry, tasks, result_cache, dispatcher, local_engine, router, events, lambda_fallback)
+task_queue = pipeline.queue
+
+# Latest score of every lead_score task that carries a lead_id, for the
+# /leads queries (LEAD_INDEX=false turns it off, see lead_index.py); under
+# serve.py it is hosted by the launcher and shared by the workers
+lead_index = lead_index_from_env()
+if lead_index is not None:
+    pipeline.observe('lead_score', lead_index.observe)
+
+# Numbers the queue and cache already track, read at scrape time
+metrics.Gauge('task_queue_depth', 'Tasks waiting in each queue lane', ('task_type',),
+              collect=lambda: {(name,): task_queue.lane_depth(name) for name in registry.names()})
+metrics.Gauge('task_queue_running', 'Queued tasks currently running',
+              collect=lambda: {(): task_queue.running})
+metrics.Counter('result_cache_lookups', 'Result cache lookups by outcome', ('outcome',),
+                collect=lambda: {('hit',): result_cache.hits, ('miss',): result_cache.misses,
+                                 ('coalesced',): result_cache.coalesced})
+metrics.Gauge('result_cache_entries', 'Results currently cached',
+              collect=lambda: {(): len(result_cache)})
+metrics.Gauge('event_subscribers', 'Open GET /events streams',
+              collect=lambda: {(): events.subscribers})
+metrics.Counter('event_subscribers_dropped', 'Event streams closed for falling behind',
+                collect=lambda: {(): events.dropped})
+metrics.Counter('log_records_dropped', 'Log records not written, by reason', ('reason',),
+                collect=lambda: {('queue_full',): logs.stats()['dropped'],
+                                 ('sampled',): logs.stats()['sampled_out']})
+if lead_index is not None:
+    metrics.Gauge('lead_index_leads', 'Leads in the lead score index',
+                  collect=lambda: {(): len(lead_index)})
+if dispatcher:
+    metrics.Gauge('lambda_circuit_state', 'Circuit breaker state per function (0 closed, 1 half open, 2 open)',
+                  ('function',), collect=dispatcher.policy.circuit_states)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # uvicorn.run(app) sets up its loggers after this module was imported
+    logs.route_uvicorn()
+    await asyncio.to_thread(tasks.load)
+    # With TASK_STORE=shared, tasks changed by the other workers reach this
+    # worker's /events subscribers too
+    loop = asyncio.get_running_loop()
+    tasks.watch(lambda task_id, task_type, fields: loop.call_soon_threadsafe(events.publish, task_id, task_type, fields))
+    await pipeline.start()
+    yield
+    events.close()
+    await pipeline.stop()
+    tasks.close()
+    if dispatcher:
+        dispatcher.shutdown()
+
+app = FastAPI(title="Automation Dashboard API", lifespan=lifespan)
 
 # Secure CORS configuration
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
@@ -25,156 +130,235 @@ app.add_middleware(
     allow_methods=["GET", "POST"],
     allow_headers=["Content-Type", "Authorization"],
 )
-
-# AWS Lambda client with error handling (fallback to mock for demo)
-try:
-    lambda_client = boto3.client('lambda', region_name=os.getenv('AWS_REGION', 'us-east-1'))
-except Exception as e:
-    logger.warning(f"AWS Lambda client not available, using mock responses: {e}")
-    lambda_client = None
+app.add_middleware(MetricsMiddleware)
 
 class TaskRequest(BaseModel):
     task_type: str
     parameters: Dict[str, Any]
 
+class BatchTaskRequest(BaseModel):
+    task_type: str
+    records: List[Dict[str, Any]]
+    chunk_size: Optional[int] = None
+    # lead-score only: factors are left out of batch results unless asked for
+    include_factors: Optional[bool] = None
+
+class InvoiceExportRequest(BaseModel):
+    # Either a batch of invoice events or a single invoice's fields. The
+    # body is parsed whole, so exports are capped at INVOICE_EXPORT_MAX_ITEMS
+    # line items (see invoice_export.py); only the output is streamed
+    invoices: Optional[List[Dict[str, Any]]] = None
+    client_info: Optional[Dict[str, Any]] = None
+    items: Optional[List[Dict[str, Any]]] = None
+
 class TaskResponse(BaseModel):
     task_id: str
+    task_type: Optional[str] = None
     status: str
     result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
     timestamp: str
 
-# In-memory task storage (use Redis/DynamoDB in production)
-tasks = {}
+def require_lead_index() -> Union[LeadIndex, SharedLeadIndex]:
+    if lead_index is None:
+        raise HTTPException(status_code=404, detail="Lead index is disabled")
+    return lead_index
+
+async def query_lead_index(query):
+    """query(index) in a thread, after picking up rules file edits.
+
+    A rules change rescores the index and, under serve.py, every call goes
+    to the launcher, so neither may block the event loop.
+    """
+    index = require_lead_index()
+
+    def run():
+        index.refresh()
+        return query(index)
+
+    return await asyncio.to_thread(run)
+
+def resolve_task(route: str):
+    task = registry.for_route(route)
+    if task is None:
+        raise HTTPException(status_code=404, detail=f"Unknown task type: {route}")
+    return task
+
+# Event keys that name server files or S3 locations. Handlers only read their
+# own configured storage (the email parser's archive_key), so requests that
+# try to point them elsewhere are refused before any handler sees them
+RESERVED_PARAMETERS = frozenset(('mbox_path', 's3_bucket', 's3_key'))
+
+def check_parameters(parameters: Dict[str, Any]):
+    reserved = RESERVED_PARAMETERS.intersection(parameters)
+    if reserved:
+        raise HTTPException(status_code=400, detail=f"Parameters not accepted: {', '.join(sorted(reserved))}")
 
 @app.get("/")
 async def root():
     return {"message": "Automation Dashboard API"}
 
-@app.get("/tasks")
-async def get_tasks():
-    return {"tasks": list(tasks.values())}
+@app.get("/metrics")
+async def get_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
-@app.post("/tasks/email-parse")
-async def parse_email(request: TaskRequest, background_tasks: BackgroundTasks):
-    task_id = f"email_{datetime.now(timezone.utc).timestamp()}"
-    
-    try:
-        logger.info(f"Processing email parse request: {task_id}")
-        
-        if lambda_client:
-            response = lambda_client.invoke(
-                FunctionName='email-parser',
-                InvocationType='RequestResponse',
-                Payload=json.dumps(request.parameters)
-            )
-            result = json.loads(response['Payload'].read())
-        else:
-            # Use mock response for demo
-            result = {'body': mock_email_parse()}
-        
-        task = TaskResponse(
-            task_id=task_id,
-            status="completed",
-            result=result,
-            timestamp=datetime.now(timezone.utc).isoformat()
-        )
-        
-        tasks[task_id] = task.dict()
-        logger.info(f"Email parse completed: {task_id}")
-        return task
-        
-    except Exception as e:
-        logger.error(f"Email parse failed: {task_id}, error: {str(e)}")
-        error_task = TaskResponse(
-            task_id=task_id,
-            status="failed",
-            error=str(e),
-            timestamp=datetime.now(timezone.utc).isoformat()
-        )
-        tasks[task_id] = error_task.dict()
-        raise HTTPException(status_code=500, detail=str(e))
+@app.get("/events/stats")
+async def get_event_stats():
+    return events.stats()
+
+@app.get("/dispatch/stats")
+async def get_dispatch_stats():
+    # Per-function latency, adaptive timeout, hedging and circuit state
+    return dispatcher.stats() if dispatcher else {}
 
-@app.post("/tasks/invoice-generate")
-async def generate_invoice(request: TaskRequest):
-    task_id = f"invoice_{datetime.now(timezone.utc).timestamp()}"
-    
+@app.get("/cache/stats")
+async def get_cache_stats():
+    return result_cache.stats()
+
+@app.get("/tasks")
+async def get_tasks(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    task_type: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
     try:
-        logger.info(f"Processing invoice generation: {task_id}")
-        
-        if lambda_client:
-            response = lambda_client.invoke(
-                FunctionName='invoice-generator',
-                InvocationType='RequestResponse',
-                Payload=json.dumps(request.parameters)
-            )
-            result = json.loads(response['Payload'].read())
-        else:
-            # Use mock response for demo
-            result = {'body': mock_invoice_generate()}
-        
-        task = TaskResponse(
-            task_id=task_id,
-            status="completed",
-            result=result,
-            timestamp=datetime.now(timezone.utc).isoformat()
-        )
-        
-        tasks[task_id] = task.dict()
-        logger.info(f"Invoice generation completed: {task_id}")
-        return task
-        
-    except Exception as e:
-        logger.error(f"Invoice generation failed: {task_id}, error: {str(e)}")
-        error_task = TaskResponse(
-            task_id=task_id,
-            status="failed",
-            error=str(e),
-            timestamp=datetime.now(timezone.utc).isoformat()
-        )
-        tasks[task_id] = error_task.dict()
-        raise HTTPException(status_code=500, detail=str(e))
+        parse_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    page, next_cursor = await tasks.list_async(
+        limit=limit,
+        cursor=cursor,
+        task_type=task_type,
+        status=status,
+        since=since.timestamp() if since else None,
+        until=until.timestamp() if until else None,
+    )
+    # event_id lets a client subscribe to /events exactly where this page ends.
+    # Returned as a response so stored results are written out as the bytes
+    # they arrived in, not copied by jsonable_encoder and encoded again
+    return FastJSONResponse({"tasks": page, "next_cursor": next_cursor, "event_id": events.last_event_id})
+
+@app.get("/events")
+async def stream_events(
+    cursor: Optional[str] = None,
+    task_type: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None),
+):
+    # EventSource resends the last id it saw as Last-Event-ID on reconnect;
+    # cursor is the same token for the first connection
+    return StreamingResponse(
+        events.subscribe(last_event_id or cursor, task_type),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-@app.post("/tasks/lead-score")
-async def score_lead(request: TaskRequest):
-    task_id = f"lead_{datetime.now(timezone.utc).timestamp()}"
-    
+@app.get("/tasks/{task_id}")
+async def get_task(task_id: str, wait: float = Query(0, ge=0, le=30)):
+    task = await tasks.get_async(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if wait and task['status'] in ('queued', 'running'):
+        deadline = time.monotonic() + wait
+        await task_queue.wait(task_id, wait)
+        task = await tasks.get_async(task_id) or task
+        # Queued by another worker (TASK_STORE=shared or dynamodb): poll the store
+        while task['status'] in ('queued', 'running') and task_id not in task_queue and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            task = await tasks.get_async(task_id) or task
+    return FastJSONResponse(task)
+
+@app.get("/task-types")
+async def get_task_types():
+    return [
+        {"task_type": task.name, "route": f"/tasks/{task.route}", "cached": result_cache.should_cache(task.name)}
+        for task in registry
+    ]
+
+# The pipeline returns ready-made JSON responses, so TaskResponse only
+# documents the shape and is never validated per request
+@app.post("/tasks/{route}", response_model=TaskResponse)
+async def run_task(
+    route: str,
+    request: TaskRequest,
+    run_async: bool = Query(False, alias="async"),
+    cache: Optional[bool] = None,
+):
+    task = resolve_task(route)
+    check_parameters(request.parameters)
+    if run_async:
+        return pipeline.submit(task, request.parameters)
+    return await pipeline.run(task, request.parameters, cache)
+
+@app.post("/tasks/{route}/batch")
+async def run_task_batch(route: str, request: BatchTaskRequest):
+    for record in request.records:
+        check_parameters(record)
+    options = {'include_factors': request.include_factors} if request.include_factors is not None else None
+    return pipeline.stream_batch(resolve_task(route), request.records, request.chunk_size, options)
+
+@app.post("/invoices/export")
+async def export_invoices(request: InvoiceExportRequest, format: str = Query("csv")):
+    invoices = request.invoices
+    if invoices is None:
+        invoices = [{"client_info": request.client_info or {}, "items": request.items or []}]
+    return export_response(pipeline, invoices, format)
+
+@app.get("/leads/top")
+async def get_top_leads(
+    k: int = Query(100, ge=1, le=10000),
+    industry: Optional[str] = None,
+    quality: Optional[str] = None,
+):
     try:
-        logger.info(f"Processing lead scoring: {task_id}")
-        
-        if lambda_client:
-            response = lambda_client.invoke(
-                FunctionName='lead-scorer',
-                InvocationType='RequestResponse',
-                Payload=json.dumps(request.parameters)
-            )
-            result = json.loads(response['Payload'].read())
+        leads, rules_version = await query_lead_index(lambda index: (index.top(k, industry, quality),
+                                                                      index.rules_version))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse({"leads": leads, "rules_version": rules_version})
+
+@app.get("/leads/stats")
+async def get_lead_stats(industry: Optional[str] = None):
+    return await query_lead_index(lambda index: index.stats(industry))
+
+# Rescores still running, kept referenced until they finish
+rescores = set()
+
+@app.post("/leads/rescore", status_code=202)
+async def rescore_leads():
+    # Re-reads the rules file now instead of within LEAD_SCORING_RULES_REFRESH.
+    # A rescore can take a while at millions of leads, so it runs in the
+    # background and is recorded as a lead_rescore task to poll
+    index = require_lead_index()
+    task_id = task_ids.new_task_id('lead_rescore')
+    record = task_record(task_id, 'lead_rescore', 'running')
+    pipeline.put(record)
+
+    async def rescore():
+        try:
+            report = await asyncio.to_thread(index.refresh, True)
+            if report is None:
+                report = {"rules_version": await asyncio.to_thread(lambda: index.rules_version), "changed": 0}
+        except Exception as e:
+            logger.error("Lead rescore failed: %s, error: %s", task_id, e,
+                         extra={'task_id': task_id, 'task_type': 'lead_rescore'})
+            pipeline.update(task_id, {'status': 'failed', 'error': str(e)})
         else:
-            # Use mock response for demo
-            company_size = request.parameters.get('lead_data', {}).get('company_size', 1500)
-            result = {'body': mock_lead_score(company_size)}
-        
-        task = TaskResponse(
-            task_id=task_id,
-            status="completed",
-            result=result,
-            timestamp=datetime.now(timezone.utc).isoformat()
-        )
-        
-        tasks[task_id] = task.dict()
-        logger.info(f"Lead scoring completed: {task_id}")
-        return task
-        
-    except Exception as e:
-        logger.error(f"Lead scoring failed: {task_id}, error: {str(e)}")
-        error_task = TaskResponse(
-            task_id=task_id,
-            status="failed",
-            error=str(e),
-            timestamp=datetime.now(timezone.utc).isoformat()
-        )
-        tasks[task_id] = error_task.dict()
-        raise HTTPException(status_code=500, detail=str(e))
+            pipeline.update(task_id, {'status': 'completed', 'result': report})
+
+    background = asyncio.create_task(rescore())
+    rescores.add(background)
+    background.add_done_callback(rescores.discard)
+    return {"task_id": task_id, "status": "running", "timestamp": record['timestamp']}
+
+@app.get("/leads/{lead_id}")
+async def get_lead(lead_id: str):
+    lead = await query_lead_index(lambda index: index.get(lead_id))
+    if lead is None:
+        raise HTTPException(status_code=404, detail="Lead not found")
+    return lead
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,219 @@
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond cache hits up to the
+# Lambda timeout
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+REGISTRY: List['Metric'] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base for metrics rendered in the Prometheus text format.
+
+    Children are created once per label combination and cached, so the hot
+    path is a dict lookup plus an integer or float update. Observations are
+    made from the event loop thread, so no locking is needed.
+    """
+
+    kind = 'untyped'
+    suffix = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 collect: Optional[Callable[[], Dict[LabelValues, float]]] = None, register: bool = True):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # collect() returns {label values: value} at scrape time; it exports
+        # numbers other objects already track without touching their hot paths
+        self.collect = collect
+        self._children: Dict[LabelValues, object] = {}
+        if register:
+            REGISTRY.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def samples(self) -> Iterable[Tuple[str, LabelValues, Sequence[str], float]]:
+        if self.collect is not None:
+            for values, value in self.collect().items():
+                yield self.suffix, values, (), value
+            return
+        for values, child in self._children.items():
+            yield self.suffix, values, (), child.value
+
+    def render(self) -> List[str]:
+        header = self.name + self.suffix
+        lines = [f'# HELP {header} {self.documentation}', f'# TYPE {header} {self.kind}']
+        for suffix, values, extra_names, value in self.samples():
+            names = self.labelnames + tuple(extra_names)
+            lines.append(f'{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}')
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+class Counter(Metric):
+    kind = 'counter'
+    suffix = '_total'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # Per-bucket (not cumulative) counts; the last slot is +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, register: bool = True):
+        super().__init__(name, documentation, labelnames, register=register)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def samples(self):
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float('inf'),), child.counts):
+                cumulative += count
+                yield '_bucket', values + (_format_value(bound),), ('le',), cumulative
+            yield '_sum', values, (), child.sum
+            yield '_count', values, (), cumulative
+
+
+def render(registry: Optional[List[Metric]] = None) -> str:
+    lines: List[str] = []
+    for metric in REGISTRY if registry is None else registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Backend metrics shared by main, dispatcher and task_queue
+QUEUE_WAIT_SECONDS = Histogram('task_queue_wait_seconds', 'Time tasks spend queued before a worker picks them up', ('task_type',))
+INVOKE_SECONDS = Histogram('task_invoke_seconds', 'Lambda invoke round trip, network and function time included', ('task_type',))
+DESERIALIZE_SECONDS = Histogram('task_deserialize_seconds', 'Time to read and JSON-decode the Lambda response payload', ('task_type',))
+TOTAL_SECONDS = Histogram('task_total_seconds', 'Time to run a task end to end, queue wait excluded', ('task_type',))
+LAMBDA_STAGE_SECONDS = Histogram('lambda_stage_seconds', 'Per-stage time reported by the Lambda functions', ('task_type', 'stage'))
+HTTP_REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'HTTP request latency, request validation and response encoding included',
+                                 ('method', 'route', 'status'))
+TASKS_IN_FLIGHT = Gauge('tasks_in_flight', 'Tasks currently executing', ('task_type',))
+TASK_ERRORS = Counter('task_errors', 'Failed task executions', ('task_type', 'reason'))
+
+
+def observe_stages(task_type: str, body) -> None:
+    """Record the per-stage timings (milliseconds) a Lambda reports in its body."""
+    timings = body.get('timings') if isinstance(body, dict) else None
+    if not timings:
+        return
+    for stage, milliseconds in timings.items():
+        LAMBDA_STAGE_SECONDS.labels(task_type, stage).observe(milliseconds / 1000)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get('route'), 'path', 'unmatched')
+            HTTP_REQUEST_SECONDS.labels(scope['method'], route, str(status)).observe(time.perf_counter() - started)
@@ -0,0 +1,299 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from batching import MAX_CHUNK_RECORDS, chunk_records
+from dispatcher import CircuitOpen, DispatchTimeout, LambdaDispatcher
+from events import EventBroadcaster
+from local_engine import LocalEngine, TaskRouter
+from metrics import TASK_ERRORS, TASKS_IN_FLIGHT, TOTAL_SECONDS, observe_stages
+from resilience import is_throttle
+from result_cache import ResultCache, canonical_json
+from serialization import FastJSONResponse, dumps
+from task_queue import QueueFull, TaskQueue
+from task_registry import TaskRegistry, TaskType
+from task_store import TaskStore
+
+logger = logging.getLogger(__name__)
+
+Record = Dict[str, Any]
+Observer = Callable[[List[Record], List[Record]], None]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _ms_since(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+def error_reason(error: Exception) -> str:
+    if isinstance(error, DispatchTimeout):
+        return 'timeout'
+    if isinstance(error, CircuitOpen):
+        return 'circuit_open'
+    return 'throttled' if is_throttle(error) else 'error'
+
+
+def task_record(task_id: str, task_type: str, status: str, result: Optional[Record] = None,
+                error: Optional[str] = None, **extra: Any) -> Record:
+    record = {
+        'task_id': task_id,
+        'task_type': task_type,
+        'status': status,
+        'result': result,
+        'error': error,
+        'timestamp': _now(),
+    }
+    record.update(extra)
+    return record
+
+
+class TaskPipeline:
+    """The single execution path behind every /tasks/* endpoint.
+
+    Dispatch, caching, timing, storage and error mapping live here once;
+    the routes only resolve a TaskType and hand over plain dicts, so
+    pydantic is only involved in parsing the request body.
+    """
+
+    def __init__(self, registry: TaskRegistry, tasks: TaskStore, result_cache: ResultCache,
+                 dispatcher: Optional[LambdaDispatcher] = None, local_engine: Optional[LocalEngine] = None,
+                 router: Optional[TaskRouter] = None, events: Optional[EventBroadcaster] = None,
+                 fallback: str = 'none'):
+        self.registry = registry
+        self.tasks = tasks
+        self.result_cache = result_cache
+        self.dispatcher = dispatcher
+        self.local_engine = local_engine
+        self.router = router or TaskRouter()
+        self.events = events or EventBroadcaster()
+        # 'local': run a task in-process while its Lambda's circuit is open
+        self.fallback = fallback
+        self.observers: Dict[str, List[Observer]] = {}
+        self.queue = TaskQueue.from_env(self.invoke, self.update)
+
+    def observe(self, task_type: str, observer: Observer) -> None:
+        """Call observer(events, results) with every task_type result, single or batch, cached or not."""
+        self.observers.setdefault(task_type, []).append(observer)
+
+    def notify(self, task_type: str, events: List[Record], results: List[Record]) -> None:
+        for observer in self.observers.get(task_type, ()):
+            # A broken observer must not fail the task it watches
+            try:
+                observer(events, results)
+            except Exception:
+                logger.exception("%s observer failed", task_type)
+
+    # Every task state change goes through these two, so the store and the
+    # /events stream never disagree
+    def put(self, record: Record) -> None:
+        self.tasks.put(record)
+        self.events.publish(record['task_id'], record.get('task_type'), record)
+
+    def update(self, task_id: str, fields: Record) -> Optional[Record]:
+        record = self.tasks.update(task_id, fields)
+        if record is not None:
+            self.events.publish(task_id, record.get('task_type'), fields)
+        return record
+
+    def route(self, task: TaskType, event: Record) -> str:
+        """Where this event runs: 'local', 'lambda' or 'mock'."""
+        route = self.router.route(task.name, event, self.dispatcher is not None)
+        if route == 'local' and task.local and self.local_engine is not None:
+            return 'local'
+        if self.dispatcher is not None and task.function_name:
+            return 'lambda'
+        return 'mock'
+
+    async def execute(self, task: TaskType, event: Record) -> Record:
+        route = self.route(task, event)
+        if route == 'local':
+            response = await self.local_engine.invoke(task.local, event, label=task.name)
+        elif route == 'lambda':
+            try:
+                response = await self.dispatcher.invoke(task.function_name, event, label=task.name,
+                                                        hedge=task.idempotent and task.pure_call(event))
+            except CircuitOpen:
+                if self.fallback != 'local' or not task.local or self.local_engine is None:
+                    raise
+                logger.warning("%s circuit open, running %s locally", task.function_name, task.name)
+                response = await self.local_engine.invoke(task.local, event, label=task.name)
+        elif 'records' in event:
+            return {'body': {'success': True, 'results': [(await self.execute(task, record))['body']
+                                                          for record in event['records']]}}
+        elif task.mock is None:
+            raise RuntimeError(f"No Lambda client or mock available for {task.name}")
+        else:
+            # Use mock response for demo
+            return {'body': task.mock(event)}
+        observe_stages(task.name, response.get('body'))
+        return response
+
+    async def invoke(self, task_type: str, parameters: Record, cache: Optional[bool] = None) -> Record:
+        task = self.registry.get(task_type)
+        in_flight = TASKS_IN_FLIGHT.labels(task_type)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            if self.result_cache.should_cache(task_type, cache) and task.pure_call(parameters):
+                response = await self.result_cache.get_or_invoke(task_type, parameters,
+                                                                 lambda: self.execute(task, parameters))
+            else:
+                response = await self.execute(task, parameters)
+        except Exception as e:
+            TASK_ERRORS.labels(task_type, error_reason(e)).inc()
+            raise
+        finally:
+            in_flight.dec()
+            TOTAL_SECONDS.labels(task_type).observe(time.perf_counter() - started)
+        self.notify(task_type, [parameters], [response.get('body')])
+        return response
+
+    async def call_batch(self, task: TaskType, records: List[Record],
+                         options: Optional[Record] = None) -> List[Record]:
+        response = await self.execute(task, dict(options or {}, records=records))
+        body = response.get('body') or {}
+        if 'results' not in body:
+            raise RuntimeError(body.get('error') or response.get('errorMessage') or 'Batch invocation failed')
+        self.result_cache.observe(task.name, body)
+        return body['results']
+
+    async def invoke_batch(self, task: TaskType, records: List[Record],
+                           options: Optional[Record] = None) -> List[Record]:
+        """options are batch-wide event fields, such as the lead scorer's include_factors."""
+        cache = self.result_cache
+        if not cache.should_cache(task.name):
+            results = await self.call_batch(task, records, options)
+            self.notify(task.name, records, results)
+            return results
+        # Per-record results are cached separately from whole responses, so a
+        # retried batch only sends the records that are not cached yet
+        namespace = 'record' + (canonical_json(options).decode() if options else '')
+        results = [cache.get(cache.key(task.name, record, namespace)) for record in records]
+        missing = [index for index, result in enumerate(results) if result is None]
+        if missing:
+            fresh = await self.call_batch(task, [records[index] for index in missing], options)
+            for index, result in zip(missing, fresh):
+                results[index] = result
+                if result.get('success'):
+                    cache.set(cache.key(task.name, records[index], namespace), result)
+        self.notify(task.name, records, results)
+        return results
+
+    async def run(self, task: TaskType, parameters: Record, cache: Optional[bool] = None) -> FastJSONResponse:
+        task_id = task.new_task_id()
+        # Messages are formatted by the log listener thread (see logs.py);
+        # the extra fields become JSON keys
+        fields = {'task_id': task_id, 'task_type': task.name}
+        logger.info("Processing %s task: %s", task.name, task_id, extra=fields)
+        started = time.perf_counter()
+        try:
+            result = await self.invoke(task.name, parameters, cache)
+        except Exception as e:
+            logger.error("%s task failed: %s, error: %s", task.name, task_id, e,
+                         extra=dict(fields, reason=error_reason(e), duration_ms=_ms_since(started)))
+            self.put(task_record(task_id, task.name, 'failed', error=str(e)))
+            if isinstance(e, CircuitOpen):
+                raise HTTPException(status_code=503, detail=str(e),
+                                    headers={'Retry-After': str(max(1, round(e.retry_after)))})
+            status_code = 504 if isinstance(e, DispatchTimeout) else 500
+            raise HTTPException(status_code=status_code, detail=str(e))
+        record = task_record(task_id, task.name, 'completed', result=result)
+        self.put(record)
+        logger.info("%s task completed: %s", task.name, task_id, extra=dict(fields, duration_ms=_ms_since(started)))
+        return FastJSONResponse(record)
+
+    def submit(self, task: TaskType, parameters: Record) -> FastJSONResponse:
+        task_id = task.new_task_id()
+        record = task_record(task_id, task.name, 'queued')
+        record['queued_at'] = now = record['timestamp']
+        try:
+            position = self.queue.submit(task_id, task.name, parameters)
+        except QueueFull as e:
+            logger.warning("Rejected %s task, queue full: %s", task.name, task_id,
+                           extra={'task_id': task_id, 'task_type': task.name})
+            raise HTTPException(status_code=429, detail=str(e), headers={'Retry-After': '1'})
+        # Stored before yielding to the event loop, so no worker can pick
+        # the job up before its record exists
+        self.put(record)
+        logger.info("Queued %s task: %s", task.name, task_id, extra={'task_id': task_id, 'task_type': task.name})
+        return FastJSONResponse(
+            status_code=202,
+            content={'task_id': task_id, 'status': 'queued', 'position': position, 'timestamp': now}
+        )
+
+    def stream_batch(self, task: TaskType, records: List[Record], chunk_size: Optional[int] = None,
+                     options: Optional[Record] = None) -> StreamingResponse:
+        if chunk_size is not None and chunk_size <= 0:
+            raise HTTPException(status_code=400, detail="chunk_size must be positive")
+        task_id = task.new_task_id(batch=True)
+        max_records = min(chunk_size or MAX_CHUNK_RECORDS, MAX_CHUNK_RECORDS)
+        chunks = list(chunk_records(records, max_records=max_records))
+        self.put(task_record(task_id, task.name, 'running'))
+        fields = {'task_id': task_id, 'task_type': task.name, 'records': len(records), 'chunks': len(chunks)}
+        logger.info("Processing %s batch: %s, %s records in %s chunks", task.name, task_id, len(records), len(chunks),
+                    extra=fields)
+        started = time.perf_counter()
+
+        async def run_chunk(offset: int, chunk: List[Record]):
+            try:
+                return offset, await self.invoke_batch(task, chunk, options), None
+            except Exception as e:
+                return offset, chunk, e
+
+        async def stream():
+            # Chunks run concurrently (bounded by the dispatcher) and are
+            # streamed as NDJSON in completion order; "index" gives each
+            # record's position in the request.
+            pending = [asyncio.ensure_future(run_chunk(offset, chunk)) for offset, chunk in chunks]
+            failed = 0
+            # Stays 'cancelled' unless every chunk was streamed: a client
+            # that disconnects closes this generator halfway through
+            status = 'cancelled'
+            try:
+                for future in asyncio.as_completed(pending):
+                    offset, results, error = await future
+                    if error is not None:
+                        logger.error("Batch chunk failed: %s, offset %s, error: %s", task_id, offset, error,
+                                     extra=dict(fields, offset=offset, reason=error_reason(error)))
+                        results = [{'success': False, 'error': str(error)} for _ in results]
+                    lines = []
+                    for index, result in enumerate(results):
+                        if not result.get('success'):
+                            failed += 1
+                        lines.append(dumps(dict(result, index=offset + index)))
+                    yield b'\n'.join(lines) + b'\n'
+                status = 'completed'
+            except Exception:
+                status = 'failed'
+                raise
+            finally:
+                for future in pending:
+                    future.cancel()
+                self.update(task_id, {
+                    'status': status,
+                    'result': {'records': len(records), 'chunks': len(chunks), 'failed': failed},
+                    'timestamp': _now(),
+                })
+                logger.info("Batch %s: %s, %s failed records", status, task_id, failed,
+                            extra=dict(fields, failed=failed, duration_ms=_ms_since(started)))
+
+        return StreamingResponse(stream(), media_type='application/x-ndjson', headers={'X-Task-Id': task_id})
+
+    async def start(self):
+        # A fallback-only engine starts on first use instead
+        if self.local_engine is not None and self.router.uses_local:
+            await asyncio.to_thread(self.local_engine.start, [task.local for task in self.registry if task.local])
+        await self.queue.start()
+
+    async def stop(self):
+        await self.queue.stop()
+        if self.local_engine is not None:
+            self.local_engine.shutdown()
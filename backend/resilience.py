@@ -0,0 +1,238 @@
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from metrics import Counter
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+HEDGES = Counter('lambda_hedges', 'Hedged duplicate Lambda invokes, by whether the duplicate answered first',
+                 ('function', 'outcome'))
+CIRCUIT_TRANSITIONS = Counter('lambda_circuit_transitions', 'Circuit breaker state changes', ('function', 'state'))
+
+
+def is_throttle(error: BaseException) -> bool:
+    """Whether a boto3 invoke error is Lambda throttling (429 TooManyRequestsException)."""
+    response = getattr(error, 'response', None) or {}
+    return response.get('Error', {}).get('Code') in ('TooManyRequestsException', 'ThrottlingException')
+
+
+class LatencyTracker:
+    """EWMA and percentiles of one function's recent invoke latencies.
+
+    Percentiles come from a sliding window of the last `window` samples,
+    sorted at most once every `refresh` observations, so reading p95 on
+    every call costs a list index rather than a sort.
+    """
+
+    __slots__ = ('alpha', 'samples', 'ewma', 'count', 'refresh', '_sorted', '_stale')
+
+    def __init__(self, window: int = 512, alpha: float = 0.1, refresh: int = 16):
+        self.alpha = alpha
+        self.samples = deque(maxlen=window)
+        self.ewma: Optional[float] = None
+        self.count = 0
+        self.refresh = refresh
+        self._sorted: List[float] = []
+        self._stale = 0
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.count += 1
+        self._stale += 1
+        self.ewma = seconds if self.ewma is None else self.ewma + self.alpha * (seconds - self.ewma)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        if self._stale >= self.refresh or not self._sorted:
+            self._sorted = sorted(self.samples)
+            self._stale = 0
+        index = min(len(self._sorted) - 1, max(0, math.ceil(q / 100 * len(self._sorted)) - 1))
+        return self._sorted[index]
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures and fails calls fast.
+
+    After `cooldown` seconds one probe call is let through (half open): if
+    it succeeds the circuit closes, otherwise it opens for another cooldown.
+    """
+
+    __slots__ = ('name', 'threshold', 'cooldown', 'state', 'failures', 'opened_at', '_probing')
+
+    def __init__(self, name: str, threshold: int = 5, cooldown: float = 10.0):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def _set(self, state: str) -> None:
+        if state != self.state:
+            self.state = state
+            CIRCUIT_TRANSITIONS.labels(self.name, state).inc()
+
+    def allow(self) -> bool:
+        if self.state == CLOSED or self.threshold <= 0:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self._set(HALF_OPEN)
+        # Half open: a single probe at a time
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probing = False
+        self._set(CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.threshold > 0 and (self.state == HALF_OPEN or self.failures >= self.threshold):
+            self.opened_at = time.monotonic()
+            self._set(OPEN)
+
+    def abandon(self) -> None:
+        """The call was cancelled before it could succeed or fail."""
+        self._probing = False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+
+class ResiliencePolicy:
+    """Per-function latency tracking, adaptive timeouts, hedging and circuit breaking.
+
+    Until a function has min_samples observations it gets its configured
+    timeout and no hedging. After that its timeout is timeout_multiplier x
+    its p99 (between min_timeout and the configured timeout), and calls to
+    idempotent task types still running at the hedge_percentile latency get
+    one duplicate invoke, limited to hedge_budget of all calls so hedging
+    cannot double the load on a function that is slow for everyone.
+    """
+
+    def __init__(self, adaptive_timeouts: bool = True, timeout_multiplier: float = 3.0, min_timeout: float = 2.0,
+                 hedging: bool = True, hedge_percentile: float = 95.0, hedge_min_delay: float = 0.01,
+                 hedge_budget: float = 0.1, failure_threshold: int = 5, cooldown: float = 10.0,
+                 min_samples: int = 20, window: int = 512):
+        self.adaptive_timeouts = adaptive_timeouts
+        self.timeout_multiplier = timeout_multiplier
+        self.min_timeout = min_timeout
+        self.hedging = hedging
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_budget = hedge_budget
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.min_samples = min_samples
+        self.window = window
+        self._functions: Dict[str, FunctionHealth] = {}
+
+    @classmethod
+    def from_env(cls) -> 'ResiliencePolicy':
+        return cls(
+            adaptive_timeouts=os.getenv('LAMBDA_ADAPTIVE_TIMEOUTS', 'true').lower() == 'true',
+            timeout_multiplier=float(os.getenv('LAMBDA_TIMEOUT_MULTIPLIER', '3')),
+            min_timeout=float(os.getenv('LAMBDA_MIN_TIMEOUT', '2')),
+            hedging=os.getenv('LAMBDA_HEDGING', 'true').lower() == 'true',
+            hedge_percentile=float(os.getenv('LAMBDA_HEDGE_PERCENTILE', '95')),
+            hedge_budget=float(os.getenv('LAMBDA_HEDGE_BUDGET', '0.1')),
+            failure_threshold=int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5')),
+            cooldown=float(os.getenv('CIRCUIT_COOLDOWN', '10')),
+        )
+
+    def function(self, name: str) -> 'FunctionHealth':
+        health = self._functions.get(name)
+        if health is None:
+            health = self._functions[name] = FunctionHealth(name, self)
+        return health
+
+    def circuit_states(self) -> Dict[tuple, float]:
+        return {(name,): STATE_VALUES[health.breaker.state] for name, health in self._functions.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: health.stats() for name, health in self._functions.items()}
+
+
+class FunctionHealth:
+    __slots__ = ('name', 'policy', 'latency', 'breaker', 'calls', 'hedges', 'hedge_wins', '_hedge_tokens')
+
+    def __init__(self, name: str, policy: ResiliencePolicy):
+        self.name = name
+        self.policy = policy
+        self.latency = LatencyTracker(window=policy.window)
+        self.breaker = CircuitBreaker(name, policy.failure_threshold, policy.cooldown)
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._hedge_tokens = 0.0
+
+    def timeout(self, configured: float) -> float:
+        policy = self.policy
+        if not policy.adaptive_timeouts or self.latency.count < policy.min_samples:
+            return configured
+        return min(configured, max(policy.min_timeout, self.latency.percentile(99) * policy.timeout_multiplier))
+
+    def begin(self) -> None:
+        # Every call earns a fraction of a hedge; a few may be saved up for bursts
+        self.calls += 1
+        self._hedge_tokens = min(10.0, self._hedge_tokens + self.policy.hedge_budget)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before sending a duplicate, or None to not hedge."""
+        policy = self.policy
+        if not policy.hedging or self.latency.count < policy.min_samples or self.breaker.state != CLOSED:
+            return None
+        return max(policy.hedge_min_delay, self.latency.percentile(policy.hedge_percentile))
+
+    def take_hedge(self) -> bool:
+        if self._hedge_tokens < 1:
+            return False
+        self._hedge_tokens -= 1
+        self.hedges += 1
+        HEDGES.labels(self.name, 'sent').inc()
+        return True
+
+    def hedge_won(self) -> None:
+        self.hedge_wins += 1
+        HEDGES.labels(self.name, 'won').inc()
+
+    def success(self) -> None:
+        self.breaker.record_success()
+
+    def failure(self, seconds: Optional[float] = None) -> None:
+        # A timed-out call still tells us the function is at least this slow,
+        # so the adaptive timeout can grow back when it really got slower
+        if seconds is not None:
+            self.latency.observe(seconds)
+        self.breaker.record_failure()
+
+    def stats(self) -> Dict[str, Any]:
+        latency = self.latency
+
+        def ms(value):
+            return round(value * 1000, 3) if value is not None else None
+
+        return {
+            'circuit': self.breaker.state,
+            'consecutive_failures': self.breaker.failures,
+            'samples': latency.count,
+            'ewma_ms': ms(latency.ewma),
+            'p50_ms': ms(latency.percentile(50)),
+            'p95_ms': ms(latency.percentile(95)),
+            'p99_ms': ms(latency.percentile(99)),
+            'calls': self.calls,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+        }
@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from serialization import dumps, encoded_size
+
+logger = logging.getLogger(__name__)
+
+Result = Dict[str, Any]
+
+# Lead scoring and email parsing are pure functions of their input.
+# Invoice generation mints a new invoice number per call, so it is only
+# cached when a request opts in.
+DEFAULT_CACHED_TASKS = ('email_parse', 'lead_score')
+
+
+def canonical_json(parameters: Any) -> bytes:
+    return dumps(parameters, sort_keys=True)
+
+
+def is_cacheable(response: Result) -> bool:
+    """Only successful invocations are cached; errors are always retried."""
+    if response.get('statusCode', 200) != 200 or 'errorMessage' in response:
+        return False
+    body = response.get('body')
+    return not isinstance(body, dict) or body.get('success', True) is not False
+
+
+class ResultCache:
+    """LRU + TTL cache of task results keyed by a hash of their input.
+
+    Keys are sha256(task_type, rules version, canonical parameters). The
+    rules version is learned from the rules_version field the Lambdas
+    return, so a new rules deployment stops matching old entries as soon
+    as the first fresh result comes back. Identical requests that arrive
+    while the first one is still running share its invocation.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 32 * 1024 * 1024, ttl: float = 300.0,
+                 cached_tasks: Iterable[str] = DEFAULT_CACHED_TASKS, coalesce: bool = True):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.cached_tasks = frozenset(cached_tasks)
+        self.coalesce = coalesce
+        self._entries: 'OrderedDict[str, Tuple[float, int, Result]]' = OrderedDict()
+        self._bytes = 0
+        self._versions: Dict[str, str] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls, default_tasks: Iterable[str] = DEFAULT_CACHED_TASKS) -> 'ResultCache':
+        cached_tasks = os.getenv('RESULT_CACHE_TASKS')
+        return cls(
+            max_entries=int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '10000')),
+            max_bytes=int(os.getenv('RESULT_CACHE_MAX_BYTES', str(32 * 1024 * 1024))),
+            ttl=float(os.getenv('RESULT_CACHE_TTL', '300')),
+            cached_tasks=default_tasks if cached_tasks is None else
+            [name.strip() for name in cached_tasks.split(',') if name.strip()],
+            coalesce=os.getenv('RESULT_CACHE_COALESCE', 'true').lower() == 'true',
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def should_cache(self, task_type: str, opt_in: Optional[bool] = None) -> bool:
+        if not self.enabled:
+            return False
+        if opt_in is not None:
+            return opt_in
+        return task_type in self.cached_tasks
+
+    def key(self, task_type: str, parameters: Any, namespace: str = '') -> str:
+        version = self._versions.get(task_type, '')
+        digest = hashlib.sha256(f"{task_type}\0{namespace}\0{version}\0".encode())
+        digest.update(canonical_json(parameters))
+        return digest.hexdigest()
+
+    def observe(self, task_type: str, body: Any) -> None:
+        """Track the rules version reported by a fresh result."""
+        version = body.get('rules_version') if isinstance(body, dict) else None
+        if version is not None and self._versions.get(task_type) != str(version):
+            if task_type in self._versions:
+                logger.info("Result cache: %s rules changed to %s, old entries will age out", task_type, version)
+            self._versions[task_type] = str(version)
+
+    def get(self, key: str) -> Optional[Result]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def set(self, key: str, value: Result) -> None:
+        # Invocation results keep their payload bytes, so this is free for them
+        size = encoded_size(value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, value)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    async def get_or_invoke(self, task_type: str, parameters: Any,
+                            invoke: Callable[[], Awaitable[Result]]) -> Result:
+        key = self.key(task_type, parameters)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        inflight = self._inflight.get(key) if self.coalesce else None
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = await invoke()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved when nobody was waiting on it
+            future.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        future.set_result(response)
+        if is_cacheable(response):
+            self.observe(task_type, response.get('body'))
+            self.set(self.key(task_type, parameters), response)
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._inflight),
+            'evictions': self.evictions,
+            'rules_versions': dict(self._versions),
+        }
@@ -0,0 +1,81 @@
+import json
+from typing import Any, Dict
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib encoder produces the same JSON, slower
+    orjson = None
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+
+class RawResult(dict):
+    """A decoded invocation result that remembers the bytes it came from.
+
+    It behaves as the plain dict the rest of the code expects, while the
+    serializers below write raw back out verbatim instead of encoding the
+    result again. Treat it as read-only: changes would not reach raw.
+    """
+
+    __slots__ = ('raw',)
+
+    def __init__(self, value: Dict[str, Any], raw: bytes):
+        super().__init__(value)
+        self.raw = raw
+
+
+def loads(data) -> Any:
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def decode_result(raw: bytes) -> Any:
+    value = loads(raw)
+    return RawResult(value, raw) if isinstance(value, dict) else value
+
+
+def _encode(value: Any, sort_keys: bool = False) -> bytes:
+    if orjson:
+        options = _ORJSON_OPTIONS | orjson.OPT_SORT_KEYS if sort_keys else _ORJSON_OPTIONS
+        return orjson.dumps(value, default=str, option=options)
+    return json.dumps(value, default=str, sort_keys=sort_keys, separators=(',', ':')).encode()
+
+
+def _splices(value: Any) -> bool:
+    return type(value) is RawResult or (type(value) is list and bool(value) and type(value[0]) is dict)
+
+
+def dumps(value: Any, sort_keys: bool = False) -> bytes:
+    """Compact JSON bytes, with RawResult values written out as their raw bytes.
+
+    Splicing reaches task records ({'result': RawResult, ...}) and lists of
+    them inside a dict, which covers every response, event and store write.
+    """
+    if sort_keys:
+        return _encode(value, True)
+    kind = type(value)
+    if kind is RawResult:
+        return value.raw
+    if kind is list and value and type(value[0]) is dict:
+        return b'[' + b','.join([dumps(item) for item in value]) + b']'
+    if kind is dict:
+        spliced = [(key, item) for key, item in value.items() if _splices(item)]
+        if spliced:
+            rest = _encode({key: item for key, item in value.items() if not _splices(item)})
+            parts = b','.join([_encode(str(key)) + b':' + dumps(item) for key, item in spliced])
+            return rest[:-1] + (b',' if len(rest) > 2 else b'') + parts + b'}'
+    return _encode(value)
+
+
+def encoded_size(value: Any) -> int:
+    if type(value) is RawResult:
+        return len(value.raw)
+    return len(_encode(value))
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with dumps(): orjson when installed, raw results reused."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
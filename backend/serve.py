@@ -0,0 +1,241 @@
+"""Pre-fork launcher: several uvicorn workers on one port, sharing task state.
+
+    python serve.py --host 0.0.0.0 --port 8000 --workers 4
+
+The launcher binds the listening socket, hosts the task store that every
+worker reads and writes (TASK_STORE=shared, see shared_store.py) and the
+lead index behind /leads (see lead_index.py), and supervises the workers:
+one that exits is replaced, and workers are recycled after --max-requests
+requests or --max-age seconds by starting the replacement first and then
+stopping the old one gracefully. SIGHUP recycles every worker the same
+way; SIGTERM and SIGINT shut down.
+
+With TASK_STORE=dynamodb the workers use the table directly and the
+launcher hosts no task store.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import time
+from multiprocessing.connection import wait
+from typing import Any, Dict, List, Optional
+
+import logs
+from lead_index import LeadIndexServer, lead_index_from_env
+from shared_store import TaskStoreServer
+from task_store import memory_store_from_env
+
+logger = logging.getLogger('serve')
+
+
+def run_worker(sock: socket.socket, env: Dict[str, str], config: Dict[str, Any]) -> None:
+    """Worker process entry point: a plain uvicorn server on the inherited socket."""
+    os.environ.update(env)
+    # SIGHUP means "recycle" to the launcher; uvicorn handles SIGTERM and SIGINT
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    import uvicorn
+    uvicorn.Server(uvicorn.Config('main:app', **config)).run(sockets=[sock])
+
+
+class Worker:
+    __slots__ = ('process', 'started', 'retiring', 'worker_id')
+
+    def __init__(self, process: multiprocessing.Process, worker_id: int):
+        self.process = process
+        self.started = time.monotonic()
+        self.retiring: Optional[float] = None
+        self.worker_id = worker_id
+
+
+class Supervisor:
+    def __init__(self, sock: socket.socket, store: Optional[TaskStoreServer], workers: int, config: Dict[str, Any],
+                 max_requests: int = 0, max_requests_jitter: int = 0, max_age: float = 0,
+                 graceful_timeout: float = 30.0, lead_index: Optional[LeadIndexServer] = None):
+        self.sock = sock
+        self.store = store
+        self.lead_index = lead_index
+        self.size = workers
+        self.config = config
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.max_age = max_age
+        self.graceful_timeout = graceful_timeout
+        self.workers: List[Worker] = []
+        self.context = multiprocessing.get_context('spawn')
+        # Every worker gets its own TASK_ID_WORKER, so task ids never collide
+        worker_base = os.getenv('TASK_ID_WORKER')
+        self._next_worker_id = int(worker_base) if worker_base else random.getrandbits(16)
+        self._stopping = False
+        self._recycle_all = False
+
+    def _worker_env(self, worker_id: int) -> Dict[str, str]:
+        env = {'TASK_ID_WORKER': str(worker_id)}
+        if self.store is not None:
+            env['TASK_STORE'] = 'shared'
+            env['TASK_STORE_ADDRESS'] = self.store.address
+            env['TASK_STORE_AUTHKEY'] = self.store.authkey.hex()
+        if self.lead_index is not None:
+            env['LEAD_INDEX_ADDRESS'] = self.lead_index.address
+            env['LEAD_INDEX_AUTHKEY'] = self.lead_index.authkey.hex()
+        # N workers with a full-size local engine pool each would start N x
+        # cores handler processes; split the cores between them instead
+        if not os.getenv('LOCAL_ENGINE_WORKERS'):
+            env['LOCAL_ENGINE_WORKERS'] = str(max(1, (os.cpu_count() or 1) // self.size))
+        return env
+
+    def spawn(self) -> Worker:
+        worker_id = self._next_worker_id & 0xFFFF
+        self._next_worker_id += 1
+        config = dict(self.config)
+        if self.max_requests:
+            # Jitter keeps workers started together from recycling together
+            config['limit_max_requests'] = self.max_requests + random.randint(0, self.max_requests_jitter)
+        process = self.context.Process(target=run_worker, args=(self.sock, self._worker_env(worker_id), config),
+                                       name=f"worker-{worker_id}", daemon=False)
+        process.start()
+        worker = Worker(process, worker_id)
+        self.workers.append(worker)
+        logger.info("Started worker %s (pid %s)", worker_id, process.pid)
+        return worker
+
+    def retire(self, worker: Worker) -> None:
+        """Replace a worker: the new one starts accepting before the old one stops."""
+        if worker.retiring is not None:
+            return
+        self.spawn()
+        worker.retiring = time.monotonic()
+        worker.process.terminate()
+        logger.info("Recycling worker %s (pid %s)", worker.worker_id, worker.process.pid)
+
+    def _on_signal(self, signum, frame) -> None:
+        if signum == signal.SIGHUP:
+            self._recycle_all = True
+        else:
+            self._stopping = True
+
+    def run(self) -> None:
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, self._on_signal)
+        for _ in range(self.size):
+            self.spawn()
+        try:
+            while not self._stopping:
+                wait([worker.process.sentinel for worker in self.workers], timeout=1.0)
+                self._tick()
+        finally:
+            self.shutdown()
+
+    def _tick(self) -> None:
+        now = time.monotonic()
+        for worker in list(self.workers):
+            process = worker.process
+            if not process.is_alive():
+                process.join()
+                self.workers.remove(worker)
+                if worker.retiring is None and not self._stopping:
+                    # Exited by itself: recycled after max requests, or crashed
+                    reason = 'recycled' if process.exitcode == 0 else f"exit code {process.exitcode}"
+                    logger.info("Worker %s stopped (%s), replacing it", worker.worker_id, reason)
+                    self.spawn()
+            elif worker.retiring is not None and now - worker.retiring > self.graceful_timeout:
+                logger.warning("Worker %s did not stop in %ss, killing it", worker.worker_id, self.graceful_timeout)
+                process.kill()
+        if self._recycle_all:
+            self._recycle_all = False
+            for worker in [worker for worker in self.workers if worker.retiring is None]:
+                self.retire(worker)
+        elif self.max_age:
+            for worker in [worker for worker in self.workers if worker.retiring is None]:
+                if now - worker.started > self.max_age:
+                    self.retire(worker)
+
+    def shutdown(self) -> None:
+        for worker in self.workers:
+            if worker.process.is_alive():
+                worker.process.terminate()
+        deadline = time.monotonic() + self.graceful_timeout
+        for worker in self.workers:
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                worker.process.kill()
+                worker.process.join()
+        self.workers.clear()
+        if self.store is not None:
+            self.store.close()
+        if self.lead_index is not None:
+            self.lead_index.close()
+        logger.info("All workers stopped")
+
+
+def task_store_server() -> Optional[TaskStoreServer]:
+    """The store to host for the workers, or None when they share one already.
+
+    Workers' own memory stores would each see only their own tasks, so
+    TASK_STORE=memory (the default) becomes one store in the launcher;
+    TASK_STORE=dynamodb is shared by nature and passed through as it is.
+    """
+    backend = os.getenv('TASK_STORE', 'memory')
+    if backend in ('memory', 'shared'):
+        return TaskStoreServer(memory_store_from_env())
+    if backend == 'dynamodb':
+        return None
+    raise ValueError(f"Unknown TASK_STORE backend: {backend}")
+
+
+def bind(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default=os.getenv('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', '8000')))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_CONCURRENCY', '0')) or os.cpu_count() or 1,
+                        help='worker processes (default: WEB_CONCURRENCY or the CPU count)')
+    parser.add_argument('--max-requests', type=int, default=int(os.getenv('WORKER_MAX_REQUESTS', '0')),
+                        help='recycle a worker after this many requests (0: never)')
+    parser.add_argument('--max-requests-jitter', type=int, default=int(os.getenv('WORKER_MAX_REQUESTS_JITTER', '0')))
+    parser.add_argument('--max-age', type=float, default=float(os.getenv('WORKER_MAX_AGE', '0')),
+                        help='recycle a worker after this many seconds (0: never)')
+    parser.add_argument('--graceful-timeout', type=float, default=float(os.getenv('WORKER_GRACEFUL_TIMEOUT', '30')),
+                        help='seconds a stopping worker gets to finish its requests')
+    parser.add_argument('--log-level', default=os.getenv('LOG_LEVEL', 'INFO').lower())
+    parser.add_argument('--no-access-log', action='store_true')
+    args = parser.parse_args(argv)
+    logs.configure_from_env(args.log_level)
+
+    try:
+        store = task_store_server()
+    except ValueError as e:
+        parser.error(str(e))
+    sock = bind(args.host, args.port)
+    if store is not None:
+        store.start()
+    # One index for all workers; each worker's own would only hold the
+    # leads it happened to score
+    index = lead_index_from_env()
+    lead_index = LeadIndexServer(index) if index is not None else None
+    if lead_index is not None:
+        lead_index.start()
+    config = {
+        'log_level': args.log_level,
+        'access_log': not args.no_access_log,
+        'timeout_graceful_shutdown': args.graceful_timeout,
+    }
+    logger.info("Serving on %s:%s with %s workers", args.host, args.port, args.workers)
+    Supervisor(sock, store, args.workers, config, args.max_requests, args.max_requests_jitter,
+               args.max_age, args.graceful_timeout, lead_index).run()
+
+
+if __name__ == '__main__':
+    main()
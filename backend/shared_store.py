@@ -0,0 +1,266 @@
+import logging
+import os
+import threading
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from serialization import dumps, loads
+from task_store import MemoryTaskStore, Record, TaskStore
+
+logger = logging.getLogger(__name__)
+
+Change = Callable[[str, Optional[str], Record], None]
+
+# Calls a worker may make; anything else is refused
+METHODS = frozenset(('put', 'get', 'update', 'delete', 'list', 'stats'))
+
+
+class SharedObjectServer:
+    """Hosts one object for all the worker processes of serve.py.
+
+    Workers connect over a local socket (multiprocessing.connection, with a
+    per-launch auth key) and send JSON-encoded calls of the methods listed
+    in `methods`. Each connection is served by its own thread and calls are
+    applied under one lock, so every worker sees the same state in the
+    same order.
+    """
+
+    kind = 'shared object'
+    methods: frozenset = frozenset()
+
+    def __init__(self, target: Any, address: Optional[str] = None, authkey: Optional[bytes] = None):
+        self.target = target
+        self.authkey = authkey or os.urandom(32)
+        self.listener = Listener(address, family='AF_UNIX', authkey=self.authkey)
+        self.address = self.listener.address
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._accept, name=f"{self.kind.replace(' ', '-')}-server",
+                                        daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+        logger.info("Shared %s listening on %s", self.kind, self.address)
+
+    def _accept(self) -> None:
+        while not self._closed:
+            try:
+                conn = self.listener.accept()
+            except OSError:
+                if self._closed:
+                    return
+                logger.exception("Shared %s: accept failed", self.kind)
+                continue
+            except Exception as e:  # failed authentication
+                logger.warning("Shared %s: rejected connection: %s", self.kind, e)
+                continue
+            threading.Thread(target=self._serve, args=(conn,), name=f"{self.kind.replace(' ', '-')}-conn",
+                             daemon=True).start()
+
+    def _serve(self, conn: Connection) -> None:
+        try:
+            hello = loads(conn.recv_bytes())
+            worker = str(hello.get('worker'))
+            if hello.get('subscribe'):
+                self._hold_subscription(conn, worker)
+                return
+            while True:
+                method, args, kwargs = loads(conn.recv_bytes())
+                conn.send_bytes(self._call(worker, method, args, kwargs))
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def _call(self, worker: str, method: str, args: List[Any], kwargs: Dict[str, Any]) -> bytes:
+        if method not in self.methods:
+            return dumps(['error', f"Unknown {self.kind} method: {method}"])
+        try:
+            with self._lock:
+                self.calls += 1
+                value = getattr(self.target, method)
+                if callable(value):
+                    value = value(*args, **kwargs)
+                change = self._change(method, args, value)
+                reply = dumps(['ok', value])
+        except ValueError as e:
+            # Bad arguments: raised again as ValueError in the worker
+            return dumps(['invalid', str(e)])
+        except Exception as e:
+            logger.exception("Shared %s: %s failed", self.kind, method)
+            return dumps(['error', str(e)])
+        if change is not None:
+            self._broadcast(worker, dumps(change))
+        return reply
+
+    def _change(self, method: str, args: List[Any], value: Any) -> Optional[Tuple[str, Optional[str], Record]]:
+        """What to tell the subscribers about a call, if anything."""
+        return None
+
+    def _hold_subscription(self, conn: Connection, worker: str) -> None:
+        logger.warning("Shared %s: worker %s asked for a subscription, which it does not offer", self.kind, worker)
+
+    def _broadcast(self, origin: str, frame: bytes) -> None:
+        pass
+
+    def close(self) -> None:
+        self._closed = True
+        self.listener.close()
+
+
+class TaskStoreServer(SharedObjectServer):
+    """Hosts one MemoryTaskStore for all the worker processes of serve.py.
+
+    Workers that subscribe are sent every change made by the others, which
+    keeps their /events streams complete.
+    """
+
+    kind = 'task store'
+    methods = METHODS
+
+    def __init__(self, store: MemoryTaskStore, address: Optional[str] = None, authkey: Optional[bytes] = None):
+        super().__init__(store, address, authkey)
+        self.store = store
+        self._subscribers: Dict[Connection, Tuple[str, threading.Lock]] = {}
+        self._subscribers_lock = threading.Lock()
+
+    def _change(self, method: str, args: List[Any], value: Any) -> Optional[Tuple[str, Optional[str], Record]]:
+        if not self._subscribers:
+            return None
+        if method == 'put':
+            return args[0]['task_id'], args[0].get('task_type'), args[0]
+        if method == 'update' and value is not None:
+            return args[0], value.get('task_type'), args[1]
+        return None
+
+    def _hold_subscription(self, conn: Connection, worker: str) -> None:
+        with self._subscribers_lock:
+            self._subscribers[conn] = (worker, threading.Lock())
+        try:
+            # Subscribers never send anything; this returns when they disconnect
+            conn.recv_bytes()
+        finally:
+            with self._subscribers_lock:
+                self._subscribers.pop(conn, None)
+
+    def _broadcast(self, origin: str, frame: bytes) -> None:
+        with self._subscribers_lock:
+            targets = [(conn, lock) for conn, (worker, lock) in self._subscribers.items() if worker != origin]
+        for conn, lock in targets:
+            try:
+                with lock:
+                    conn.send_bytes(frame)
+            except OSError:
+                with self._subscribers_lock:
+                    self._subscribers.pop(conn, None)
+
+    def close(self) -> None:
+        super().close()
+        with self._subscribers_lock:
+            for conn in self._subscribers:
+                conn.close()
+            self._subscribers.clear()
+
+
+class SharedObjectClient:
+    """Client side of a SharedObjectServer: one connection per worker process.
+
+    Calls are synchronous round trips on a local socket (tens of
+    microseconds), serialized by a lock so threads can share the
+    connection.
+    """
+
+    kind = 'shared object'
+
+    def __init__(self, address: str, authkey: bytes, worker: Optional[str] = None):
+        self.address = address
+        self.authkey = authkey
+        self.worker = worker or f"{os.getpid()}-{os.urandom(4).hex()}"
+        self._lock = threading.Lock()
+        self._conn = self._connect(subscribe=False)
+
+    def _connect(self, subscribe: bool) -> Connection:
+        conn = Client(self.address, family='AF_UNIX', authkey=self.authkey)
+        conn.send_bytes(dumps({'worker': self.worker, 'subscribe': subscribe}))
+        return conn
+
+    def _call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        request = dumps([method, args, kwargs])
+        with self._lock:
+            self._conn.send_bytes(request)
+            status, value = loads(self._conn.recv_bytes())
+        if status == 'invalid':
+            raise ValueError(value)
+        if status != 'ok':
+            raise RuntimeError(f"Shared {self.kind} {method} failed: {value}")
+        return value
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class SharedTaskStore(SharedObjectClient, TaskStore):
+    """Client side of TaskStoreServer.
+
+    Results come back as plain dicts, so responses encode them again
+    instead of splicing the original Lambda payload.
+    """
+
+    kind = 'task store'
+
+    def __init__(self, address: str, authkey: bytes, worker: Optional[str] = None):
+        super().__init__(address, authkey, worker)
+        self._watcher: Optional[threading.Thread] = None
+        self._watch_conn: Optional[Connection] = None
+
+    @classmethod
+    def from_env(cls) -> 'SharedTaskStore':
+        address = os.getenv('TASK_STORE_ADDRESS')
+        authkey = os.getenv('TASK_STORE_AUTHKEY')
+        if not address or not authkey:
+            raise ValueError("TASK_STORE=shared needs TASK_STORE_ADDRESS and TASK_STORE_AUTHKEY (set by serve.py)")
+        return cls(address, bytes.fromhex(authkey))
+
+    def put(self, record: Record) -> None:
+        self._call('put', record)
+
+    def get(self, task_id: str) -> Optional[Record]:
+        return self._call('get', task_id)
+
+    def update(self, task_id: str, fields: Record) -> Optional[Record]:
+        return self._call('update', task_id, fields)
+
+    def delete(self, task_id: str) -> None:
+        self._call('delete', task_id)
+
+    def list(self, limit: int = 100, cursor: Optional[str] = None, task_type: Optional[str] = None,
+             status: Optional[str] = None, since: Optional[float] = None,
+             until: Optional[float] = None) -> Tuple[List[Record], Optional[str]]:
+        page, next_cursor = self._call('list', limit=limit, cursor=cursor, task_type=task_type,
+                                       status=status, since=since, until=until)
+        return page, next_cursor
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._call('stats'), backend='shared', worker=self.worker)
+
+    def watch(self, callback: Change) -> None:
+        if self._watcher is not None:
+            return
+        self._watch_conn = conn = self._connect(subscribe=True)
+
+        def receive():
+            try:
+                while True:
+                    task_id, task_type, fields = loads(conn.recv_bytes())
+                    callback(task_id, task_type, fields)
+            except (EOFError, OSError):
+                pass
+
+        self._watcher = threading.Thread(target=receive, name='task-store-watch', daemon=True)
+        self._watcher.start()
+
+    def close(self) -> None:
+        for conn in (self._conn, self._watch_conn):
+            if conn is not None:
+                conn.close()
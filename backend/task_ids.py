@@ -0,0 +1,132 @@
+import os
+import random
+import threading
+import time
+from typing import Optional
+
+# Crockford base32: no I, L, O or U, so ids survive being read aloud or
+# retyped, and the digits sort in the same order as the values they encode
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+ID_LENGTH = 26  # 128 bits in 5-bit digits
+
+# 48-bit millisecond time | 16-bit worker id | 24-bit sequence | 40 random bits
+WORKER_BITS = 16
+SEQUENCE_BITS = 24
+RANDOM_BITS = 40
+TIME_SHIFT = WORKER_BITS + SEQUENCE_BITS + RANDOM_BITS
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+_PAIRS = [a + b for a in ALPHABET for b in ALPHABET]
+_DECODE = str.maketrans(ALPHABET, '0123456789abcdefghijklmnopqrstuv')
+
+
+def _encode_time(ms: int) -> str:
+    pairs = _PAIRS
+    return pairs[(ms >> 40) & 0x3FF] + pairs[(ms >> 30) & 0x3FF] + pairs[(ms >> 20) & 0x3FF] \
+        + pairs[(ms >> 10) & 0x3FF] + pairs[ms & 0x3FF]
+
+
+_time_prefix = (-1, '')
+_time_prefix_lock = threading.Lock()
+
+
+def encode(value: int) -> str:
+    """128-bit int -> 26 Crockford digits.
+
+    The first ten digits are exactly the millisecond time, so they are
+    encoded once per millisecond; the other 80 bits take eight lookups
+    in a table of digit pairs. The cached prefix is checked and replaced
+    under a lock, so a thread encoding another millisecond can never hand
+    this one its prefix.
+    """
+    global _time_prefix
+    ms = value >> TIME_SHIFT
+    with _time_prefix_lock:
+        if _time_prefix[0] != ms:
+            _time_prefix = (ms, _encode_time(ms))
+        prefix = _time_prefix[1]
+    pairs = _PAIRS
+    return prefix + pairs[(value >> 70) & 0x3FF] + pairs[(value >> 60) & 0x3FF] \
+        + pairs[(value >> 50) & 0x3FF] + pairs[(value >> 40) & 0x3FF] + pairs[(value >> 30) & 0x3FF] \
+        + pairs[(value >> 20) & 0x3FF] + pairs[(value >> 10) & 0x3FF] + pairs[value & 0x3FF]
+
+
+def decode(text: str) -> int:
+    return int(text.upper().translate(_DECODE), 32)
+
+
+def default_worker_id() -> int:
+    """TASK_ID_WORKER, or a random id when each process cannot be numbered.
+
+    Ids stay unique across processes either way: two workers would have to
+    draw the same id, in the same millisecond, at the same sequence and with
+    the same 40 random bits to collide.
+    """
+    worker = os.getenv('TASK_ID_WORKER')
+    if worker:
+        return int(worker) & ((1 << WORKER_BITS) - 1)
+    return random.SystemRandom().getrandbits(WORKER_BITS)
+
+
+class TaskIdGenerator:
+    """Sortable, collision-free task ids (ULID layout, Snowflake-style worker id).
+
+    Ids minted by one generator are strictly increasing, even when several
+    land in the same millisecond or the clock steps backwards, and ids from
+    different generators sort by creation time to the millisecond.
+    """
+
+    def __init__(self, worker_id: Optional[int] = None):
+        self.worker_id = default_worker_id() if worker_id is None else worker_id
+        self._last_ms = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+    def next_value(self) -> int:
+        with self._lock:
+            now = time.time_ns() // 1_000_000
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            elif self._sequence < MAX_SEQUENCE:
+                self._sequence += 1
+            else:
+                # 16M ids in one millisecond: borrow the next one
+                self._last_ms += 1
+                self._sequence = 0
+            return ((self._last_ms << TIME_SHIFT) | (self.worker_id << (SEQUENCE_BITS + RANDOM_BITS))
+                    | (self._sequence << RANDOM_BITS) | self._random.getrandbits(RANDOM_BITS))
+
+    def new_id(self, prefix: Optional[str] = None) -> str:
+        value = encode(self.next_value())
+        return f"{prefix}_{value}" if prefix else value
+
+
+def id_value(task_id: str) -> Optional[int]:
+    """The 128-bit value behind a task id, or None for ids minted elsewhere."""
+    text = task_id[-ID_LENGTH:]
+    if len(text) != ID_LENGTH or (len(task_id) > ID_LENGTH and task_id[-ID_LENGTH - 1] != '_'):
+        return None
+    try:
+        return decode(text)
+    except ValueError:
+        return None
+
+
+def timestamp_of(task_id: str) -> Optional[float]:
+    """Creation time (epoch seconds) encoded in a task id."""
+    value = id_value(task_id)
+    return None if value is None else (value >> TIME_SHIFT) / 1000
+
+
+def time_key(seconds: float) -> int:
+    """Smallest id value minted at or after the given epoch time, for range scans."""
+    return int(seconds * 1000) << TIME_SHIFT
+
+
+generator = TaskIdGenerator()
+
+
+def new_task_id(prefix: Optional[str] = None) -> str:
+    return generator.new_id(prefix)
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from dispatcher import parse_overrides
+from metrics import QUEUE_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+Runner = Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+UpdateHook = Callable[[str, Dict[str, Any]], None]
+
+Job = Tuple[str, str, Dict[str, Any], float]
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class TaskQueue:
+    """Bounded in-process work queue with one priority lane per task type.
+
+    Lanes with a lower priority number are drained first. Submissions past
+    the total or per-lane depth raise QueueFull so the API can answer 429
+    instead of buffering without limit.
+    """
+
+    def __init__(self, runner: Runner, on_update: UpdateHook, workers: int = 16,
+                 max_depth: int = 1000, lane_depths: Optional[Dict[str, int]] = None,
+                 priorities: Optional[Dict[str, int]] = None):
+        self.runner = runner
+        self.on_update = on_update
+        self.workers = workers
+        self.max_depth = max_depth
+        self.lane_depths = lane_depths or {}
+        self.priorities = priorities or {}
+        self._lanes: Dict[str, Deque[Job]] = {}
+        self._lane_order: List[str] = []
+        self._depth = 0
+        self._running = 0
+        self._available: Optional[asyncio.Semaphore] = None
+        self._waiters: Dict[str, asyncio.Event] = {}
+        self._workers: List[asyncio.Task] = []
+
+    @classmethod
+    def from_env(cls, runner: Runner, on_update: UpdateHook) -> 'TaskQueue':
+        return cls(
+            runner,
+            on_update,
+            workers=int(os.getenv('TASK_WORKERS', '16')),
+            max_depth=int(os.getenv('TASK_QUEUE_DEPTH', '1000')),
+            lane_depths=parse_overrides(os.getenv('TASK_LANE_DEPTHS')),
+            priorities=parse_overrides(os.getenv('TASK_PRIORITIES')),
+        )
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def lane_depth(self, task_type: str) -> int:
+        lane = self._lanes.get(task_type)
+        return len(lane) if lane else 0
+
+    def _lane(self, task_type: str) -> Deque[Job]:
+        lane = self._lanes.get(task_type)
+        if lane is None:
+            lane = self._lanes[task_type] = deque()
+            self._lane_order = sorted(self._lanes, key=lambda name: self.priorities.get(name, 100))
+        return lane
+
+    def submit(self, task_id: str, task_type: str, parameters: Dict[str, Any]) -> int:
+        if self._available is None:
+            raise RuntimeError("TaskQueue.start() has not been called")
+        lane = self._lane(task_type)
+        lane_limit = self.lane_depths.get(task_type, self.max_depth)
+        if self._depth >= self.max_depth or len(lane) >= lane_limit:
+            raise QueueFull(f"Task queue is full for {task_type}")
+        lane.append((task_id, task_type, parameters, time.perf_counter()))
+        self._depth += 1
+        self._waiters[task_id] = asyncio.Event()
+        self._available.release()
+        return len(lane)
+
+    def _next_job(self) -> Job:
+        for name in self._lane_order:
+            lane = self._lanes[name]
+            if lane:
+                self._depth -= 1
+                return lane.popleft()
+        raise RuntimeError("Queue signalled work but every lane is empty")
+
+    def __contains__(self, task_id: str) -> bool:
+        """Whether task_id was submitted to this queue and has not finished."""
+        return task_id in self._waiters
+
+    async def wait(self, task_id: str, timeout: float) -> bool:
+        """Long-poll helper: wait until task_id finishes or timeout passes."""
+        event = self._waiters.get(task_id)
+        if event is None:
+            return True
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _work(self):
+        while True:
+            await self._available.acquire()
+            task_id, task_type, parameters, queued_at = self._next_job()
+            QUEUE_WAIT_SECONDS.labels(task_type).observe(time.perf_counter() - queued_at)
+            self._running += 1
+            self.on_update(task_id, {'status': 'running', 'started_at': _now()})
+            try:
+                result = await self.runner(task_type, parameters)
+                self.on_update(task_id, {'status': 'completed', 'result': result, 'timestamp': _now()})
+            except asyncio.CancelledError:
+                self.on_update(task_id, {'status': 'failed', 'error': 'Cancelled during shutdown', 'timestamp': _now()})
+                raise
+            except Exception as e:
+                logger.error("Queued task failed: %s, error: %s", task_id, e, extra={'task_id': task_id, 'task_type': task_type})
+                self.on_update(task_id, {'status': 'failed', 'error': str(e), 'timestamp': _now()})
+            finally:
+                self._running -= 1
+                event = self._waiters.pop(task_id, None)
+                if event:
+                    event.set()
+
+    async def start(self):
+        self._available = asyncio.Semaphore(0)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
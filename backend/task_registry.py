@@ -0,0 +1,123 @@
+import importlib
+import logging
+import os
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import task_ids
+from mock_responses import mock_email_parse, mock_invoice_generate, mock_lead_score
+
+logger = logging.getLogger(__name__)
+
+MockHandler = Callable[[Dict[str, Any]], Dict[str, Any]]
+CallPredicate = Callable[[Dict[str, Any]], bool]
+
+
+class TaskType:
+    """Everything the pipeline needs to run one kind of automation task.
+
+    route is the URL segment under /tasks/, function_name the Lambda to
+    invoke, local the lambda-functions/ directory holding the same handler
+    for in-process execution, and mock the demo-mode body builder.
+    idempotent task types may be invoked twice for one request (hedged
+    calls, see resilience.py); it defaults to cacheable. pure, when set,
+    is asked per call: calls it rejects, such as ones reading external
+    state, are neither cached nor hedged.
+    """
+
+    __slots__ = ('name', 'route', 'function_name', 'id_prefix', 'local', 'mock', 'cacheable', 'idempotent', 'pure')
+
+    def __init__(self, name: str, route: str, function_name: Optional[str] = None, id_prefix: Optional[str] = None,
+                 local: Optional[str] = None, mock: Optional[MockHandler] = None, cacheable: bool = False,
+                 idempotent: Optional[bool] = None, pure: Optional[CallPredicate] = None):
+        self.name = name
+        self.route = route
+        self.function_name = function_name
+        self.id_prefix = id_prefix or name
+        self.local = local
+        self.mock = mock
+        self.cacheable = cacheable
+        self.idempotent = cacheable if idempotent is None else idempotent
+        self.pure = pure
+
+    def pure_call(self, parameters: Dict[str, Any]) -> bool:
+        """Whether this call may be cached or hedged, on top of the type's own settings."""
+        return self.pure is None or self.pure(parameters)
+
+    def new_task_id(self, batch: bool = False) -> str:
+        return task_ids.new_task_id(f"{self.id_prefix}_batch" if batch else self.id_prefix)
+
+    def __repr__(self) -> str:
+        return f"TaskType({self.name!r}, route={self.route!r}, function_name={self.function_name!r})"
+
+
+class TaskRegistry:
+    def __init__(self):
+        self._by_name: Dict[str, TaskType] = {}
+        self._by_route: Dict[str, TaskType] = {}
+
+    def register(self, task_type: TaskType) -> TaskType:
+        existing = self._by_route.get(task_type.route)
+        if existing is not None and existing.name != task_type.name:
+            raise ValueError(f"Route /tasks/{task_type.route} is already used by {existing.name}")
+        previous = self._by_name.get(task_type.name)
+        if previous is not None:
+            del self._by_route[previous.route]
+        self._by_name[task_type.name] = task_type
+        self._by_route[task_type.route] = task_type
+        return task_type
+
+    def get(self, name: str) -> TaskType:
+        return self._by_name[name]
+
+    def for_route(self, route: str) -> Optional[TaskType]:
+        return self._by_route.get(route)
+
+    def names(self):
+        return list(self._by_name)
+
+    def cacheable(self):
+        return [name for name, task_type in self._by_name.items() if task_type.cacheable]
+
+    def __iter__(self) -> Iterator[TaskType]:
+        return iter(list(self._by_name.values()))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    def load_plugins(self, modules: Optional[str]) -> int:
+        """Import "pkg.module,other" and call each module's register(registry)."""
+        loaded = 0
+        for module_name in (modules or '').split(','):
+            module_name = module_name.strip()
+            if not module_name:
+                continue
+            module = importlib.import_module(module_name)
+            module.register(self)
+            loaded += 1
+            logger.info("Loaded task plugin: %s", module_name)
+        return loaded
+
+
+def _mock_lead_score(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    return mock_lead_score(parameters.get('lead_data', {}).get('company_size', 1500))
+
+
+def _no_archive(parameters: Dict[str, Any]) -> bool:
+    # Archive reads depend on the stored mailbox, not just the parameters,
+    # and a duplicate call would read the whole page twice
+    return 'archive_key' not in parameters
+
+
+def default_registry() -> TaskRegistry:
+    registry = TaskRegistry()
+    # Lead scoring and email parsing are pure functions of their input, so
+    # their results are cached by default; invoice numbers are random
+    registry.register(TaskType('email_parse', 'email-parse', 'email-parser', 'email', local='email-parser',
+                               mock=lambda parameters: mock_email_parse(), cacheable=True,
+                               pure=_no_archive))
+    registry.register(TaskType('invoice_generate', 'invoice-generate', 'invoice-generator', 'invoice',
+                               local='invoice-generator', mock=lambda parameters: mock_invoice_generate()))
+    registry.register(TaskType('lead_score', 'lead-score', 'lead-scorer', 'lead', local='lead-scorer',
+                               mock=_mock_lead_score, cacheable=True))
+    registry.load_plugins(os.getenv('TASK_PLUGINS'))
+    return registry
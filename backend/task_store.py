@@ -0,0 +1,349 @@
+import os
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import task_ids
+from serialization import encoded_size
+
+Record = Dict[str, Any]
+
+BASE_RECORD_SIZE = 256
+
+
+class TaskStore:
+    """Interface shared by the task store backends."""
+
+    def put(self, record: Record) -> None:
+        raise NotImplementedError
+
+    def get(self, task_id: str) -> Optional[Record]:
+        raise NotImplementedError
+
+    def update(self, task_id: str, fields: Record) -> Optional[Record]:
+        raise NotImplementedError
+
+    def delete(self, task_id: str) -> None:
+        raise NotImplementedError
+
+    def list(self, limit: int = 100, cursor: Optional[str] = None, task_type: Optional[str] = None,
+             status: Optional[str] = None, since: Optional[float] = None,
+             until: Optional[float] = None) -> Tuple[List[Record], Optional[str]]:
+        raise NotImplementedError
+
+    async def get_async(self, task_id: str) -> Optional[Record]:
+        """get() for the event loop; stores that read over the network run it on a thread."""
+        return self.get(task_id)
+
+    async def list_async(self, limit: int = 100, cursor: Optional[str] = None, task_type: Optional[str] = None,
+                         status: Optional[str] = None, since: Optional[float] = None,
+                         until: Optional[float] = None) -> Tuple[List[Record], Optional[str]]:
+        return self.list(limit, cursor, task_type, status, since, until)
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+    def load(self) -> int:
+        return 0
+
+    def watch(self, callback: Callable[[str, Optional[str], Record], None]) -> None:
+        """Call callback(task_id, task_type, fields) for changes made by other processes.
+
+        Only stores shared between server processes have any; the callback
+        runs on a background thread.
+        """
+
+    def close(self) -> None:
+        pass
+
+    def __contains__(self, task_id: str) -> bool:
+        return self.get(task_id) is not None
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[int]:
+    """The creation key a list() cursor stands for; ValueError if it is not one."""
+    if not cursor:
+        return None
+    if not cursor.isdigit():
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return int(cursor)
+
+
+def estimate_size(record: Record) -> int:
+    result = record.get('result')
+    if not result:
+        return BASE_RECORD_SIZE
+    # Free for invocation results, which keep their payload bytes
+    return BASE_RECORD_SIZE + encoded_size(result)
+
+
+class _Entry:
+    __slots__ = ('record', 'key', 'expires', 'size')
+
+    def __init__(self, record: Record, key: int, expires: float, size: int):
+        self.record = record
+        self.key = key
+        self.expires = expires
+        self.size = size
+
+
+class _OrderedIndex:
+    """Task ids sorted by creation key.
+
+    Evicted ids are dropped lazily: they stay in the lists until more than
+    half of the entries are stale, then the index is rebuilt in one pass.
+    Status changes and re-puts remove the id eagerly with remove(). A task
+    that is evicted and later put again has the same key, so add() revives
+    its stale entry instead of listing the task twice.
+    """
+
+    __slots__ = ('keys', 'ids', 'head', 'live')
+
+    def __init__(self):
+        self.keys: List[int] = []
+        self.ids: List[str] = []
+        self.head = 0
+        self.live = 0
+
+    def add(self, key: int, task_id: str):
+        if not self.keys or key > self.keys[-1]:
+            self.keys.append(key)
+            self.ids.append(task_id)
+        else:
+            position = max(self.head, bisect_left(self.keys, key))
+            if position == len(self.keys) or self.keys[position] != key:
+                self.keys.insert(position, key)
+                self.ids.insert(position, task_id)
+        self.live += 1
+
+    def remove(self, key: int):
+        position = bisect_left(self.keys, key, self.head)
+        if position < len(self.keys) and self.keys[position] == key:
+            del self.keys[position]
+            del self.ids[position]
+            self.live -= 1
+
+    def discard(self, is_live: Callable[[int, str], bool]):
+        self.live -= 1
+        if len(self.keys) > 64 and len(self.keys) > 2 * self.live:
+            # Entries before head were stale when skipped; a task put again
+            # since then has a new entry past head
+            pairs = [(k, i) for k, i in zip(self.keys[self.head:], self.ids[self.head:]) if is_live(k, i)]
+            self.keys = [k for k, _ in pairs]
+            self.ids = [i for _, i in pairs]
+            self.head = 0
+            self.live = len(pairs)
+
+    def newest_first(self, before: Optional[int] = None, since: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        position = len(self.keys) if before is None else bisect_left(self.keys, before)
+        floor = since if since is not None else -1
+        keys, ids = self.keys, self.ids
+        for index in range(position - 1, self.head - 1, -1):
+            if keys[index] < floor:
+                return
+            yield keys[index], ids[index]
+
+    def oldest(self, is_live: Callable[[int, str], bool]) -> Optional[str]:
+        # Stale entries at the front are skipped once and never rescanned
+        keys, ids = self.keys, self.ids
+        while self.head < len(keys):
+            if is_live(keys[self.head], ids[self.head]):
+                return ids[self.head]
+            self.head += 1
+        return None
+
+
+class MemoryTaskStore(TaskStore):
+    """Bounded in-process task store.
+
+    Entries expire ttl seconds after creation and the least recently used ones are
+    evicted past max_tasks or max_bytes. Listings walk per-type and
+    per-status indexes ordered by creation time, newest first, so a page
+    costs O(page) rather than O(all tasks).
+    """
+
+    def __init__(self, max_tasks: int = 10000, max_bytes: int = 64 * 1024 * 1024, ttl: float = 86400):
+        self.max_tasks = max_tasks
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._bytes = 0
+        self._created = _OrderedIndex()
+        self._by_type: Dict[str, _OrderedIndex] = {}
+        self._by_status: Dict[str, _OrderedIndex] = {}
+        self.evictions = 0
+
+    def _key(self, task_id: str) -> int:
+        # The id's own 128-bit value: creation time first, unique, and the
+        # same on every worker, so tasks loaded from DynamoDB slot into
+        # creation order and the key doubles as a stable pagination cursor.
+        # Ids minted elsewhere are keyed by arrival time instead.
+        key = task_ids.id_value(task_id)
+        return key if key is not None else task_ids.generator.next_value()
+
+    def _is_live(self, key: int, task_id: str) -> bool:
+        entry = self._entries.get(task_id)
+        return entry is not None and entry.key == key
+
+    def _index(self, indexes: Dict[str, _OrderedIndex], value: Optional[str]) -> _OrderedIndex:
+        index = indexes.get(value)
+        if index is None:
+            index = indexes[value] = _OrderedIndex()
+        return index
+
+    def _remove(self, task_id: str):
+        entry = self._entries.pop(task_id)
+        self._bytes -= entry.size
+        record = entry.record
+        self._created.discard(self._is_live)
+        self._by_type[record.get('task_type')].discard(self._is_live)
+        self._by_status[record.get('status')].discard(self._is_live)
+
+    def _unindex(self, task_id: str) -> _Entry:
+        # For a re-put: the same key is added again right away
+        entry = self._entries.pop(task_id)
+        self._bytes -= entry.size
+        record = entry.record
+        self._created.remove(entry.key)
+        self._by_type[record.get('task_type')].remove(entry.key)
+        self._by_status[record.get('status')].remove(entry.key)
+        return entry
+
+    def _evict(self):
+        now = time.time()
+        while True:
+            task_id = self._created.oldest(self._is_live)
+            if task_id is None or self._entries[task_id].expires > now:
+                break
+            self._remove(task_id)
+            self.evictions += 1
+        while self._entries and (len(self._entries) > self.max_tasks or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def put(self, record: Record) -> None:
+        task_id = record['task_id']
+        previous = self._unindex(task_id) if task_id in self._entries else None
+        key = self._key(task_id) if previous is None else previous.key
+        # Expiry counts from creation, so the creation index is also the
+        # expiry order and _evict only ever looks at its oldest end
+        expires = (key >> task_ids.TIME_SHIFT) / 1000 + self.ttl
+        entry = _Entry(record, key, expires, estimate_size(record))
+        self._entries[task_id] = entry
+        self._bytes += entry.size
+        self._created.add(key, task_id)
+        self._index(self._by_type, record.get('task_type')).add(key, task_id)
+        self._index(self._by_status, record.get('status')).add(key, task_id)
+        self._evict()
+
+    def get(self, task_id: str) -> Optional[Record]:
+        entry = self._entries.get(task_id)
+        if entry is None:
+            return None
+        if entry.expires <= time.time():
+            self._remove(task_id)
+            return None
+        self._entries.move_to_end(task_id)
+        return entry.record
+
+    def update(self, task_id: str, fields: Record) -> Optional[Record]:
+        entry = self._entries.get(task_id)
+        if entry is None:
+            return None
+        record = entry.record
+        old_status = record.get('status')
+        record.update(fields)
+        new_status = record.get('status')
+        if new_status != old_status:
+            self._by_status[old_status].remove(entry.key)
+            self._index(self._by_status, new_status).add(entry.key, task_id)
+        if 'result' in fields:
+            size = estimate_size(record)
+            self._bytes += size - entry.size
+            entry.size = size
+        self._entries.move_to_end(task_id)
+        self._evict()
+        return record
+
+    def delete(self, task_id: str) -> None:
+        if task_id in self._entries:
+            self._remove(task_id)
+
+    def list(self, limit: int = 100, cursor: Optional[str] = None, task_type: Optional[str] = None,
+             status: Optional[str] = None, since: Optional[float] = None,
+             until: Optional[float] = None) -> Tuple[List[Record], Optional[str]]:
+        if task_type is not None and status is not None:
+            type_index, status_index = self._by_type.get(task_type), self._by_status.get(status)
+            index = None if not (type_index and status_index) else min(
+                type_index, status_index, key=lambda i: i.live)
+        elif task_type is not None:
+            index = self._by_type.get(task_type)
+        elif status is not None:
+            index = self._by_status.get(status)
+        else:
+            index = self._created
+        if index is None:
+            return [], None
+
+        before = parse_cursor(cursor)
+        if until is not None:
+            until_key = task_ids.time_key(until) + (1 << task_ids.TIME_SHIFT)
+            before = until_key if before is None else min(before, until_key)
+        since_key = task_ids.time_key(since) if since is not None else None
+
+        now = time.time()
+        page: List[Record] = []
+        last_key = None
+        for key, task_id in index.newest_first(before, since_key):
+            entry = self._entries.get(task_id)
+            if entry is None or entry.key != key or entry.expires <= now:
+                continue
+            record = entry.record
+            if task_type is not None and record.get('task_type') != task_type:
+                continue
+            if status is not None and record.get('status') != status:
+                continue
+            if len(page) == limit:
+                return page, str(last_key)
+            page.append(record)
+            last_key = key
+        return page, None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'backend': 'memory',
+            'tasks': len(self._entries),
+            'bytes': self._bytes,
+            'evictions': self.evictions,
+            'by_status': {name: index.live for name, index in self._by_status.items() if index.live},
+            'by_type': {name: index.live for name, index in self._by_type.items() if index.live},
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._entries
+
+
+def memory_store_from_env() -> MemoryTaskStore:
+    return MemoryTaskStore(
+        max_tasks=int(os.getenv('TASK_STORE_MAX_TASKS', '10000')),
+        max_bytes=int(os.getenv('TASK_STORE_MAX_BYTES', str(64 * 1024 * 1024))),
+        ttl=float(os.getenv('TASK_TTL_SECONDS', '86400')),
+    )
+
+
+def create_task_store() -> TaskStore:
+    backend = os.getenv('TASK_STORE', 'memory')
+    if backend == 'memory':
+        return memory_store_from_env()
+    if backend == 'dynamodb':
+        from dynamo_store import DynamoTaskStore
+        return DynamoTaskStore.from_env(cache=memory_store_from_env())
+    if backend == 'shared':
+        # Set by serve.py for its workers: one store hosted by the launcher
+        from shared_store import SharedTaskStore
+        return SharedTaskStore.from_env()
+    raise ValueError(f"Unknown TASK_STORE backend: {backend}")
@@ -0,0 +1,36 @@
+import importlib.util
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT_DIR, 'backend')
+LAMBDA_DIR = os.path.join(ROOT_DIR, 'lambda-functions')
+
+
+def use_backend():
+    # backend/ is run as a flat directory (uvicorn main:app), not a package
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+
+
+def load_lambda(function_name, module='lambda_function'):
+    """Import a module from lambda-functions/<function_name> under a unique name."""
+    directory = os.path.join(LAMBDA_DIR, function_name)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    name = f"{function_name.replace('-', '_')}_{module}"
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(directory, f"{module}.py"))
+    loaded = importlib.util.module_from_spec(spec)
+    sys.modules[name] = loaded
+    spec.loader.exec_module(loaded)
+    return loaded
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
@@ -0,0 +1,117 @@
+"""Lambda cold starts: init and per-invocation duration in fresh interpreters.
+
+    python -m benchmarks.cold_start
+    python -m benchmarks.cold_start --baseline <git ref from before a change>
+
+Each repeat copies a handler directory, starts a new Python process,
+imports lambda_function (init) and times the first invocation and --warm
+more, the way one Lambda container would. "source" runs ship no bytecode,
+like a plain asset zip on the read-only /var/task; "bytecode" runs are
+precompiled the way infrastructure/ now bundles the functions. The
+runtime's own imports (json, logging, time) are loaded before the clock
+starts, as in Lambda. With --baseline the handlers at that git ref are
+measured too.
+"""
+import argparse
+import compileall
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks import LAMBDA_DIR, ROOT_DIR
+from benchmarks.data import email_event, lead_batch, lead_event, synthetic_invoice
+from benchmarks.results import write_results
+
+CHILD = r'''
+import json, logging, sys, time
+directory, warm = sys.argv[1], int(sys.argv[2])
+event = json.loads(sys.stdin.read())
+logging.disable(logging.CRITICAL)
+
+class Context:
+    aws_request_id = 'cold-start'
+    function_name = 'cold-start'
+
+started = time.perf_counter()
+sys.path.insert(0, directory)
+import lambda_function
+init = time.perf_counter() - started
+started = time.perf_counter()
+response = lambda_function.lambda_handler(event, Context())
+first = time.perf_counter() - started
+assert response['statusCode'] == 200, response
+started = time.perf_counter()
+for _ in range(warm):
+    lambda_function.lambda_handler(event, Context())
+print(json.dumps({'init': init, 'first': first, 'warm': (time.perf_counter() - started) / max(warm, 1)}))
+'''
+
+
+def cases():
+    yield 'email-parser', 'email-parser', email_event(0.004)
+    yield 'invoice-generator', 'invoice-generator', synthetic_invoice(10)
+    yield 'lead-scorer', 'lead-scorer', lead_event()
+    yield 'lead-scorer[batch 100]', 'lead-scorer', lead_batch(100)
+
+
+def checkout(ref, destination):
+    """Extract lambda-functions/ as of a git ref."""
+    archive = subprocess.run(['git', 'archive', ref, 'lambda-functions'], cwd=ROOT_DIR,
+                             check=True, capture_output=True).stdout
+    os.makedirs(destination)
+    subprocess.run(['tar', '-x', '-C', destination], input=archive, check=True)
+    return os.path.join(destination, 'lambda-functions')
+
+
+def prepare(source, destination, bytecode):
+    shutil.copytree(source, destination, ignore=shutil.ignore_patterns('__pycache__'))
+    if bytecode:
+        compileall.compile_dir(destination, quiet=1,
+                               invalidation_mode=compileall.py_compile.PycInvalidationMode.UNCHECKED_HASH)
+    return destination
+
+
+def run(directory, event, warm):
+    # -B: a source-only copy must stay without bytecode across repeats
+    output = subprocess.run([sys.executable, '-B', '-c', CHILD, directory, str(warm)], input=json.dumps(event),
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def main(args):
+    trees = [('current', LAMBDA_DIR)]
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.baseline:
+            trees.insert(0, (args.baseline, checkout(args.baseline, os.path.join(scratch, 'baseline'))))
+        print(f"{'case':<52}{'init':>10}{'first call':>12}{'warm call':>12}")
+        for number, (name, function, event) in enumerate(cases()):
+            for tree, root in trees:
+                for mode in ('source', 'bytecode'):
+                    samples = []
+                    for repeat in range(args.repeat):
+                        copy = os.path.join(scratch, f"{number}-{tree.replace('/', '_')}-{mode}-{repeat}")
+                        samples.append(run(prepare(os.path.join(root, function), copy, mode == 'bytecode'),
+                                           event, args.warm))
+                    summary = {key: round(statistics.median(sample[key] for sample in samples) * 1000, 3)
+                               for key in ('init', 'first', 'warm')}
+                    case = f"{name} {tree} {mode}"
+                    results[case] = summary
+                    print(f"{case:<52}{summary['init']:>8.1f}ms{summary['first']:>10.2f}ms{summary['warm']:>10.3f}ms")
+    if not args.no_save:
+        write_results('cold_start', results, args.output,
+                      settings={'repeat': args.repeat, 'warm': args.warm, 'baseline': args.baseline})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--baseline', help='git ref whose handlers are measured for comparison')
+    parser.add_argument('--repeat', type=int, default=5, help='fresh processes per case (median reported)')
+    parser.add_argument('--warm', type=int, default=200, help='warm invocations timed after the first')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/cold_start-<time>.json)')
+    parser.add_argument('--no-save', action='store_true')
+    main(parser.parse_args())
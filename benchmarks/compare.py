@@ -0,0 +1,36 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python -m benchmarks.compare before.json after.json --threshold 0.10
+
+Exits with status 1 when any case lost more than the threshold in
+throughput or gained more than it in p95 latency.
+"""
+import argparse
+
+from benchmarks.results import compare, load_results
+
+
+def main(args):
+    baseline, current = load_results(args.baseline), load_results(args.current)
+    if baseline['suite'] != current['suite']:
+        raise SystemExit(f"cannot compare a {baseline['suite']} run with a {current['suite']} run")
+    rows = compare(baseline, current, args.threshold)
+    print(f"{'case':<44}{'metric':>12}{'before':>12}{'after':>12}{'change':>9}")
+    for case, metric, before, after, change, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{case:<44}{metric:>12}{before:>12,.3f}{after:>12,.3f}{change:>+9.1%}{flag}")
+    regressions = sum(1 for row in rows if row[-1])
+    only_before = sorted(set(baseline['results']) - set(current['results']))
+    if only_before:
+        print(f"missing from the new run: {', '.join(only_before)}")
+    print(f"{regressions} regressions beyond {args.threshold:.0%} "
+          f"({baseline['environment'].get('git_revision')} -> {current['environment'].get('git_revision')})")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed change as a fraction')
+    raise SystemExit(main(parser.parse_args()))
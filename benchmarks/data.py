@@ -0,0 +1,186 @@
+"""Seeded synthetic inputs for the benchmarks.
+
+Sizes follow what the integrations actually send: most emails are a few
+KB with a long tail of multi-MB reply threads, most invoices have a
+handful of lines, and lead imports arrive in batches.
+"""
+import random
+
+WORDS = ('the project update meeting schedule review budget please confirm thanks regards '
+         'team client deliverable quarter invoice deadline status notes').split()
+
+# (label, size in MB) from a one-line note to a long forwarded thread
+EMAIL_SIZES = (('tiny', 0.0002), ('typical', 0.004), ('large', 0.25), ('huge', 4))
+INVOICE_LINES = (1, 10, 100, 1000, 10000)
+LEAD_BATCHES = (1, 100, 1000, 10000)
+
+INDUSTRIES = ['technology', 'Finance ', 'HEALTHCARE', 'retail', 'manufacturing', '', 'education']
+ENGAGEMENT = ['low', 'medium', 'high', 'HIGH ', 'unknown', None]
+PRODUCTS = ('Consulting hours', 'Website redesign', 'Hosting (monthly)', 'Support retainer',
+            'Data migration', 'Training session', 'License seat', 'Travel expenses')
+
+
+def synthetic_email(size_mb, seed=1, urgent=False):
+    """A long reply thread: headers, then mostly quoted text with a few markers."""
+    rng = random.Random(seed)
+    lines = ['From: Sarah Johnson <sarah.johnson@techcorp.com>', 'Subject: Re: Project sync',
+             'Date: Mon, 15 Jan 2024 14:30:00 +0000', '']
+    size = sum(len(line) + 1 for line in lines)
+    while size < size_mb * 1024 * 1024:
+        roll = rng.random()
+        if roll < 0.01:
+            line = 'TODO: ' + ' '.join(rng.choices(WORDS, k=6))
+        elif roll < 0.015:
+            line = '> Follow up: ' + ' '.join(rng.choices(WORDS, k=5))
+        elif roll < 0.02:
+            line = f'Attachment: report_{rng.randrange(10000)}.pdf'
+        elif roll < 0.03:
+            line = f'> On Mon, Jan 15, 2024 at 10:{rng.randrange(60):02d} AM Alex wrote:'
+        else:
+            line = ('> ' if roll < 0.6 else '') + ' '.join(rng.choices(WORDS, k=12))
+        lines.append(line)
+        size += len(line) + 1
+    if urgent:
+        lines.append('This is urgent.')
+    return '\n'.join(lines)
+
+
+def email_thread(replies, seed=1, lines=20, outlook=False):
+    """Every message of a reply chain, each quoting the whole thread before it.
+
+    Gmail-style replies quote with "> " under an "On ... wrote:" line;
+    outlook=True appends the previous message below an Original Message
+    separator instead.
+    """
+    rng = random.Random(seed)
+    people = ('Sarah Johnson', 'Alex Chen', 'Priya Patel', 'Tom Becker')
+    messages = []
+    body = ''
+    for reply in range(replies):
+        sender = people[reply % len(people)]
+        headers = [f'From: {sender} <{sender.split()[0].lower()}@example.com>', 'Subject: Re: Project sync',
+                   f'Date: Mon, 15 Jan 2024 {8 + reply // 60:02d}:{reply % 60:02d}:00 +0000']
+        text = []
+        for _ in range(lines):
+            roll = rng.random()
+            if roll < 0.08:
+                text.append('TODO: ' + ' '.join(rng.choices(WORDS, k=5)))
+            elif roll < 0.12:
+                text.append('Follow up: ' + ' '.join(rng.choices(WORDS, k=4)))
+            elif roll < 0.14:
+                text.append(f'Attachment: notes_{reply}_{rng.randrange(100)}.pdf')
+            else:
+                text.append(' '.join(rng.choices(WORDS, k=12)))
+        if reply == replies // 2:
+            text.append('This is urgent.')
+        if body and outlook:
+            text += ['', '-----Original Message-----', *messages[-1].split('\n')]
+        elif body:
+            text += ['', f'On Mon, Jan 15, 2024, {people[(reply - 1) % len(people)]} wrote:']
+            text += [f'> {line}' if line else '>' for line in body.split('\n')]
+        body = '\n'.join(text)
+        messages.append('\n'.join(headers + [''] + text))
+    return messages
+
+
+def random_lead(rng, edge_cases=False):
+    lead = {
+        'company_size': rng.choice([rng.randint(0, 5000), 10, 11, 100, 101, 1000, 1001]),
+        'industry': rng.choice(INDUSTRIES),
+        'budget': rng.choice([rng.uniform(0, 250000), 10000, 10000.01, 50000, 100000, 100001]),
+        'engagement_level': rng.choice(ENGAGEMENT),
+        'is_decision_maker': rng.choice([True, False, 0, 1, 'yes', '']),
+    }
+    if edge_cases:
+        field = rng.choice(['company_size', 'budget', 'drop', 'none'])
+        if field == 'company_size':
+            lead['company_size'] = rng.choice([-1, '250', '12.5', None, 10 ** 30, True])
+        elif field == 'budget':
+            lead['budget'] = rng.choice([-5, '75000', 'abc', float('nan'), float('inf'), None])
+        elif field == 'drop':
+            lead.pop(rng.choice(list(lead)))
+    return lead
+
+
+def synthetic_invoice(lines, seed=1):
+    """Parameters for generate_invoice with the given number of line items."""
+    rng = random.Random(seed)
+    return {
+        'client_info': {
+            'name': f'Client {rng.randrange(1000)}',
+            'email': 'billing@example.com',
+            'address': '123 Business St, City, ST 12345',
+        },
+        'items': [
+            {
+                'description': rng.choice(PRODUCTS),
+                'quantity': rng.choice([1, 1, 2, 5, 10, 0.5, 37.5]),
+                'price': round(rng.uniform(5, 2500), 2),
+            }
+            for _ in range(lines)
+        ],
+    }
+
+
+def usage_items(count, seed=1):
+    """Metered line items: few distinct sub-cent unit prices, many lines."""
+    rng = random.Random(seed)
+    prices = [0.0125, 0.003, 0.25, 1.99, 0.0004, 12.5]
+    return [
+        {'description': 'API usage', 'quantity': rng.randint(1, 5000), 'price': rng.choice(prices)}
+        for _ in range(count)
+    ]
+
+
+def random_invoice_item(rng):
+    """An item with any mix of int, float, long-decimal and string amounts."""
+    kind = rng.random()
+    if kind < 0.3:
+        quantity, price = rng.randint(1, 1000), rng.randint(0, 500)
+    elif kind < 0.6:
+        quantity, price = rng.randint(1, 50), round(rng.uniform(0, 999), 2)
+    elif kind < 0.8:
+        quantity, price = round(rng.uniform(0.001, 100), 3), round(rng.uniform(0, 10), 6)
+    elif kind < 0.9:
+        quantity, price = rng.uniform(0.0001, 10), rng.uniform(0, 100)
+    else:
+        quantity, price = f'{rng.randint(1, 9)}.5', f'{rng.uniform(0, 3):.4f}'
+    return {'description': rng.choice(PRODUCTS), 'quantity': quantity, 'price': price}
+
+
+def email_event(size_mb, seed=1):
+    return {'email_content': synthetic_email(size_mb, seed)}
+
+
+def lead_event(seed=1):
+    return {'lead_data': random_lead(random.Random(seed))}
+
+
+def lead_batch(count, seed=1):
+    rng = random.Random(seed)
+    return {'records': [{'lead_data': random_lead(rng)} for _ in range(count)]}
+
+
+def mixed_email_size(rng):
+    """Draw an email size with a realistic long tail (mostly small messages)."""
+    roll = rng.random()
+    if roll < 0.6:
+        return EMAIL_SIZES[0][1]
+    if roll < 0.95:
+        return EMAIL_SIZES[1][1]
+    return EMAIL_SIZES[2][1]
+
+
+def api_payloads(task_type, count, seed=1):
+    """Request bodies for POST /tasks/*, each distinct so caches do not skew results."""
+    rng = random.Random(seed)
+    payloads = []
+    for index in range(count):
+        if task_type == 'email_parse':
+            parameters = email_event(mixed_email_size(rng), seed=seed + index)
+        elif task_type == 'invoice_generate':
+            parameters = synthetic_invoice(rng.choice([1, 2, 3, 5, 10, 25]), seed=seed + index)
+        else:
+            parameters = {'lead_data': random_lead(rng)}
+        payloads.append({'task_type': task_type, 'parameters': parameters})
+    return payloads
@@ -0,0 +1,68 @@
+"""Load test for backend/dispatcher.py against a stub Lambda.
+
+Compares calling the blocking client straight from coroutines (the old
+handler behaviour) with the pooled dispatcher at rising concurrency.
+
+    python -m benchmarks.dispatcher_load --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks import percentile, use_backend
+from benchmarks.stub_lambda import StubLambdaClient
+
+use_backend()
+from dispatcher import LambdaDispatcher  # noqa: E402
+
+
+async def _blocking_call(client, payload):
+    response = client.invoke(FunctionName='lead-scorer', Payload=json.dumps(payload))
+    return json.loads(response['Payload'].read())
+
+
+async def _run(concurrency, call, requests):
+    latencies = []
+
+    async def one(arrived):
+        await call()
+        latencies.append(time.perf_counter() - arrived)
+
+    started = time.perf_counter()
+    for offset in range(0, requests, concurrency):
+        # A burst of requests arrives together; latency counts from arrival
+        arrived = time.perf_counter()
+        await asyncio.gather(*(one(arrived) for _ in range(min(concurrency, requests - offset))))
+    elapsed = time.perf_counter() - started
+    return {
+        'concurrency': concurrency,
+        'throughput_rps': requests / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+async def main(args):
+    client = StubLambdaClient(latency=args.latency)
+    dispatcher = LambdaDispatcher(client, max_workers=max(args.levels), default_limit=max(args.levels))
+    payload = {'lead_data': {'company_size': 500}}
+    print(f"{'mode':<10}{'conc':>6}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for concurrency in args.levels:
+        requests = concurrency * args.rounds
+        for mode, call in (
+            ('blocking', lambda: _blocking_call(client, payload)),
+            ('pooled', lambda: dispatcher.invoke('lead-scorer', payload)),
+        ):
+            row = await _run(concurrency, call, requests)
+            print(f"{mode:<10}{concurrency:>6}{row['throughput_rps']:>10.1f}"
+                  f"{row['p50_ms']:>10.1f}{row['p99_ms']:>10.1f}")
+    dispatcher.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.05, help='stub Lambda latency in seconds')
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--rounds', type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,56 @@
+"""Single-pass email scanner vs the per-field regex extractors.
+
+    python -m benchmarks.email_scanner --sizes 0.01 1 4
+"""
+import argparse
+import time
+
+from benchmarks import load_lambda
+from benchmarks.data import synthetic_email
+
+parser_module = load_lambda('email-parser')
+scanner = load_lambda('email-parser', 'email_scanner')
+
+def legacy_parse(content):
+    return {
+        'sender': parser_module.extract_sender(content),
+        'subject': parser_module.extract_subject(content),
+        'date': parser_module.extract_date(content),
+        'attachments': parser_module.extract_attachments(content),
+        'action_items': sorted(parser_module.extract_action_items(content)),
+        'priority': parser_module.determine_priority(content),
+    }
+
+
+def scanned_parse(content):
+    result = scanner.scan(content)
+    result['action_items'] = sorted(set(result['action_items']))
+    return result
+
+
+def best_of(func, content, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(content)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main(args):
+    print(f"{'size MB':>8}{'legacy ms':>12}{'scan ms':>10}{'speedup':>9}")
+    for size_mb in args.sizes:
+        content = synthetic_email(size_mb, urgent=True)
+        legacy_time, expected = best_of(legacy_parse, content, args.repeat)
+        scan_time, actual = best_of(scanned_parse, content, args.repeat)
+        if expected != actual:
+            raise SystemExit(f"scanner disagrees with legacy extractors at {size_mb} MB")
+        print(f"{len(content) / 1048576:>8.2f}{legacy_time * 1000:>12.2f}{scan_time * 1000:>10.2f}"
+              f"{legacy_time / scan_time:>8.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=float, nargs='+', default=[0.01, 1, 4])
+    parser.add_argument('--repeat', type=int, default=3)
+    main(parser.parse_args())
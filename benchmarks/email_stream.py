@@ -0,0 +1,58 @@
+"""Peak memory of the streaming mbox parser as the archive grows.
+
+    python -m benchmarks.email_stream --messages 100 400 --attachment-kb 256
+"""
+import argparse
+import email.message
+import mailbox
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import load_lambda
+
+stream = load_lambda('email-parser', 'email_stream')
+
+
+def write_mbox(path, messages, attachment_kb, seed=1):
+    archive = mailbox.mbox(path)
+    payload = os.urandom(attachment_kb * 1024)
+    for i in range(messages):
+        message = email.message.EmailMessage()
+        message['From'] = f'Client {i} <client{i}@example.com>'
+        message['Subject'] = f'Weekly report {i}' + (' - urgent' if i % 10 == 0 else '')
+        message['Date'] = 'Mon, 15 Jan 2024 14:30:00 +0000'
+        message.set_content(f'Hi team,\nTODO: review report {i}\nFollow up: schedule call\n')
+        message.add_attachment(payload, maintype='application', subtype='pdf', filename=f'report_{i}.pdf')
+        archive.add(message)
+    archive.flush()
+    archive.close()
+
+
+def main(args):
+    print(f"{'messages':>9}{'mbox MB':>9}{'seconds':>9}{'peak KB':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for messages in args.messages:
+            path = os.path.join(directory, f'{messages}.mbox')
+            write_mbox(path, messages, args.attachment_kb)
+            tracemalloc.start()
+            start = time.perf_counter()
+            parsed = 0
+            for record in stream.iter_mbox(path):
+                if record['attachments'] != [f'report_{parsed}.pdf']:
+                    raise SystemExit(f"message {parsed}: unexpected attachments {record['attachments']}")
+                parsed += 1
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            if parsed != messages:
+                raise SystemExit(f"parsed {parsed} of {messages} messages")
+            print(f"{messages:>9}{os.path.getsize(path) / 1048576:>9.1f}{elapsed:>9.2f}{peak / 1024:>9.0f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, nargs='+', default=[100, 400])
+    parser.add_argument('--attachment-kb', type=int, default=256)
+    main(parser.parse_args())
@@ -0,0 +1,77 @@
+"""Parsing every reply of a growing thread: full scans vs the thread-aware scanner.
+
+    python -m benchmarks.email_threads --replies 50 100 200
+    python -m benchmarks.email_threads --outlook
+
+Each reply quotes the whole thread before it, so a full scan of reply N
+reads all N messages again while scan_thread only scans the new text and
+reuses the cached results for the quoted history. Results are checked
+against the full scan (action items de-duplicated in document order).
+"""
+import argparse
+import time
+
+from benchmarks import load_lambda
+from benchmarks.data import email_thread
+from benchmarks.results import write_results
+
+scanner = load_lambda('email-parser', 'email_scanner')
+threads = load_lambda('email-parser', 'email_threads')
+
+
+def full_scan(content):
+    result = scanner.scan(content)
+    result['action_items'] = list(dict.fromkeys(result['action_items']))
+    return result
+
+
+def parse_all(func, messages):
+    started = time.perf_counter()
+    last = 0.0
+    results = []
+    for message in messages:
+        message_started = time.perf_counter()
+        results.append(func(message))
+        last = time.perf_counter() - message_started
+    return time.perf_counter() - started, last, results
+
+
+def main(args):
+    results = {}
+    print(f"{'replies':>8}{'thread KB':>11}{'full total':>12}{'thread total':>14}"
+          f"{'full last':>11}{'thread last':>13}{'speedup':>9}{'hit rate':>10}")
+    for replies in args.replies:
+        messages = email_thread(replies, args.seed, args.lines, args.outlook)
+        threads.clear()
+        full_total, full_last, expected = parse_all(full_scan, messages)
+        thread_total, thread_last, actual = parse_all(threads.scan_thread, messages)
+        for index, (want, got) in enumerate(zip(expected, actual)):
+            if want != got:
+                raise SystemExit(f"thread-aware result differs from the full scan at reply {index}")
+        stats = threads.stats
+        hit_rate = stats['hits'] / stats['lookups'] if stats['lookups'] else 0.0
+        results[f"replies={replies}"] = {
+            'thread_kb': round(len(messages[-1]) / 1024, 1),
+            'full_total_ms': round(full_total * 1000, 3),
+            'thread_total_ms': round(thread_total * 1000, 3),
+            'full_last_ms': round(full_last * 1000, 3),
+            'thread_last_ms': round(thread_last * 1000, 3),
+            'hit_rate': round(hit_rate, 3),
+        }
+        print(f"{replies:>8}{len(messages[-1]) / 1024:>11.1f}{full_total * 1000:>10.1f}ms{thread_total * 1000:>12.1f}ms"
+              f"{full_last * 1000:>9.2f}ms{thread_last * 1000:>11.2f}ms{full_total / thread_total:>8.1f}x"
+              f"{hit_rate:>10.0%}")
+    if not args.no_save:
+        settings = {key: value for key, value in vars(args).items() if key not in ('output', 'no_save')}
+        write_results('email_threads', results, args.output, settings=settings)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--replies', type=int, nargs='+', default=[20, 50, 100, 200])
+    parser.add_argument('--lines', type=int, default=20, help='new lines per reply')
+    parser.add_argument('--outlook', action='store_true', help='separator-style replies instead of "> " quoting')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='result file (default: benchmarks/results/email_threads-<time>.json)')
+    parser.add_argument('--no-save', action='store_true')
+    main(parser.parse_args())
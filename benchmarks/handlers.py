@@ -0,0 +1,78 @@
+"""Micro-benchmarks for the three Lambda handlers and their helpers.
+
+    python -m benchmarks.handlers                  # full suite
+    python -m benchmarks.handlers --quick          # skips the multi-MB / 10k cases
+    python -m benchmarks.handlers --filter invoice --output before.json
+"""
+import argparse
+import logging
+
+from benchmarks import load_lambda
+from benchmarks.data import (EMAIL_SIZES, INVOICE_LINES, LEAD_BATCHES, email_event, lead_batch, lead_event,
+                             synthetic_invoice)
+from benchmarks.results import measure, print_header, print_summary, write_results
+
+email_parser = load_lambda('email-parser')
+email_scanner = load_lambda('email-parser', 'email_scanner')
+invoice_generator = load_lambda('invoice-generator')
+lead_scorer = load_lambda('lead-scorer')
+lead_columnar = load_lambda('lead-scorer', 'lead_columnar')
+
+# Cases skipped by --quick
+SLOW_CASES = ('huge', '10000]')
+
+
+class FakeContext:
+    aws_request_id = 'benchmark'
+    function_name = 'benchmark'
+
+
+def cases():
+    """Yield (name, zero-argument callable) pairs; inputs are built up front."""
+    context = FakeContext()
+    for label, size_mb in EMAIL_SIZES:
+        event = email_event(size_mb)
+        content = event['email_content']
+        yield f'email.lambda_handler[{label}]', lambda event=event: email_parser.lambda_handler(event, context)
+        yield f'email.scan[{label}]', lambda content=content: email_scanner.scan(content)
+
+    for lines in INVOICE_LINES:
+        event = synthetic_invoice(lines)
+        yield f'invoice.lambda_handler[{lines}]', lambda event=event: invoice_generator.lambda_handler(event, context)
+        yield f'invoice.generate_invoice[{lines}]', lambda event=event: invoice_generator.generate_invoice(
+            event['client_info'], event['items'])
+
+    event = lead_event()
+    yield 'lead.lambda_handler[1]', lambda: lead_scorer.lambda_handler(event, context)
+    yield 'lead.calculate_lead_score[1]', lambda: lead_scorer.calculate_lead_score(event['lead_data'])
+    for count in LEAD_BATCHES[1:]:
+        batch = lead_batch(count)
+        leads = [record['lead_data'] for record in batch['records']]
+        yield f'lead.lambda_handler[batch {count}]', lambda batch=batch: lead_scorer.lambda_handler(batch, context)
+        yield f'lead.score_leads[{count}]', lambda leads=leads: lead_columnar.score_leads(leads)
+
+
+def main(args):
+    logging.disable(logging.CRITICAL)  # the handlers log every invocation
+    results = {}
+    print_header()
+    for name, func in cases():
+        if args.filter and not any(term in name for term in args.filter):
+            continue
+        if args.quick and any(marker in name for marker in SLOW_CASES):
+            continue
+        func()  # warm up caches (rules file, compiled regexes)
+        results[name] = summary = measure(func, min_time=args.min_time)
+        print_summary(name, summary)
+    if not args.no_save:
+        write_results('handlers', results, args.output, settings={'min_time': args.min_time, 'quick': args.quick})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quick', action='store_true')
+    parser.add_argument('--filter', nargs='*', help='only run cases containing one of these substrings')
+    parser.add_argument('--min-time', type=float, default=0.5, help='seconds to spend on each case')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/handlers-<time>.json)')
+    parser.add_argument('--no-save', action='store_true')
+    main(parser.parse_args())
@@ -0,0 +1,74 @@
+"""Streaming invoice export vs building the whole invoice, by peak memory and time.
+
+    python -m benchmarks.invoice_export --lines 50000
+
+"generate" is what exporting meant before: generate_invoice's full dict
+with every item, encoded as one JSON document. The export rows stream the
+same invoice through backend/invoice_export.py; peak is the tracemalloc
+high-water mark, first chunk the time until the first bytes are ready.
+"""
+import argparse
+import json
+import logging
+import time
+import tracemalloc
+
+from benchmarks import load_lambda, use_backend
+from benchmarks.data import usage_items
+
+use_backend()
+
+import invoice_export  # noqa: E402
+
+invoice_generator = load_lambda('invoice-generator')
+
+CLIENT = {'name': 'Benchmark Client', 'country': 'US', 'state': 'CA'}
+
+
+def generate(invoice):
+    started = time.perf_counter()
+    data = json.dumps(invoice_generator.generate_invoice(invoice['client_info'], invoice['items'])).encode()
+    return time.perf_counter() - started, len(data)
+
+
+def export(invoice, fmt):
+    started = time.perf_counter()
+    first = None
+    size = 0
+    for chunk in invoice_export.render_invoices([invoice], fmt):
+        if first is None:
+            first = time.perf_counter() - started
+        size += len(chunk)
+    return first, size
+
+
+def traced(func):
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        first, size = func()
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return first, elapsed, size, peak
+
+
+def main(args):
+    logging.disable(logging.CRITICAL)
+    invoice = {'client_info': CLIENT, 'items': usage_items(args.lines, args.seed)}
+    export(invoice, 'csv')  # load the engine and tax table outside the measurement
+    print(f"{args.lines:,} line items")
+    print(f"{'path':<16}{'first chunk':>14}{'total':>10}{'output':>12}{'peak':>12}")
+    cases = [('generate+json', lambda: generate(invoice))]
+    cases += [(f"export {fmt}", lambda fmt=fmt: export(invoice, fmt)) for fmt in invoice_export.RENDERERS]
+    for label, func in cases:
+        first, elapsed, size, peak = traced(func)
+        print(f"{label:<16}{first * 1000:>12.1f}ms{elapsed:>9.2f}s{size / 2 ** 20:>10.1f}MB{peak / 2 ** 20:>10.1f}MB")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=7)
+    main(parser.parse_args())
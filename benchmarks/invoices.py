@@ -0,0 +1,100 @@
+"""Bulk invoice engine: exactness check and throughput up to 1M line items.
+
+    python -m benchmarks.invoices --verify 200000 --lines 1000000
+
+--verify totals random items (ints, 2- and 6-decimal floats, long floats,
+strings) with both the exact loop and the NumPy path and compares every
+line against Decimal arithmetic rounded half-up.
+"""
+import argparse
+import logging
+import random
+import time
+from decimal import ROUND_HALF_UP, Decimal
+
+from benchmarks import load_lambda
+from benchmarks.data import random_invoice_item, synthetic_invoice, usage_items
+
+invoice_generator = load_lambda('invoice-generator')
+engine_module = load_lambda('invoice-generator', 'invoice_engine')
+
+CLIENT = {'name': 'Benchmark Client', 'country': 'US', 'state': 'CA'}
+CENT = Decimal('0.01')
+
+
+def decimal_cents(item):
+    quantity, price = (Decimal(repr(value) if isinstance(value, float) else str(value))
+                       for value in (item['quantity'], item['price']))
+    return int((quantity * price).quantize(CENT, rounding=ROUND_HALF_UP) * 100)
+
+
+def float_subtotal(items):
+    # What generate_invoice used to do: float maths, rounded per line
+    subtotal = 0
+    for item in items:
+        subtotal += round(float(item['quantity']) * float(item['price']), 2)
+    return subtotal
+
+
+def verify(count, seed):
+    rng = random.Random(seed)
+    items = [random_invoice_item(rng) for _ in range(count)]
+    expected = [decimal_cents(item) for item in items]
+    engine = engine_module.InvoiceEngine()
+    loop = [engine.line_cents(item) for item in items]
+    ok = loop == expected
+    print(f"exact loop vs Decimal on {count} items: {'ok' if ok else 'MISMATCH'}")
+    if engine_module.load_numpy() is not None:
+        numeric = [index for index, item in enumerate(items)
+                   if not isinstance(item['quantity'], str) and not isinstance(item['price'], str)]
+        vector = engine_module.InvoiceEngine()._vector_cents([items[index] for index in numeric])
+        vector_ok = vector == [expected[index] for index in numeric]
+        print(f"NumPy path vs Decimal on {len(numeric)} numeric items: {'ok' if vector_ok else 'MISMATCH'}")
+        ok = ok and vector_ok
+    drift = sum(expected) / 100 - float_subtotal(items)
+    print(f"float per-line rounding drifts {drift:+,.2f} from the exact subtotal")
+    return ok
+
+
+def rate(label, count, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<48}{count / elapsed:>14,.0f} lines/sec{elapsed:>10.3f}s")
+
+
+def benchmark(lines, invoices, seed):
+    items = usage_items(lines, seed)
+    installed = engine_module.load_numpy()
+    engines = [('exact loop', None)]
+    if installed is not None:
+        engines.append(('NumPy', installed))
+    print(f"{lines:,} usage line items")
+    rate('float loop (previous generate_invoice maths)', lines, lambda: float_subtotal(items))
+    try:
+        for label, np in engines:
+            engine_module.np = np
+            rate(f'{label}: invoice totals only', lines,
+                 lambda: engine_module.InvoiceEngine().invoice(CLIENT, items, include_items=False))
+            rate(f'{label}: invoice with line items', lines,
+                 lambda: engine_module.InvoiceEngine().invoice(CLIENT, items))
+    finally:
+        engine_module.np = installed
+
+    records = [dict(synthetic_invoice(10, seed=seed + index), client_info=dict(CLIENT)) for index in range(invoices)]
+    rate(f'process_batch: {invoices:,} invoices x 10 lines', invoices * 10,
+         lambda: invoice_generator.process_batch(records))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--verify', type=int, default=200000, help='random items to cross-check (0 to skip)')
+    parser.add_argument('--lines', type=int, default=1_000_000)
+    parser.add_argument('--invoices', type=int, default=10000, help='invoices per process_batch call')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    if args.verify and not verify(args.verify, args.seed):
+        raise SystemExit(1)
+    if args.lines:
+        benchmark(args.lines, args.invoices, args.seed)
@@ -0,0 +1,123 @@
+"""Top-K, counts and incremental rescoring with backend/lead_index.py.
+
+    python -m benchmarks.lead_index --leads 1000000
+    python -m benchmarks.lead_index --leads 200000 --no-verify
+
+Indexes --leads synthetic leads, times the /leads queries, then applies a
+series of rule changes. Each incremental rescore is compared with
+rescoring every lead from scratch (score_leads over all of them, what
+replaying the stored tasks would cost) and, unless --no-verify, checked
+against it lead by lead.
+"""
+import argparse
+import copy
+import json
+import logging
+import random
+import statistics
+import time
+
+from benchmarks import use_backend
+from benchmarks.data import random_lead
+from benchmarks.results import write_results
+
+use_backend()
+from lead_index import LeadIndex, load_scorer  # noqa: E402
+
+lead_rules, lead_columnar = load_scorer()
+
+# Applied in order, each on top of the previous one
+RULE_CHANGES = (
+    ('large company above 1200', lambda rules: rules['company_size']['tiers'][2].update(above=1200)),
+    ('medium budget +30', lambda rules: rules['budget']['tiers'][1].update(points=30)),
+    ('retail high-value', lambda rules: rules['industry']['high_value'].append('retail')),
+    ('warm from 55', lambda rules: rules['quality']['bands'][1].update(min_score=55)),
+    ('high engagement +25', lambda rules: rules['engagement']['levels']['high'].update(points=25)),
+    ('enterprise tier', lambda rules: rules['company_size']['tiers'].append(
+        {'above': 3000, 'points': 35, 'label': 'Enterprise company'})),
+)
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def main(args):
+    logging.disable(logging.CRITICAL)
+    rng = random.Random(args.seed)
+    leads = {f"lead-{number}": random_lead(rng) for number in range(args.leads)}
+    index = LeadIndex(lead_rules.get_rules())
+    started = time.perf_counter()
+    items = list(leads.items())
+    for offset in range(0, len(items), 10000):
+        index.upsert_many(items[offset:offset + 10000])
+    ingest = time.perf_counter() - started
+    # Re-score a slice of known leads, as repeat lead_score tasks would
+    updates = rng.sample(list(leads), min(len(leads), args.updates))
+    for lead_id in updates:
+        leads[lead_id] = random_lead(rng)
+    started = time.perf_counter()
+    index.upsert_many((lead_id, leads[lead_id]) for lead_id in updates)
+    update = time.perf_counter() - started
+
+    results = {
+        'ingest': {'leads': len(index), 'leads_per_sec': round(len(leads) / ingest),
+                   'updates_per_sec': round(len(updates) / update) if updates else None},
+        'queries': {
+            'top_100_ms': timed(lambda: index.top(100), args.repeat),
+            'top_100_finance_ms': timed(lambda: index.top(100, industry='finance'), args.repeat),
+            'top_100_warm_finance_ms': timed(lambda: index.top(100, industry='finance', quality='warm'), args.repeat),
+            'top_1000_cold_ms': timed(lambda: index.top(1000, quality='cold'), args.repeat),
+            'stats_ms': timed(index.stats, args.repeat),
+            'stats_finance_ms': timed(lambda: index.stats('finance'), args.repeat),
+            'get_ms': timed(lambda: index.get(updates[0] if updates else 'lead-0'), args.repeat),
+        },
+    }
+    print(f"indexed {len(index):,} leads at {results['ingest']['leads_per_sec']:,}/s")
+    for name, value in results['queries'].items():
+        print(f"  {name:<26}{value:>10.3f}")
+
+    print(f"{'rule change':<28}{'checked':>10}{'changed':>10}{'incremental':>13}{'full':>11}{'speedup':>9}")
+    with open(lead_rules.RULES_PATH) as f:
+        data = json.load(f)
+    ids, lead_data = list(leads), list(leads.values())
+    for number, (label, change) in enumerate(RULE_CHANGES, 1):
+        data = copy.deepcopy(data)
+        change(data)
+        data['version'] = f"bench-{number}"
+        rules = lead_rules.compile_rules(data)
+        report = index.rescore(rules)
+        started = time.perf_counter()
+        full = lead_columnar.score_leads(lead_data, include_factors=False, rules=rules)
+        full_ms = (time.perf_counter() - started) * 1000
+        if args.verify:
+            wrong = sum(index.score[index.rows[lead_id]] != result['lead_score']['score']
+                        for lead_id, result in zip(ids, full))
+            if wrong:
+                raise SystemExit(f"{label}: {wrong} leads differ from a full rescore")
+        speedup = f"{full_ms / report['elapsed_ms']:.1f}x" if report['elapsed_ms'] >= 0.1 else '-'
+        results[label] = {'checked': report['checked'], 'changed': report['changed'],
+                          'incremental_ms': report['elapsed_ms'], 'full_ms': round(full_ms, 3)}
+        print(f"{label:<28}{report['checked']:>10,}{report['changed']:>10,}{report['elapsed_ms']:>11.1f}ms"
+              f"{full_ms:>9.1f}ms{speedup:>9}")
+    if not args.no_save:
+        settings = {key: value for key, value in vars(args).items() if key not in ('output', 'no_save')}
+        write_results('lead_index', results, args.output, settings=settings)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--leads', type=int, default=1000000)
+    parser.add_argument('--updates', type=int, default=10000, help='leads re-scored after the initial load')
+    parser.add_argument('--repeat', type=int, default=20, help='runs per query timing (median reported)')
+    parser.add_argument('--no-verify', dest='verify', action='store_false',
+                        help='skip the lead-by-lead comparison with a full rescore')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='result file (default: benchmarks/results/lead_index-<time>.json)')
+    parser.add_argument('--no-save', action='store_true')
+    main(parser.parse_args())
@@ -0,0 +1,70 @@
+"""Columnar vs scalar lead scoring: equivalence check and throughput.
+
+    python -m benchmarks.lead_scoring --verify 20000 --leads 1000000
+"""
+import argparse
+import logging
+import random
+import time
+
+from benchmarks import load_lambda
+from benchmarks.data import random_lead
+
+scorer = load_lambda('lead-scorer')
+columnar = load_lambda('lead-scorer', 'lead_columnar')
+
+def scalar_result(lead):
+    try:
+        return {'success': True, 'lead_score': scorer.calculate_lead_score(lead)}
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}
+
+
+def same(a, b):
+    # NaN budgets are echoed back and never compare equal to themselves
+    return repr(a) == repr(b)
+
+
+def verify(count, seed):
+    rng = random.Random(seed)
+    leads = [random_lead(rng, edge_cases=rng.random() < 0.3) for _ in range(count)]
+    expected = [scalar_result(lead) for lead in leads]
+    actual = columnar.score_leads(leads)
+    mismatches = [(lead, e, a) for lead, e, a in zip(leads, expected, actual) if not same(e, a)]
+    for lead, e, a in mismatches[:5]:
+        print(f"MISMATCH {lead!r}\n  scalar:   {e!r}\n  columnar: {a!r}")
+    print(f"verified {count} leads against calculate_lead_score: {len(mismatches)} mismatches")
+    return not mismatches
+
+
+def rate(label, count, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40}{count / elapsed:>14,.0f} records/sec")
+
+
+def benchmark(count, seed):
+    rng = random.Random(seed)
+    leads = [random_lead(rng) for _ in range(count)]
+    engine = 'numpy' if columnar.load_numpy() is not None else 'array fallback'
+    print(f"{count:,} synthetic leads, columnar engine: {engine}")
+    rate('scalar calculate_lead_score', count, lambda: [scorer.calculate_lead_score(lead) for lead in leads])
+    rate('columnar score_leads (with factors)', count, lambda: columnar.score_leads(leads))
+    rate('columnar score_leads (no factors)', count, lambda: columnar.score_leads(leads, include_factors=False))
+    columns = columnar.columns_from_leads(leads)
+    rate('score_arrays on prebuilt columns', count, lambda: columnar.score_arrays(
+        columns.company_size, columns.budget, columns.high_value, columns.engagement, columns.decision_maker))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--verify', type=int, default=20000, help='random leads to cross-check (0 to skip)')
+    parser.add_argument('--leads', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)  # scalar scoring logs every rejected lead
+    if args.verify and not verify(args.verify, args.seed):
+        raise SystemExit(1)
+    if args.leads:
+        benchmark(args.leads, args.seed)
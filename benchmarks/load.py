@@ -0,0 +1,212 @@
+"""HTTP load generator for the backend's /tasks/* endpoints.
+
+Starts the API with uvicorn in mock mode (USE_MOCK_RESPONSES=true, so no
+AWS account is touched) unless --url points at a running server, then
+holds each concurrency level for a fixed time with keep-alive connections
+and records throughput and p50/p95/p99 latency per endpoint.
+
+    python -m benchmarks.load --concurrency 1 8 32 64 --duration 10
+    python -m benchmarks.load --url http://localhost:8000 --endpoints lead-score
+    python -m benchmarks.load --routing local --local-mode thread
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+from benchmarks import BACKEND_DIR
+from benchmarks.data import api_payloads
+from benchmarks.results import print_header, print_summary, summarize, write_results
+
+ENDPOINTS = {
+    'email-parse': 'email_parse',
+    'invoice-generate': 'invoice_generate',
+    'lead-score': 'lead_score',
+}
+
+
+class HttpConnection:
+    """Minimal keep-alive HTTP/1.1 client, so the generator costs less than the server."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method, path, body=b''):
+        if self.writer is None:
+            await self.open()
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n").encode()
+        self.writer.write(head + body)
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("server closed the connection")
+        status = int(status_line.split()[1])
+        length, chunked, close = 0, False, False
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            name, value = name.strip().lower(), value.strip().lower()
+            if name == 'content-length':
+                length = int(value)
+            elif name == 'transfer-encoding' and 'chunked' in value:
+                chunked = True
+            elif name == 'connection' and value == 'close':
+                close = True
+        if chunked:
+            payload = bytearray()
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+                payload += chunk[:-2]
+        else:
+            payload = await self.reader.readexactly(length)
+        if close:
+            self.close()
+        return status, bytes(payload)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def run_level(host, port, path, bodies, concurrency, duration, warmup):
+    latencies = []
+    statuses = {}
+    errors = 0
+    measuring = False
+    stop_at = time.perf_counter() + warmup + duration
+    counter = iter(range(sys.maxsize))
+
+    async def worker():
+        nonlocal errors
+        connection = HttpConnection(host, port)
+        try:
+            while time.perf_counter() < stop_at:
+                body = bodies[next(counter) % len(bodies)]
+                started = time.perf_counter()
+                try:
+                    status, _ = await connection.request('POST', path, body)
+                except (ConnectionError, asyncio.IncompleteReadError, OSError):
+                    connection.close()
+                    status = None
+                if not measuring:
+                    continue
+                latency = time.perf_counter() - started
+                statuses[status] = statuses.get(status, 0) + 1
+                if status is not None and status < 400:
+                    latencies.append(latency)
+                else:
+                    errors += 1
+        finally:
+            connection.close()
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    await asyncio.sleep(warmup)
+    measuring = True
+    measured_from = time.perf_counter()
+    await asyncio.gather(*workers)
+    summary = summarize(latencies, elapsed=time.perf_counter() - measured_from, errors=errors)
+    summary['statuses'] = {str(status): count for status, count in sorted(statuses.items(), key=str)}
+    return summary
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, workers, routing='lambda', local_mode='process'):
+    # routing=local runs the real handlers in the API's local engine instead
+    # of the canned mock bodies
+    env = dict(os.environ, USE_MOCK_RESPONSES='true', LOG_LEVEL='WARNING',
+               TASK_ROUTING_DEFAULT=routing, LOCAL_ENGINE_MODE=local_mode)
+    # Several workers go through serve.py so they share one task store
+    command = ['serve.py'] if workers > 1 else ['-m', 'uvicorn', 'main:app']
+    process = subprocess.Popen(
+        [sys.executable, *command, '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning', '--no-access-log'],
+        cwd=BACKEND_DIR, env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("uvicorn exited during startup")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("uvicorn did not start within 30s")
+
+
+async def run(args, host, port):
+    results = {}
+    print_header()
+    for endpoint in args.endpoints:
+        task_type = ENDPOINTS[endpoint]
+        bodies = [json.dumps(payload).encode() for payload in api_payloads(task_type, args.payloads, args.seed)]
+        path = f"/tasks/{endpoint}" + ('' if args.cache else '?cache=false')
+        for concurrency in args.concurrency:
+            summary = await run_level(host, port, path, bodies, concurrency, args.duration, args.warmup)
+            name = f"POST /tasks/{endpoint} c={concurrency}"
+            results[name] = summary
+            print_summary(name, summary)
+            if summary['errors']:
+                print(f"  {summary['errors']} failed requests: {summary['statuses']}")
+    return results
+
+
+def main(args):
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        host, port = '127.0.0.1', free_port()
+        server = start_server(port, args.server_workers, args.routing, args.local_mode)
+    try:
+        results = asyncio.run(run(args, host, port))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+    if not args.no_save:
+        settings = {key: value for key, value in vars(args).items() if key not in ('output', 'no_save')}
+        write_results('load', results, args.output, settings=settings)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='benchmark a running server instead of starting one')
+    parser.add_argument('--endpoints', nargs='+', choices=sorted(ENDPOINTS), default=sorted(ENDPOINTS))
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 64])
+    parser.add_argument('--duration', type=float, default=10, help='measured seconds per level')
+    parser.add_argument('--warmup', type=float, default=2, help='unmeasured seconds before each level')
+    parser.add_argument('--payloads', type=int, default=500, help='distinct request bodies per endpoint')
+    parser.add_argument('--cache', action='store_true', help='let the result cache answer repeated bodies')
+    parser.add_argument('--server-workers', type=int, default=1)
+    parser.add_argument('--routing', choices=['lambda', 'local', 'auto'], default='lambda',
+                        help='TASK_ROUTING_DEFAULT for the started server (lambda means mock responses)')
+    parser.add_argument('--local-mode', choices=['process', 'thread'], default='process')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='result file (default: benchmarks/results/load-<time>.json)')
+    parser.add_argument('--no-save', action='store_true')
+    main(parser.parse_args())
@@ -0,0 +1,163 @@
+"""Per-request logging cost: synchronous basicConfig output vs backend/logs.py.
+
+    python -m benchmarks.logging_overhead --requests 20000
+    python -m benchmarks.logging_overhead --sink-latency-ms 0.5
+
+Runs mock lead_score tasks through TaskPipeline.run (two log lines each)
+and reports microseconds per request on the event loop thread for each
+setup, and how much of that is logging (minus the same run with logging
+off). Log lines go to a file, then to a "slow sink" whose writes block
+for --sink-latency-ms, like a stderr pipe whose reader fell behind.
+"drain" is how long the log listener needed after the last request to
+write out its backlog. A last table times single log calls that are
+filtered out, where eager f-strings still pay for formatting and lazy
+%-style calls do not.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from benchmarks import use_backend
+from benchmarks.results import write_results
+
+use_backend()
+import logs  # noqa: E402
+from local_engine import TaskRouter  # noqa: E402
+from pipeline import TaskPipeline  # noqa: E402
+from result_cache import ResultCache  # noqa: E402
+from task_registry import default_registry  # noqa: E402
+from task_store import MemoryTaskStore  # noqa: E402
+
+PARAMETERS = {'lead_data': {'company_size': 500, 'industry': 'technology', 'budget': 50000}}
+# logs.configure() turns these record lookups off; the "before" setups get them back
+LOOKUPS = (logging._srcfile, logging.logThreads, logging.logProcesses, logging.logMultiprocessing)
+
+
+class SlowSink:
+    """A log destination whose writes block, like a pipe whose reader fell behind."""
+
+    def __init__(self, stream, latency):
+        self.stream = stream
+        self.latency = latency
+
+    def write(self, text):
+        time.sleep(self.latency)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def use_sync(stream, fmt):
+    # What logging.basicConfig set up: a StreamHandler on the request thread
+    logs.shutdown()
+    logging._srcfile, logging.logThreads, logging.logProcesses, logging.logMultiprocessing = LOOKUPS
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    output = logging.StreamHandler(stream)
+    output.setFormatter(logs.JsonFormatter() if fmt == 'json' else logging.Formatter(logging.BASIC_FORMAT))
+    root.addHandler(output)
+    root.setLevel(logging.INFO)
+
+
+def use_off():
+    logs.shutdown()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.setLevel(logging.WARNING)
+
+
+async def run_requests(pipeline, requests):
+    task = pipeline.registry.get('lead_score')
+    started = time.perf_counter()
+    for _ in range(requests):
+        await pipeline.run(task, PARAMETERS, cache=False)
+    return time.perf_counter() - started
+
+
+def request_costs(args, stream, requests):
+    setups = (
+        ('off', use_off),
+        ('sync text (before)', lambda: use_sync(stream, 'text')),
+        ('sync json', lambda: use_sync(stream, 'json')),
+        ('queued text', lambda: logs.configure('INFO', 'text', stream=stream, max_pending=requests * 4)),
+        ('queued json', lambda: logs.configure('INFO', 'json', stream=stream, max_pending=requests * 4)),
+        ('queued json, info=0.1', lambda: logs.configure('INFO', 'json', logs.SamplingFilter({logging.INFO: 0.1}),
+                                                         stream=stream, max_pending=requests * 4)),
+    )
+    pipeline = TaskPipeline(default_registry(), MemoryTaskStore(max_tasks=requests), ResultCache(), router=TaskRouter())
+    results = {}
+    baseline = None
+    for label, setup in setups:
+        setup()
+        asyncio.run(run_requests(pipeline, requests // 10))
+        best = min(asyncio.run(run_requests(pipeline, requests)) for _ in range(args.repeat))
+        drain_started = time.perf_counter()
+        logs.shutdown()
+        drain = time.perf_counter() - drain_started
+        per_request = best / requests * 1e6
+        baseline = per_request if baseline is None else baseline
+        results[label] = {
+            'us_per_request': round(per_request, 2),
+            'logging_us_per_request': round(per_request - baseline, 2),
+            'drain_ms': round(drain * 1000, 1),
+        }
+    use_off()
+    return results
+
+
+def call_costs(args):
+    logger = logging.getLogger('benchmarks.logging_overhead')
+    use_off()
+    task_name, task_id, duration = 'lead_score', 'lead_01M58ADZSCM88G0000JX258SN1', 1.234
+    calls = {
+        'f-string, filtered': lambda: logger.info(f"{task_name} task completed: {task_id} in {duration:.3f}ms"),
+        'lazy, filtered': lambda: logger.info("%s task completed: %s in %.3fms", task_name, task_id, duration),
+        'lazy + extra, filtered': lambda: logger.info("%s task completed: %s", task_name, task_id,
+                                                      extra={'task_id': task_id, 'duration_ms': duration}),
+    }
+    results = {}
+    count = args.requests * 10
+    for label, call in calls.items():
+        started = time.perf_counter()
+        for _ in range(count):
+            call()
+        results[label] = {'ns_per_call': round((time.perf_counter() - started) / count * 1e9, 1)}
+    return results
+
+
+def main(args):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, 'bench.log'), 'a') as stream:
+            for sink, output, requests in (
+                ('file', stream, args.requests),
+                ('slow sink', SlowSink(stream, args.sink_latency_ms / 1000), args.slow_requests),
+            ):
+                print(f"{sink:<24}{'us/request':>12}{'logging us':>12}{'drain ms':>10}")
+                for label, row in request_costs(args, output, requests).items():
+                    print(f"  {label:<22}{row['us_per_request']:>12.1f}{row['logging_us_per_request']:>12.1f}"
+                          f"{row['drain_ms']:>10.1f}")
+                    results[f"{sink}: {label}"] = row
+    for label, row in call_costs(args).items():
+        print(f"{label:<24}{row['ns_per_call']:>12.0f} ns/call")
+        results[label] = row
+    if not args.no_save:
+        settings = {key: value for key, value in vars(args).items() if key not in ('output', 'no_save')}
+        write_results('logging_overhead', results, args.output, settings=settings)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3, help='runs per setup (best reported)')
+    parser.add_argument('--slow-requests', type=int, default=2000, help='requests per run with the slow sink')
+    parser.add_argument('--sink-latency-ms', type=float, default=0.2, help='time each slow sink write blocks')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/logging_overhead-<time>.json)')
+    parser.add_argument('--no-save', action='store_true')
+    main(parser.parse_args())
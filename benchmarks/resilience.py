@@ -0,0 +1,131 @@
+"""Tail latency and outages against a stub Lambda, with and without backend/resilience.py.
+
+    python -m benchmarks.resilience --requests 2000 --concurrency 16
+    python -m benchmarks.resilience --outage throttle
+
+"tail": a few percent of calls take --tail-latency (cold starts); the
+hedged dispatcher sends a duplicate once a call passes the function's p95.
+"outage": the stub stops answering (hang) or throttles every call, and
+lead_score tasks go through the pipeline with the circuit breaker off, on
+(fail fast with 503), and on with LAMBDA_FALLBACK=local.
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from benchmarks import percentile, use_backend
+from benchmarks.results import write_results
+from benchmarks.stub_lambda import StubLambdaClient
+
+use_backend()
+from dispatcher import LambdaDispatcher  # noqa: E402
+from local_engine import LocalEngine, TaskRouter  # noqa: E402
+from pipeline import TaskPipeline  # noqa: E402
+from resilience import ResiliencePolicy  # noqa: E402
+from result_cache import ResultCache  # noqa: E402
+from task_registry import default_registry  # noqa: E402
+from task_store import MemoryTaskStore  # noqa: E402
+
+PARAMETERS = {'lead_data': {'company_size': 500, 'industry': 'technology', 'budget': 50000}}
+
+
+async def drive(call, requests, concurrency):
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                await call()
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        'ops_per_sec': round(requests / elapsed, 1),
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(max(latencies) * 1000, 3),
+    }
+
+
+async def tail(args):
+    results = {}
+    for label, policy in (
+        ('plain', ResiliencePolicy(hedging=False, adaptive_timeouts=False)),
+        ('hedged', ResiliencePolicy(hedge_budget=args.hedge_budget)),
+    ):
+        client = StubLambdaClient(latency=args.latency, tail_rate=args.tail_rate, tail_latency=args.tail_latency,
+                                  seed=args.seed)
+        dispatcher = LambdaDispatcher(client, max_workers=args.concurrency * 2, default_limit=args.concurrency * 2,
+                                      policy=policy)
+        row = await drive(lambda: dispatcher.invoke('lead-scorer', PARAMETERS, hedge=True),
+                          args.requests, args.concurrency)
+        dispatcher.shutdown()
+        row['extra_calls'] = f"{(client.calls - args.requests) / args.requests:.1%}"
+        results[f"tail {label}"] = row
+    return results
+
+
+async def outage(args):
+    results = {}
+    for label, threshold, fallback in (('no breaker', 0, 'none'), ('breaker', 5, 'none'),
+                                       ('breaker+local', 5, 'local')):
+        client = StubLambdaClient(latency=args.latency, outage_latency=args.timeout * 2, seed=args.seed)
+        if args.outage == 'hang':
+            client.outage = True
+        else:
+            client.throttle_rate = 1.0
+        policy = ResiliencePolicy(failure_threshold=threshold, cooldown=60)
+        dispatcher = LambdaDispatcher(client, max_workers=args.concurrency * 2, default_limit=args.concurrency * 2,
+                                      default_timeout=args.timeout, policy=policy)
+        local_engine = LocalEngine(mode='thread', workers=2)
+        pipeline = TaskPipeline(default_registry(), MemoryTaskStore(), ResultCache(), dispatcher, local_engine,
+                                TaskRouter(), fallback=fallback)
+        row = await drive(lambda: pipeline.invoke('lead_score', PARAMETERS, cache=False),
+                          args.outage_requests, args.concurrency)
+        row['lambda_calls'] = client.calls
+        results[f"outage {label}"] = row
+        local_engine.shutdown()
+        dispatcher.shutdown()
+    return results
+
+
+def main(args):
+    logging.disable(logging.CRITICAL)
+    results = asyncio.run(tail(args))
+    results.update(asyncio.run(outage(args)))
+    print(f"{'case':<24}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}  extra")
+    for case, row in results.items():
+        extra = row.get('extra_calls', f"{row.get('lambda_calls', '')} Lambda calls")
+        print(f"{case:<24}{row['ops_per_sec']:>9,.0f}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+              f"{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}{row['errors']:>8}  {extra}")
+    if not args.no_save:
+        settings = {key: value for key, value in vars(args).items() if key not in ('output', 'no_save')}
+        write_results('resilience', results, args.output, settings=settings)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000, help='calls in the tail scenario')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.02, help='normal stub latency in seconds')
+    parser.add_argument('--tail-rate', type=float, default=0.03, help='fraction of calls that are slow')
+    parser.add_argument('--tail-latency', type=float, default=0.5)
+    parser.add_argument('--hedge-budget', type=float, default=0.1, help='hedges allowed per call')
+    parser.add_argument('--outage', choices=['hang', 'throttle'], default='hang')
+    parser.add_argument('--outage-requests', type=int, default=200)
+    parser.add_argument('--timeout', type=float, default=1.0, help='configured Lambda timeout in seconds')
+    parser.add_argument('--seed', type=int, default=3)
+    parser.add_argument('--output', help='result file (default: benchmarks/results/resilience-<time>.json)')
+    parser.add_argument('--no-save', action='store_true')
+    main(parser.parse_args())
@@ -0,0 +1,114 @@
+"""JSON result files shared by the benchmark suites, and regression checks."""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks import ROOT_DIR, percentile
+
+RESULTS_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'results')
+
+
+def summarize(samples, elapsed=None, errors=0):
+    """Latency samples (seconds) -> throughput and percentiles in milliseconds."""
+    count = len(samples)
+    elapsed = elapsed if elapsed is not None else sum(samples)
+    return {
+        'count': count,
+        'errors': errors,
+        'ops_per_sec': round(count / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(sum(samples) / count * 1000, 4) if count else 0.0,
+        'p50_ms': round(percentile(samples, 50) * 1000, 4),
+        'p95_ms': round(percentile(samples, 95) * 1000, 4),
+        'p99_ms': round(percentile(samples, 99) * 1000, 4),
+    }
+
+
+def measure(func, min_time=0.5, min_runs=5, max_runs=100000):
+    """Call func repeatedly for at least min_time seconds; returns a summary."""
+    perf_counter = time.perf_counter
+    samples = []
+    started = perf_counter()
+    while len(samples) < max_runs:
+        call_started = perf_counter()
+        func()
+        samples.append(perf_counter() - call_started)
+        if len(samples) >= min_runs and perf_counter() - started >= min_time:
+            break
+    return summarize(samples)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'git_revision': git_revision(),
+    }
+
+
+def write_results(suite, results, output=None, settings=None):
+    """Store a run as JSON; defaults to benchmarks/results/<suite>-<timestamp>.json."""
+    created_at = datetime.now(timezone.utc)
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{suite}-{created_at.strftime('%Y%m%dT%H%M%SZ')}.json")
+    document = {
+        'suite': suite,
+        'created_at': created_at.isoformat(),
+        'argv': sys.argv[1:],
+        'settings': settings or {},
+        'environment': environment(),
+        'results': results,
+    }
+    with open(output, 'w') as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+    print(f"results written to {output}")
+    return output
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold=0.10):
+    """Compare two result documents case by case.
+
+    A case regresses when its throughput drops, or its p95 latency grows,
+    by more than threshold (a fraction). Returns a list of rows:
+    (case, metric, old, new, change, regressed).
+    """
+    rows = []
+    old_results, new_results = baseline['results'], current['results']
+    for case in sorted(set(old_results) & set(new_results)):
+        old, new = old_results[case], new_results[case]
+        for metric, higher_is_better in (('ops_per_sec', True), ('p95_ms', False)):
+            before, after = old.get(metric), new.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            regressed = change < -threshold if higher_is_better else change > threshold
+            rows.append((case, metric, before, after, change, regressed))
+    return rows
+
+
+def print_summary(case, summary):
+    print(f"{case:<44}{summary['ops_per_sec']:>14,.1f}{summary['p50_ms']:>11.3f}"
+          f"{summary['p95_ms']:>11.3f}{summary['p99_ms']:>11.3f}")
+
+
+def print_header():
+    print(f"{'case':<44}{'ops/s':>14}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}")
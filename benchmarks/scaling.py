@@ -0,0 +1,106 @@
+"""Request throughput of serve.py from 1 to N worker processes.
+
+    python -m benchmarks.scaling --workers 1 2 4 8 --duration 10
+    python -m benchmarks.scaling --routing local --local-mode thread
+
+Each level starts the API in mock mode with that many workers sharing one
+task store, and drives it from --generators load processes (keep-alive
+connections, as in benchmarks/load.py). Before measuring, it checks that
+tasks created through one connection are visible through every other.
+Load generators need cores of their own: on a machine with C cores,
+worker counts up to about C/2 give a fair picture.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+
+from benchmarks.data import api_payloads
+from benchmarks.load import HttpConnection, free_port, run_level, start_server
+from benchmarks.results import write_results
+
+HOST = '127.0.0.1'
+PATH = '/tasks/lead-score?cache=false'
+
+
+def generate(port, bodies, concurrency, duration, warmup):
+    return asyncio.run(run_level(HOST, port, PATH, bodies, concurrency, duration, warmup))
+
+
+async def check_shared_state(port, count=20):
+    """Create tasks on fresh connections and read each back on another one."""
+    body = json.dumps({'task_type': 'lead_score', 'parameters': {'lead_data': {'company_size': 10}}}).encode()
+    task_ids = []
+    for _ in range(count):
+        connection = HttpConnection(HOST, port)
+        _, payload = await connection.request('POST', PATH, body)
+        connection.close()
+        task_ids.append(json.loads(payload)['task_id'])
+    missing = 0
+    for task_id in task_ids:
+        connection = HttpConnection(HOST, port)
+        status, _ = await connection.request('GET', f"/tasks/{task_id}")
+        connection.close()
+        missing += status != 200
+    return missing
+
+
+def run(args, workers, bodies):
+    port = free_port()
+    server = start_server(port, workers, args.routing, args.local_mode)
+    try:
+        missing = asyncio.run(check_shared_state(port))
+        if missing:
+            raise SystemExit(f"{missing} tasks were not visible from every worker with {workers} workers")
+        per_generator = max(1, args.concurrency // args.generators)
+        with multiprocessing.get_context('spawn').Pool(args.generators) as pool:
+            summaries = pool.starmap(generate, [(port, bodies, per_generator, args.duration, args.warmup)] * args.generators)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return {
+        'ops_per_sec': round(sum(summary['ops_per_sec'] for summary in summaries), 1),
+        'count': sum(summary['count'] for summary in summaries),
+        'errors': sum(summary['errors'] for summary in summaries),
+        'p50_ms': round(max(summary['p50_ms'] for summary in summaries), 3),
+        'p95_ms': round(max(summary['p95_ms'] for summary in summaries), 3),
+    }
+
+
+def main(args):
+    bodies = [json.dumps(payload).encode() for payload in api_payloads('lead_score', args.payloads, args.seed)]
+    results = {}
+    baseline = None
+    print(f"{os.cpu_count()} CPUs, {args.generators} load processes x {args.concurrency // args.generators} connections")
+    print(f"{'workers':<10}{'req/s':>12}{'speedup':>10}{'efficiency':>12}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+    for workers in args.workers:
+        summary = run(args, workers, bodies)
+        baseline = baseline or summary['ops_per_sec'] / workers
+        speedup = summary['ops_per_sec'] / baseline
+        summary['speedup'] = round(speedup, 2)
+        results[f"workers={workers}"] = summary
+        print(f"{workers:<10}{summary['ops_per_sec']:>12,.0f}{speedup:>9.2f}x{speedup / workers:>11.0%}"
+              f"{summary['p50_ms']:>10.2f}{summary['p95_ms']:>10.2f}{summary['errors']:>8}")
+    if not args.no_save:
+        settings = {key: value for key, value in vars(args).items() if key not in ('output', 'no_save')}
+        write_results('scaling', results, args.output, settings=settings)
+
+
+if __name__ == '__main__':
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, *(n for n in (2, 4, 8, 16) if n <= max(1, cpus // 2))}))
+    parser.add_argument('--generators', type=int, default=max(1, cpus // 2), help='load generator processes')
+    parser.add_argument('--concurrency', type=int, default=64, help='open connections across all generators')
+    parser.add_argument('--duration', type=float, default=10, help='measured seconds per level')
+    parser.add_argument('--warmup', type=float, default=2)
+    parser.add_argument('--payloads', type=int, default=500)
+    parser.add_argument('--routing', choices=['lambda', 'local', 'auto'], default='lambda',
+                        help='TASK_ROUTING_DEFAULT for the server (lambda means mock responses)')
+    parser.add_argument('--local-mode', choices=['process', 'thread'], default='thread')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='result file (default: benchmarks/results/scaling-<time>.json)')
+    parser.add_argument('--no-save', action='store_true')
+    main(parser.parse_args())
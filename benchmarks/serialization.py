@@ -0,0 +1,149 @@
+"""Per-request serialization cost: the original pydantic path vs backend/serialization.py.
+
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --filter lead --no-save
+
+Payloads are real handler responses (a lead score, a typical email, a
+100-line invoice, a 1,000-lead batch) encoded the way Lambda returns them.
+The "pydantic" path repeats what the API did per request before: json.dumps
+of the parameters, json.loads of the payload, TaskResponse validation,
+.dict() for storage and FastAPI's jsonable_encoder + JSONResponse render.
+The "raw" path is the pipeline's: dumps, decode_result, a plain task
+record, a size estimate and FastJSONResponse, once with orjson (when
+installed) and once with the stdlib encoder. Allocation figures come from
+a separate tracemalloc pass: peak is the high-water mark while handling
+one request, retained what the stored record keeps alive.
+"""
+import argparse
+import json
+import logging
+import tracemalloc
+from datetime import datetime
+from typing import Any, Dict
+
+from benchmarks import load_lambda, use_backend
+from benchmarks.data import email_event, lead_batch, lead_event, synthetic_invoice
+from benchmarks.results import measure, print_header, print_summary, write_results
+
+use_backend()
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import BaseModel  # noqa: E402
+
+import serialization  # noqa: E402
+from pipeline import task_record  # noqa: E402
+from task_store import estimate_size  # noqa: E402
+
+
+class TaskResponse(BaseModel):
+    task_id: str
+    status: str
+    result: Dict[str, Any] = None
+    timestamp: str
+
+
+class FakeContext:
+    aws_request_id = 'benchmark'
+    function_name = 'benchmark'
+
+
+def payloads():
+    """(name, parameters, Lambda payload bytes) from the real handlers."""
+    context = FakeContext()
+    email = load_lambda('email-parser')
+    invoice = load_lambda('invoice-generator')
+    lead = load_lambda('lead-scorer')
+    for name, module, event in (
+        ('lead', lead, lead_event()),
+        ('email', email, email_event(0.004)),
+        ('invoice[100]', invoice, synthetic_invoice(100)),
+        ('lead_batch[1000]', lead, lead_batch(1000)),
+    ):
+        yield name, event, json.dumps(module.lambda_handler(event, context)).encode()
+
+
+def pydantic_path(parameters, payload):
+    json.dumps(parameters).encode()
+    result = json.loads(payload)
+    response = TaskResponse(task_id='lead_1', status='completed', result=result,
+                            timestamp=datetime.now().isoformat())
+    stored = response.model_dump()
+    JSONResponse(jsonable_encoder(response)).body
+    return stored
+
+
+def raw_path(parameters, payload):
+    serialization.dumps(parameters)
+    result = serialization.decode_result(payload)
+    record = task_record('lead_1', 'lead_score', 'completed', result=result)
+    estimate_size(record)
+    serialization.FastJSONResponse(record).body
+    return record
+
+
+def allocations(func, parameters, payload):
+    func(parameters, payload)  # warm caches outside the measurement
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        kept = func(parameters, payload)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del kept
+    return peak - before, current - before
+
+
+def paths(orjson):
+    yield 'pydantic', pydantic_path, None
+    if orjson is not None:
+        yield 'raw+orjson', raw_path, orjson
+    yield 'raw+stdlib', raw_path, None
+
+
+def verify(cases):
+    for name, parameters, payload in cases:
+        expected = json.loads(JSONResponse(jsonable_encoder(json.loads(payload))).body)
+        record = raw_path(parameters, payload)
+        rendered = json.loads(serialization.FastJSONResponse(record).body)
+        if rendered['result'] != expected:
+            print(f"MISMATCH {name}: spliced result differs from the re-encoded one")
+            return False
+    print(f"verified {len(cases)} payloads: spliced responses decode to the same results")
+    return True
+
+
+def main(args):
+    logging.disable(logging.CRITICAL)
+    cases = [case for case in payloads() if not args.filter or args.filter in case[0]]
+    if not verify(cases):
+        raise SystemExit(1)
+    installed = serialization.orjson
+    results = {}
+    print_header()
+    try:
+        for name, parameters, payload in cases:
+            for label, func, encoder in paths(installed):
+                serialization.orjson = encoder
+                case = f"{label}[{name}, {len(payload) // 1024}KB]"
+                summary = measure(lambda: func(parameters, payload), min_time=args.min_time)
+                summary['peak_kb'], summary['retained_kb'] = (
+                    round(size / 1024, 1) for size in allocations(func, parameters, payload))
+                results[case] = summary
+                print_summary(case, summary)
+                print(f"  peak {summary['peak_kb']:,.1f} KB, retained {summary['retained_kb']:,.1f} KB")
+    finally:
+        serialization.orjson = installed
+    if not args.no_save:
+        write_results('serialization', results, args.output, settings={'min_time': args.min_time})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filter', help='only payloads whose name contains this')
+    parser.add_argument('--min-time', type=float, default=1.0, help='seconds per case')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/serialization-<time>.json)')
+    parser.add_argument('--no-save', action='store_true')
+    main(parser.parse_args())
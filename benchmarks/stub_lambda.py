@@ -0,0 +1,60 @@
+import io
+import json
+import random
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+
+class StubLambdaClient:
+    """Stands in for boto3's Lambda client with injected latency and throttling.
+
+    Every call sleeps `latency`; a `tail_rate` fraction sleeps `tail_latency`
+    instead (cold starts, noisy neighbours). A `throttle_rate` fraction
+    raises the 429 TooManyRequestsException boto3 raises when a function is
+    out of concurrency. Setting `outage` makes every call hang for
+    `outage_latency` and then fail, like a function that stopped answering.
+    Setting `function_error` makes every call answer the way Lambda reports
+    an unhandled exception in the handler: HTTP 200 with FunctionError set.
+    """
+
+    def __init__(self, latency=0.05, result=None, tail_rate=0.0, tail_latency=1.0, throttle_rate=0.0,
+                 outage_latency=5.0, seed=None):
+        self.latency = latency
+        self.result = result if result is not None else {'statusCode': 200, 'body': {'success': True}}
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.throttle_rate = throttle_rate
+        self.outage = False
+        self.function_error = False
+        self.outage_latency = outage_latency
+        self.calls = 0
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def invoke(self, FunctionName, InvocationType='RequestResponse', Payload=b'{}'):
+        with self._lock:
+            self.calls += 1
+            draw = self._random.random()
+            throttled = not self.outage and self._random.random() < self.throttle_rate
+            self.throttled += throttled
+        if self.outage:
+            time.sleep(self.outage_latency)
+            raise ClientError({'Error': {'Code': 'ServiceException', 'Message': 'Stub outage'}}, 'Invoke')
+        if throttled:
+            raise ClientError({'Error': {'Code': 'TooManyRequestsException', 'Message': 'Rate Exceeded.'}},
+                              'Invoke')
+        time.sleep(self.tail_latency if draw < self.tail_rate else self.latency)
+        if self.function_error:
+            return {
+                'StatusCode': 200,
+                'FunctionError': 'Unhandled',
+                'Payload': io.BytesIO(json.dumps({'errorMessage': 'Stub handler error',
+                                                  'errorType': 'RuntimeError'}).encode())
+            }
+        return {
+            'StatusCode': 200,
+            'Payload': io.BytesIO(json.dumps(self.result).encode())
+        }
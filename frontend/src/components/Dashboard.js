@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   Container,
   Grid,
@@ -17,20 +17,94 @@ import TrendingUpIcon from '@mui/icons-material/TrendingUp';
 import axios from 'axios';
 
 const API_BASE_URL = 'http://localhost:8000';
+const MAX_TASKS = 5;
 
 function Dashboard() {
   const navigate = useNavigate();
   const [tasks, setTasks] = useState([]);
+  const tasksRef = useRef(tasks);
 
   useEffect(() => {
-    fetchTasks();
+    tasksRef.current = tasks;
+  }, [tasks]);
+
+  useEffect(() => {
+    let source = null;
+    let active = true;
+    // task_id -> whether another delta arrived while it was being fetched
+    const fetching = new Map();
+
+    // Deltas only carry what changed; a task we have not seen yet is
+    // loaded in full instead of being shown half-filled
+    const fetchTask = async (taskId) => {
+      fetching.set(taskId, false);
+      try {
+        const response = await axios.get(`${API_BASE_URL}/tasks/${encodeURIComponent(taskId)}`);
+        if (active && response.data && response.data.task_id === taskId) {
+          setTasks((current) => {
+            if (current.some((task) => task.task_id === taskId)) {
+              return current.map((task) => (task.task_id === taskId ? { ...task, ...response.data } : task));
+            }
+            return [response.data, ...current].slice(0, MAX_TASKS);
+          });
+        }
+      } catch (error) {
+        console.error('Error fetching task:', error);
+      }
+      const changed = fetching.get(taskId);
+      fetching.delete(taskId);
+      if (changed && active) {
+        fetchTask(taskId);
+      }
+    };
+
+    const subscribe = (cursor) => {
+      // Task changes are pushed as deltas; EventSource reconnects by itself
+      // and resumes from the last event it saw
+      source = new EventSource(`${API_BASE_URL}/events?cursor=${encodeURIComponent(cursor)}`);
+      source.addEventListener('task', (event) => {
+        const delta = JSON.parse(event.data);
+        if (!tasksRef.current.some((task) => task.task_id === delta.task_id)) {
+          if (fetching.has(delta.task_id)) {
+            fetching.set(delta.task_id, true);
+          } else {
+            fetchTask(delta.task_id);
+          }
+          return;
+        }
+        setTasks((current) => current.map((task) => (
+          task.task_id === delta.task_id ? { ...task, ...delta } : task
+        )));
+      });
+      // The server no longer has the events we missed: reload the snapshot
+      source.addEventListener('reset', () => {
+        source.close();
+        load();
+      });
+    };
+
+    const load = async () => {
+      const eventId = await fetchTasks();
+      if (eventId) {
+        subscribe(eventId);
+      }
+    };
+
+    load();
+    return () => {
+      active = false;
+      if (source) {
+        source.close();
+      }
+    };
   }, []);
 
   const fetchTasks = async () => {
     try {
-      const response = await axios.get(`${API_BASE_URL}/tasks`);
+      const response = await axios.get(`${API_BASE_URL}/tasks`, { params: { limit: MAX_TASKS } });
       if (response.data && Array.isArray(response.data.tasks)) {
         setTasks(response.data.tasks);
+        return response.data.event_id;
       } else {
         console.warn('Invalid tasks data format:', response.data);
         setTasks([]);
@@ -39,6 +113,7 @@ function Dashboard() {
       console.error('Error fetching tasks:', error);
       setTasks([]);
     }
+    return null;
   };
 
   const automationTools = [
@@ -116,7 +191,7 @@ function Dashboard() {
         
         <Grid container spacing={2}>
           {tasks && tasks.length > 0 ? (
-            tasks.slice(0, 5).map((task, index) => (
+            tasks.slice(0, MAX_TASKS).map((task, index) => (
               <Grid item xs={12} key={task.task_id || index}>
                 <Card>
                   <CardContent>
@@ -2,34 +2,77 @@ const { Stack, Duration } = require('aws-cdk-lib');
 const lambda = require('aws-cdk-lib/aws-lambda');
 const apigateway = require('aws-cdk-lib/aws-apigateway');
 const dynamodb = require('aws-cdk-lib/aws-dynamodb');
+const s3 = require('aws-cdk-lib/aws-s3');
+
+// /var/task is read-only, so modules deployed without bytecode are compiled
+// from source on every cold start. Bundling compiles them once at deploy
+// time; unchecked-hash .pyc files stay valid whatever timestamps the asset
+// zip gives their sources.
+const pythonCode = (directory) => lambda.Code.fromAsset(directory, {
+  exclude: ['__pycache__'],
+  bundling: {
+    image: lambda.Runtime.PYTHON_3_13.bundlingImage,
+    command: ['bash', '-c', 'cp -r /asset-input/. /asset-output && python -m compileall -q --invalidation-mode unchecked-hash /asset-output'],
+  },
+});
 
 class AutomationStack extends Stack {
   constructor(scope, id, props) {
     super(scope, id, props);
 
+    // Lambda allocates CPU in proportion to memory and the handlers are CPU
+    // bound, so 512 MB gets twice the CPU of 256 MB for init and for each
+    // call, at a similar cost per request. Override with -c lambdaMemorySize=...
+    const memorySize = Number(this.node.tryGetContext('lambdaMemorySize') || 512);
+
+    // JSON log lines carry the request id and any extra= fields of the
+    // handlers' log calls, like the API's own logs (backend/logs.py)
+    const loggingFormat = lambda.LoggingFormat.JSON;
+
     const tasksTable = new dynamodb.Table(this, 'TasksTable', {
       tableName: 'automation-tasks',
       partitionKey: { name: 'taskId', type: dynamodb.AttributeType.STRING },
       billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
+      timeToLiveAttribute: 'expiresAt',
+    });
+    // GET /tasks listings: one partition per creation day, newest id first
+    // (backend/dynamo_store.py)
+    tasksTable.addGlobalSecondaryIndex({
+      indexName: 'tasks-by-created',
+      partitionKey: { name: 'createdDay', type: dynamodb.AttributeType.STRING },
+      sortKey: { name: 'createdKey', type: dynamodb.AttributeType.STRING },
+    });
+
+    // Mailbox archives the email parser reads by archive_key
+    // (EMAIL_ARCHIVE_PREFIX<key>, one ranged GET per page)
+    const emailArchivePrefix = 'archives/';
+    const emailArchiveBucket = new s3.Bucket(this, 'EmailArchiveBucket', {
+      blockPublicAccess: s3.BlockPublicAccess.BLOCK_ALL,
+      encryption: s3.BucketEncryption.S3_MANAGED,
+      enforceSSL: true,
     });
 
     const emailParserFunction = new lambda.Function(this, 'EmailParserFunction', {
       runtime: lambda.Runtime.PYTHON_3_13,
       handler: 'lambda_function.lambda_handler',
-      code: lambda.Code.fromAsset('../lambda-functions/email-parser'),
+      code: pythonCode('../lambda-functions/email-parser'),
       timeout: Duration.seconds(30),
-      memorySize: 256,
+      memorySize,
+      loggingFormat,
       environment: {
-        LOG_LEVEL: 'INFO'
+        LOG_LEVEL: 'INFO',
+        EMAIL_ARCHIVE_BUCKET: emailArchiveBucket.bucketName,
+        EMAIL_ARCHIVE_PREFIX: emailArchivePrefix,
       }
     });
 
     const invoiceGeneratorFunction = new lambda.Function(this, 'InvoiceGeneratorFunction', {
       runtime: lambda.Runtime.PYTHON_3_13,
       handler: 'lambda_function.lambda_handler',
-      code: lambda.Code.fromAsset('../lambda-functions/invoice-generator'),
+      code: pythonCode('../lambda-functions/invoice-generator'),
       timeout: Duration.seconds(30),
-      memorySize: 256,
+      memorySize,
+      loggingFormat,
       environment: {
         LOG_LEVEL: 'INFO'
       }
@@ -38,9 +81,10 @@ class AutomationStack extends Stack {
     const leadScorerFunction = new lambda.Function(this, 'LeadScorerFunction', {
       runtime: lambda.Runtime.PYTHON_3_13,
       handler: 'lambda_function.lambda_handler',
-      code: lambda.Code.fromAsset('../lambda-functions/lead-scorer'),
+      code: pythonCode('../lambda-functions/lead-scorer'),
       timeout: Duration.seconds(30),
-      memorySize: 256,
+      memorySize,
+      loggingFormat,
       environment: {
         LOG_LEVEL: 'INFO'
       }
@@ -49,6 +93,7 @@ class AutomationStack extends Stack {
     tasksTable.grantReadWriteData(emailParserFunction);
     tasksTable.grantReadWriteData(invoiceGeneratorFunction);
     tasksTable.grantReadWriteData(leadScorerFunction);
+    emailArchiveBucket.grantRead(emailParserFunction, `${emailArchivePrefix}*`);
 
     const api = new apigateway.RestApi(this, 'AutomationApi', {
       restApiName: 'Automation Dashboard API',
@@ -0,0 +1,103 @@
+import re
+
+# Field markers are only recognised right before a colon, so instead of
+# running one regex per field over the whole email the scanner walks the
+# colons once and checks the few characters in front of each.
+MARKER_FIELDS = {
+    'from': 'sender',
+    'subject': 'subject',
+    'date': 'date',
+    'attachment': 'attachments',
+    'attachments': 'attachments',
+    'action item': 'action_items',
+    'action items': 'action_items',
+    'todo': 'action_items',
+    'follow up': 'action_items',
+}
+MARKER_LENGTHS = tuple(sorted({len(marker) for marker in MARKER_FIELDS}))
+# The original extractors ran one findall per pattern, and a findall never
+# matches inside the value it has already consumed; each pattern keeps its
+# own resume position here to reproduce that.
+MARKER_PATTERNS = {
+    'attachment': 'attachments',
+    'attachments': 'attachments',
+    'action item': 'action items',
+    'action items': 'action items',
+}
+HEADER_FIELDS = ('sender', 'subject', 'date')
+HIGH_PRIORITY_KEYWORDS = ('urgent', 'asap', 'critical', 'emergency')
+
+# Same value rule as the original per-field patterns: skip whitespace
+# (newlines included), then take the rest of that line.
+VALUE_RE = re.compile(r'\s*([^\n]+)')
+# Fallback for text whose lowercase form changes length (e.g. 'İ'),
+# where positions in the lowered copy no longer line up.
+MARKER_RE = re.compile(r'(from|subject|date|attachments?|action items?|todo|follow up):', re.IGNORECASE)
+
+
+def _markers(content, lowered):
+    """Yield (marker, start, value start) for every marker in the email, in order."""
+    if len(lowered) != len(content):
+        for match in MARKER_RE.finditer(content):
+            yield match.group(1).lower(), match.start(), match.end()
+        return
+    find = lowered.find
+    fields = MARKER_FIELDS
+    colon = find(':')
+    while colon != -1:
+        for length in MARKER_LENGTHS:
+            if length > colon:
+                break
+            marker = lowered[colon - length:colon]
+            if marker in fields:
+                yield marker, colon - length, colon + 1
+                break
+        colon = find(':', colon + 1)
+
+
+def scan(content):
+    """Extract every parsed_data field in one walk over the email.
+
+    Headers keep their first occurrence; attachments and action items are
+    returned in document order. Missing headers are None.
+    """
+    lowered = content.lower()
+    result = {
+        'sender': None,
+        'subject': None,
+        'date': None,
+        'attachments': [],
+        'action_items': [],
+        'priority': 'normal',
+    }
+    value_at = VALUE_RE.match
+    resume = {}
+    for marker, marker_start, start in _markers(content, lowered):
+        field = MARKER_FIELDS[marker]
+        if field in HEADER_FIELDS:
+            if result[field] is not None:
+                continue
+            match = value_at(content, start)
+            if match:
+                result[field] = match.group(1).strip()
+            continue
+        pattern = MARKER_PATTERNS.get(marker, marker)
+        if marker_start < resume.get(pattern, 0):
+            continue
+        match = value_at(content, start)
+        if not match:
+            continue
+        resume[pattern] = match.end()
+        if field == 'attachments':
+            result['attachments'].append(match.group(1))
+        else:
+            item = match.group(1).strip()
+            if item:
+                result['action_items'].append(item)
+
+    # Substring search stops at the first keyword it finds
+    for keyword in HIGH_PRIORITY_KEYWORDS:
+        if keyword in lowered:
+            result['priority'] = 'high'
+            break
+    return result
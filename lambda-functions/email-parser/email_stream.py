@@ -0,0 +1,253 @@
+import binascii
+import mmap
+import os
+import quopri
+from datetime import datetime, timezone
+from email.header import decode_header, make_header
+from email.parser import BytesHeaderParser
+
+from email_scanner import scan
+
+# Text kept per message for action-item and priority extraction; anything
+# beyond this is skipped so memory stays flat on huge messages.
+MAX_TEXT_BYTES = int(os.getenv('EMAIL_STREAM_MAX_TEXT_BYTES', str(1024 * 1024)))
+MAX_HEADER_BYTES = 256 * 1024
+
+_header_parser = BytesHeaderParser()
+
+
+def _decode_header(value):
+    if value is None:
+        return None
+    try:
+        return str(make_header(decode_header(value))).strip()
+    except Exception:
+        return str(value).strip()
+
+
+def _lines_from_chunks(chunks):
+    pending = b''
+    for chunk in chunks:
+        pending += chunk
+        start = 0
+        while True:
+            end = pending.find(b'\n', start)
+            if end == -1:
+                break
+            yield pending[start:end + 1]
+            start = end + 1
+        pending = pending[start:]
+    if pending:
+        yield pending
+
+
+def iter_lines(source, chunk_size=64 * 1024):
+    """Yield raw lines (newline kept) from a file, mmap or streaming body."""
+    if hasattr(source, 'readline'):
+        return iter(source.readline, b'')
+    if hasattr(source, 'iter_chunks'):
+        return _lines_from_chunks(source.iter_chunks(chunk_size))
+    return _lines_from_chunks(iter(lambda: source.read(chunk_size), b''))
+
+
+class _Part:
+    """Per-MIME-part state while its body lines stream past."""
+
+    __slots__ = ('headers', 'is_text', 'encoding', 'charset', 'lines', 'size')
+
+    def __init__(self, headers, is_text):
+        self.headers = headers
+        self.is_text = is_text
+        self.encoding = (headers.get('Content-Transfer-Encoding') or '7bit').strip().lower()
+        self.charset = headers.get_content_charset() or 'utf-8'
+        self.lines = []
+        self.size = 0
+
+    def add(self, line):
+        if self.is_text and self.size < MAX_TEXT_BYTES:
+            self.lines.append(line)
+            self.size += len(line)
+
+    def text(self):
+        if not self.lines:
+            return ''
+        raw = b''.join(self.lines)
+        try:
+            if self.encoding == 'base64':
+                raw = binascii.a2b_base64(raw)
+            elif self.encoding == 'quoted-printable':
+                raw = quopri.decodestring(raw)
+        except (ValueError, binascii.Error):
+            pass
+        try:
+            return raw.decode(self.charset, errors='replace')
+        except LookupError:
+            return raw.decode('utf-8', errors='replace')
+
+
+def _is_attachment(headers):
+    disposition = (headers.get('Content-Disposition') or '').split(';', 1)[0].strip().lower()
+    if disposition == 'attachment' or headers.get_filename():
+        return True
+    return headers.get_content_maintype() not in ('text', 'multipart', 'message')
+
+
+class _MessageParser:
+    """Incremental RFC 822 / MIME parser fed one line at a time."""
+
+    def __init__(self, thread_aware=False):
+        self.thread_aware = thread_aware
+        self.header_lines = []
+        self.header_size = 0
+        self.headers = None
+        self.boundaries = []
+        self.part = None
+        self.part_header_lines = None
+        self.attachments = []
+        self.texts = []
+        self.text_size = 0
+
+    def _open_part(self, headers):
+        content_type = headers.get_content_type()
+        if content_type.startswith('multipart/'):
+            boundary = headers.get_param('boundary')
+            if boundary:
+                self.boundaries.append(b'--' + boundary.encode('utf-8', 'replace'))
+            self.part = None
+            return
+        if _is_attachment(headers):
+            # Attachment payloads are skipped line by line, never decoded
+            self.attachments.append(_decode_header(headers.get_filename()) or 'unnamed')
+            self.part = _Part(headers, is_text=False)
+            return
+        is_text = content_type in ('text/plain', 'text/html') and self.text_size < MAX_TEXT_BYTES
+        self.part = _Part(headers, is_text=is_text)
+
+    def _close_part(self):
+        if self.part is not None and self.part.is_text:
+            text = self.part.text()
+            self.texts.append(text)
+            self.text_size += len(text)
+        self.part = None
+
+    def feed(self, line):
+        if self.headers is None:
+            if line.strip():
+                if self.header_size < MAX_HEADER_BYTES:
+                    self.header_lines.append(line)
+                    self.header_size += len(line)
+                return
+            self.headers = _header_parser.parsebytes(b''.join(self.header_lines))
+            self.header_lines = None
+            self._open_part(self.headers)
+            return
+
+        if self.part_header_lines is not None:
+            if line.strip():
+                self.part_header_lines.append(line)
+                return
+            headers = _header_parser.parsebytes(b''.join(self.part_header_lines))
+            self.part_header_lines = None
+            self._open_part(headers)
+            return
+
+        if self.boundaries and line.startswith(b'--'):
+            marker = line.rstrip(b'\r\n')
+            for depth in range(len(self.boundaries) - 1, -1, -1):
+                boundary = self.boundaries[depth]
+                if marker == boundary or marker == boundary + b'--':
+                    self._close_part()
+                    del self.boundaries[depth + 1:]
+                    if marker == boundary:
+                        self.part_header_lines = []
+                    else:
+                        self.boundaries.pop()
+                    return
+
+        if self.part is not None:
+            self.part.add(line)
+
+    def close(self):
+        if self.headers is None:
+            self.headers = _header_parser.parsebytes(b''.join(self.header_lines or []))
+            self._open_part(self.headers)
+        self._close_part()
+        body = '\n'.join(self.texts)
+        if self.thread_aware:
+            # Archives hold whole threads: each reply reuses the results
+            # for the history it quotes
+            from email_threads import scan_thread
+            scanned = scan_thread(body)
+        else:
+            scanned = scan(body)
+        subject = _decode_header(self.headers.get('Subject'))
+        priority = scanned['priority']
+        if priority == 'normal' and subject and scan(subject)['priority'] == 'high':
+            priority = 'high'
+        return {
+            'sender': _decode_header(self.headers.get('From')) or 'Unknown',
+            'subject': subject or 'No Subject',
+            'date': _decode_header(self.headers.get('Date')) or datetime.now(timezone.utc).isoformat(),
+            'attachments': self.attachments + scanned['attachments'],
+            'action_items': list(dict.fromkeys(scanned['action_items'])),
+            'priority': priority,
+        }
+
+
+def iter_messages(source, thread_aware=False, skip=0, first_index=0, offset=0):
+    """Parse RFC 822 messages one at a time from a file-like object.
+
+    mbox input (starting with a "From " line) is split on the "From "
+    separator lines that follow a blank line; anything else is read as a
+    single message. Each record is produced as soon as its message ends,
+    so memory does not grow with the archive size. thread_aware scans
+    bodies with email_threads.scan_thread.
+
+    The first skip messages are passed over with only the separator check,
+    never parsed or scanned. For resuming at a byte offset (a previous
+    record's "next_offset"), source starts there and first_index is the
+    message_index of its first message. Every record carries "next_offset",
+    the byte offset in the whole archive where the following message
+    starts, or None after the last one.
+    """
+    parser = None
+    is_mbox = None
+    previous_blank = True
+    index = first_index - 1
+    position = offset
+    for line in iter_lines(source):
+        line_start = position
+        position += len(line)
+        if is_mbox is None:
+            is_mbox = line.startswith(b'From ')
+            if offset and not is_mbox:
+                raise ValueError(f"Offset {offset} is not the start of a message")
+        if is_mbox and previous_blank and line.startswith(b'From '):
+            if parser is not None:
+                yield dict(parser.close(), message_index=index, next_offset=line_start)
+            index += 1
+            parser = _MessageParser(thread_aware) if index - first_index >= skip else None
+            previous_blank = False
+            continue
+        previous_blank = not line.strip()
+        if index < first_index:
+            # Not an mbox: the whole source is one message
+            index = first_index
+            parser = _MessageParser(thread_aware) if skip <= 0 else None
+        if parser is not None:
+            parser.feed(line)
+    if parser is not None:
+        yield dict(parser.close(), message_index=index, next_offset=None)
+
+
+def iter_mbox(path, thread_aware=False, skip=0, first_index=0, offset=0):
+    """Parse an mbox file through a read-only memory map, from byte offset on."""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if offset > size:
+            raise ValueError(f"Offset {offset} is past the end of the archive")
+        if size == offset:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            mapped.seek(offset)
+            yield from iter_messages(mapped, thread_aware, skip, first_index, offset)
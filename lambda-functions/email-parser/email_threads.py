@@ -0,0 +1,127 @@
+import os
+import re
+from collections import OrderedDict
+from hashlib import sha256
+
+from email_scanner import HEADER_FIELDS, scan
+
+# Replies carry the whole earlier thread as quoted history: "> " lines, or
+# the previous message below an "Original Message" separator. The history
+# of a reply is the body of the message it answers, so each parsed body is
+# cached under its fingerprint, and the next reply finds its history there
+# instead of scanning it again. Fingerprints drop quote markers and collapse
+# whitespace runs to one space, so the same text matches at any quoting
+# depth and after a client re-wraps it, while "to day" and "today" differ.
+CACHE_ENTRIES = int(os.getenv('EMAIL_THREAD_CACHE_ENTRIES', '2048'))
+# Histories shorter than this are cheaper to scan than to fingerprint
+MIN_HISTORY_CHARS = 256
+# Quote markers are dropped and every other whitespace byte becomes a space
+QUOTE_MARKERS = b'>'
+WHITESPACE = bytes.maketrans(b'\t\r\n\x0b\x0c', b'     ')
+SPACES_RE = re.compile(rb'  +')
+
+# Starts with a literal so the regex engine can skip ahead to each "-"
+SEPARATOR_RE = re.compile(r'-{2,}[ \t]*(?:Original|Forwarded) [Mm]essage[ \t]*-{2,}[ \t]*\n?')
+# "Name: value" lines up to a blank line, quoted or not
+HEADER_BLOCK_RE = re.compile(r'(?:[ \t>]*[A-Za-z][\w-]*:[^\n]*\n)+[ \t>]*\n')
+
+_cache = OrderedDict()
+stats = {'lookups': 0, 'hits': 0}
+
+
+def merge(results):
+    """Combine scan results of consecutive parts of one email, in document order."""
+    merged = {
+        'sender': None,
+        'subject': None,
+        'date': None,
+        'attachments': [],
+        'action_items': [],
+        'priority': 'normal',
+    }
+    for result in results:
+        for field in HEADER_FIELDS:
+            if merged[field] is None:
+                merged[field] = result[field]
+        merged['attachments'].extend(result['attachments'])
+        merged['action_items'].extend(result['action_items'])
+        if result['priority'] == 'high':
+            merged['priority'] = 'high'
+    # First occurrence wins, so repeated items keep a stable position
+    merged['action_items'] = list(dict.fromkeys(merged['action_items']))
+    return merged
+
+
+def history_start(content):
+    """Offset where the quoted history begins, or None."""
+    quote = 0 if content.startswith('>') else content.find('\n>') + 1
+    separator = SEPARATOR_RE.search(content, 0, quote or len(content))
+    if separator:
+        return separator.end()
+    return quote or None
+
+
+def header_end(text, start=0):
+    match = HEADER_BLOCK_RE.match(text, start)
+    return match.end() if match else start
+
+
+def normalize(text):
+    """Fingerprint input: the words of text, each followed by one space.
+
+    The trailing space makes normalize(a + b) == normalize(a) + normalize(b)
+    when they meet at whitespace, which is how the keys below are built.
+    """
+    data = text.encode('utf-8', 'surrogatepass').translate(WHITESPACE, QUOTE_MARKERS)
+    data = SPACES_RE.sub(b' ', data).strip(b' ')
+    return data + b' ' if data else b''
+
+
+def _remember(key, result):
+    _cache[key] = result
+    if len(_cache) > CACHE_ENTRIES:
+        _cache.popitem(last=False)
+
+
+def scan_thread(content, counters=None):
+    """scan() for reply threads: history parsed before in this process is not scanned again.
+
+    Returns scan()'s fields with action items de-duplicated in document
+    order. counters, if given, collects scanned_chars and reused_chars.
+    """
+    counters = {'scanned_chars': 0, 'reused_chars': 0} if counters is None else counters
+    start = history_start(content)
+    if start is None or len(content) - start < MIN_HISTORY_CHARS:
+        counters['scanned_chars'] += len(content)
+        return merge([scan(content)])
+
+    # headers | new text | history headers | history body
+    body_start = header_end(content)
+    history_body = header_end(content, start)
+    history = normalize(content[start:])
+    history_key = sha256(history[len(normalize(content[start:history_body])):]).digest()
+    stats['lookups'] += 1
+    history_result = _cache.get(history_key)
+    if history_result is None:
+        history_result = scan(content[history_body:])
+        _remember(history_key, history_result)
+        counters['scanned_chars'] += len(content) - history_body
+    else:
+        _cache.move_to_end(history_key)
+        stats['hits'] += 1
+        counters['reused_chars'] += len(content) - history_body
+    counters['scanned_chars'] += history_body
+    parts = [scan(content[:body_start]), scan(content[body_start:start]), scan(content[start:history_body]),
+             history_result]
+
+    # The next reply quotes this message's body as its history
+    body_key = sha256(normalize(content[body_start:start]))
+    body_key.update(history)
+    body_key = body_key.digest()
+    _remember(body_key, merge(parts[1:]))
+    return merge(parts)
+
+
+def clear():
+    _cache.clear()
+    stats.update(lookups=0, hits=0)
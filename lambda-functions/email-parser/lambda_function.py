@@ -1,47 +1,75 @@
-import json
+import os
 import re
 from datetime import datetime, timezone
+from functools import lru_cache
 import logging
+import time
+from email_scanner import HIGH_PRIORITY_KEYWORDS, scan
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Reply threads: quoted history already parsed in this container is not
+# scanned again (email_threads.py); per request with "thread_aware"
+THREAD_AWARE = os.getenv('EMAIL_THREAD_AWARE', 'false').lower() == 'true'
+
+# Archive backfills read only from this bucket and key prefix, or for local
+# development this directory; requests name an archive_key inside it, never
+# a bucket or a server path
+ARCHIVE_BUCKET = os.getenv('EMAIL_ARCHIVE_BUCKET', '')
+ARCHIVE_PREFIX = os.getenv('EMAIL_ARCHIVE_PREFIX', 'archives/')
+ARCHIVE_DIR = os.getenv('EMAIL_ARCHIVE_DIR', '')
+# Replaced by archive_key; refused so old callers get an error, not a parse
+LOCATION_KEYS = ('mbox_path', 's3_bucket', 's3_key')
+
+ACTION_ITEM_PATTERNS = (
+    r'action item[s]?:\s*([^\n]+)',
+    r'todo:\s*([^\n]+)',
+    r'follow up:\s*([^\n]+)'
+)
+
 def lambda_handler(event, context):
+    started = time.perf_counter()
+    timings = {}
     try:
-        logger.info(f"Processing email parse request: {context.aws_request_id}")
+        logger.info("Processing email parse request: %s", context.aws_request_id)
         
-        if not event or 'email_content' not in event:
-            raise ValueError("Missing required parameter: email_content")
-            
-        email_content = event.get('email_content', '')
+        if event and 'records' in event:
+            results = process_batch(event['records'], timings)
+            logger.info("Email batch parsed: %s records (%s)", len(results), context.aws_request_id)
+            return {
+                'statusCode': 200,
+                'body': {
+                    'success': True,
+                    'results': results,
+                    'timings': report_timings(timings, started),
+                    'processed_at': datetime.now(timezone.utc).isoformat()
+                }
+            }
         
-        if not email_content.strip():
-            raise ValueError("Email content cannot be empty")
+        if event and ('archive_key' in event or any(key in event for key in LOCATION_KEYS)):
+            body = parse_archive(event)
+            body['timings'] = report_timings(timings, started)
+            logger.info("Email archive parsed: %s messages (%s)", len(body['results']), context.aws_request_id)
+            return {'statusCode': 200, 'body': body}
         
-        # Extract key information from email
-        parsed_data = {
-            'sender': extract_sender(email_content),
-            'subject': extract_subject(email_content),
-            'date': extract_date(email_content),
-            'attachments': extract_attachments(email_content),
-            'action_items': extract_action_items(email_content),
-            'priority': determine_priority(email_content)
-        }
+        parsed_data = parse_event(event, timings)
         
-        logger.info(f"Email parsing completed successfully: {context.aws_request_id}")
+        logger.info("Email parsing completed successfully: %s", context.aws_request_id)
         
         return {
             'statusCode': 200,
             'body': {
                 'success': True,
                 'parsed_data': parsed_data,
+                'timings': report_timings(timings, started),
                 'processed_at': datetime.now(timezone.utc).isoformat()
             }
         }
         
     except ValueError as ve:
-        logger.error(f"Validation error: {str(ve)}")
+        logger.error("Validation error: %s", ve)
         return {
             'statusCode': 400,
             'body': {
@@ -50,7 +78,7 @@ def lambda_handler(event, context):
             }
         }
     except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
+        logger.error("Unexpected error: %s", e)
         return {
             'statusCode': 500,
             'body': {
@@ -59,49 +87,182 @@ def lambda_handler(event, context):
             }
         }
 
+def parse_event(event, timings=None):
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    if not isinstance(event, dict) or 'email_content' not in event:
+        raise ValueError("Missing required parameter: email_content")
+        
+    email_content = event.get('email_content', '')
+    if not isinstance(email_content, str):
+        raise ValueError("email_content must be a string")
+    
+    if not email_content.strip():
+        raise ValueError("Email content cannot be empty")
+    
+    started = stage_done(timings, 'validation', started)
+    
+    # Extract key information from email in a single scan
+    thread = None
+    if event.get('thread_aware', THREAD_AWARE):
+        from email_threads import scan_thread
+        thread = {'scanned_chars': 0, 'reused_chars': 0}
+        scanned = scan_thread(email_content, thread)
+    else:
+        scanned = scan(email_content)
+    parsed_data = {
+        'sender': 'Unknown' if scanned['sender'] is None else scanned['sender'],
+        'subject': 'No Subject' if scanned['subject'] is None else scanned['subject'],
+        'date': datetime.now(timezone.utc).isoformat() if scanned['date'] is None else scanned['date'],
+        'attachments': scanned['attachments'],
+        'action_items': list(dict.fromkeys(scanned['action_items'])),  # Remove duplicates, keep order
+        'priority': scanned['priority']
+    }
+    if thread is not None:
+        parsed_data['thread'] = thread
+    stage_done(timings, 'extraction', started)
+    return parsed_data
+
+def archive_key(event):
+    key = event.get('archive_key')
+    if any(name in event for name in LOCATION_KEYS):
+        raise ValueError("mbox_path, s3_bucket and s3_key are not accepted; name the archive with archive_key")
+    if not isinstance(key, str) or not key or key.startswith('/') or '\\' in key \
+            or any(part in ('', '.', '..') for part in key.split('/')):
+        raise ValueError("archive_key must be a relative path such as 2024/inbox.mbox")
+    return key
+
+def archive_path(key):
+    # The directory itself may be a symlink; keys may not lead out of it
+    root = os.path.realpath(ARCHIVE_DIR)
+    path = os.path.realpath(os.path.join(root, key))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError("archive_key must stay inside the archive directory")
+    if not os.path.isfile(path):
+        raise ValueError(f"Archive not found: {key}")
+    return path
+
+def whole_number(event, name, default):
+    value = event.get(name, default)
+    if isinstance(value, str) and value.isdigit():
+        value = int(value)
+    if type(value) is not int:
+        raise ValueError(f"{name} must be a whole number")
+    return value
+
+def parse_archive(event):
+    # Imported lazily: only archive backfills need the streaming parser
+    from email_stream import iter_messages, iter_mbox
+    
+    key = archive_key(event)
+    start = whole_number(event, 'start', 0)
+    limit = whole_number(event, 'limit', 100)
+    # next_offset of the previous page: resume at that byte instead of
+    # reading the archive again from the top
+    offset = whole_number(event, 'offset', 0)
+    if start < 0 or limit <= 0 or offset < 0:
+        raise ValueError("start and offset must be >= 0 and limit must be positive")
+    # With an offset, start is the index of the message found there;
+    # without one the first start messages are only scanned for separators
+    skip, first_index = (0, start) if offset else (start, 0)
+    
+    thread_aware = event.get('thread_aware', THREAD_AWARE)
+    if ARCHIVE_BUCKET:
+        import boto3
+        from botocore.exceptions import ClientError
+        request = {'Bucket': ARCHIVE_BUCKET, 'Key': ARCHIVE_PREFIX + key}
+        if offset:
+            request['Range'] = f"bytes={offset}-"
+        try:
+            response = boto3.client('s3').get_object(**request)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'InvalidRange':
+                raise ValueError(f"Offset {offset} is past the end of the archive") from e
+            raise
+        messages = iter_messages(response['Body'], thread_aware, skip, first_index, offset)
+    elif ARCHIVE_DIR:
+        messages = iter_mbox(archive_path(key), thread_aware, skip, first_index, offset)
+    else:
+        raise ValueError("Archive parsing is not configured (EMAIL_ARCHIVE_BUCKET or EMAIL_ARCHIVE_DIR)")
+    
+    results = []
+    next_start = next_offset = None
+    for record in messages:
+        next_offset = record.pop('next_offset')
+        results.append(record)
+        if len(results) == limit:
+            break
+    if next_offset is not None:
+        next_start = results[-1]['message_index'] + 1
+    
+    return {
+        'success': True,
+        'results': results,
+        'next_start': next_start,
+        'next_offset': next_offset,
+        'processed_at': datetime.now(timezone.utc).isoformat()
+    }
+
+def process_batch(records, timings=None):
+    if not isinstance(records, list):
+        raise ValueError("records must be a list")
+    
+    # Per-record failures are reported inline so one bad email
+    # does not fail the whole chunk
+    results = []
+    for record in records:
+        try:
+            results.append({'success': True, 'parsed_data': parse_event(record, timings)})
+        except (ValueError, TypeError, AttributeError, OverflowError) as e:
+            results.append({'success': False, 'error': str(e)})
+    return results
+
+def stage_done(timings, stage, started):
+    # Accumulates per-stage milliseconds and returns the next stage's start
+    now = time.perf_counter()
+    timings[stage] = timings.get(stage, 0.0) + (now - started) * 1000
+    return now
+
+def report_timings(timings, started):
+    timings['total'] = (time.perf_counter() - started) * 1000
+    return {stage: round(ms, 3) for stage, ms in timings.items()}
+
+# The per-field extractors are only used to check the scanner against
+# (tests/test_email_scanner.py, benchmarks/email_scanner.py), so their
+# patterns are compiled on first use, once per container, rather than in
+# every cold start
+@lru_cache(maxsize=None)
+def compiled(pattern):
+    return re.compile(pattern, re.IGNORECASE)
+
 def extract_sender(content):
-    pattern = r'From:\s*([^\n]+)'
-    match = re.search(pattern, content, re.IGNORECASE)
+    match = compiled(r'From:\s*([^\n]+)').search(content)
     return match.group(1).strip() if match else 'Unknown'
 
 def extract_subject(content):
-    pattern = r'Subject:\s*([^\n]+)'
-    match = re.search(pattern, content, re.IGNORECASE)
+    match = compiled(r'Subject:\s*([^\n]+)').search(content)
     return match.group(1).strip() if match else 'No Subject'
 
 def extract_date(content):
-    pattern = r'Date:\s*([^\n]+)'
-    match = re.search(pattern, content, re.IGNORECASE)
+    match = compiled(r'Date:\s*([^\n]+)').search(content)
     return match.group(1).strip() if match else datetime.now(timezone.utc).isoformat()
 
 def extract_attachments(content):
-    pattern = r'attachment[s]?:\s*([^\n]+)'
-    matches = re.findall(pattern, content, re.IGNORECASE)
-    return matches
+    return compiled(r'attachment[s]?:\s*([^\n]+)').findall(content)
 
 def extract_action_items(content):
-    patterns = [
-        r'action item[s]?:\s*([^\n]+)',
-        r'todo:\s*([^\n]+)',
-        r'follow up:\s*([^\n]+)'
-    ]
-    
     action_items = []
-    try:
-        for pattern in patterns:
-            matches = re.findall(pattern, content, re.IGNORECASE)
-            action_items.extend([match.strip() for match in matches if match.strip()])
-    except re.error as e:
-        logger.warning(f"Regex error in action items extraction: {e}")
+    for pattern in ACTION_ITEM_PATTERNS:
+        matches = compiled(pattern).findall(content)
+        action_items.extend([match.strip() for match in matches if match.strip()])
     
-    return list(set(action_items))  # Remove duplicates
+    return list(dict.fromkeys(action_items))  # Remove duplicates, keep order
 
 def determine_priority(content):
-    high_priority_keywords = ['urgent', 'asap', 'critical', 'emergency']
     content_lower = content.lower()
     
     # More efficient approach using any() instead of loop
-    if any(keyword in content_lower for keyword in high_priority_keywords):
+    if any(keyword in content_lower for keyword in HIGH_PRIORITY_KEYWORDS):
         return 'high'
     
     return 'normal'
\ No newline at end of file
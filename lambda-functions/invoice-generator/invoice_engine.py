@@ -0,0 +1,257 @@
+import os
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from tax_tables import get_tax_table
+
+# NumPy is optional: the Lambda package does not bundle it, so without it
+# every invoice takes the exact integer loop below. It is imported by
+# load_numpy() on the first long item list rather than during the cold
+# start, where it would cost more than most invocations.
+np = None
+_numpy_loaded = False
+
+
+def load_numpy():
+    global np, _numpy_loaded
+    if not _numpy_loaded:
+        _numpy_loaded = True
+        try:
+            import numpy
+        except ImportError:  # pragma: no cover - depends on the deployment
+            return None
+        np = numpy
+    return np
+
+# Parsed amounts kept per engine; warm containers reuse one engine, so
+# the cache starts over rather than growing without bound
+MAX_CACHED_AMOUNTS = 65536
+
+# Item lists at least this long are totalled column-wise when NumPy is there
+VECTOR_MIN_ITEMS = 4096
+
+# The vectorized path works on quantities in thousandths and prices in
+# millionths. Below these bounds a float with that many decimals maps to
+# exactly one such fixed-point value, so both paths agree to the cent;
+# anything else goes through the exact loop.
+QUANTITY_SCALE, PRICE_SCALE = 1000, 1_000_000
+MAX_VECTOR_QUANTITY, MAX_VECTOR_PRICE = 2.0 ** 33, 2.0 ** 32
+MAX_VECTOR_PRODUCT = 9.0e18
+
+# Amounts are below 10**18 with at most 30 decimals, checked before any
+# power of ten is built: "1e10000000" is a short string but a ten million
+# digit integer
+MAX_AMOUNT_DIGITS = 18
+MAX_AMOUNT = 10 ** MAX_AMOUNT_DIGITS
+MAX_EXPONENT = 30
+
+_POW10 = tuple(10 ** n for n in range(64))
+
+
+def _pow10(n):
+    return _POW10[n] if n < 64 else 10 ** n
+
+
+def scale_amount(value):
+    """An amount as an exact (integer, decimals) pair: 19.99 -> (1999, 2).
+
+    Floats are taken at their shortest repr, which is the number the client
+    typed, so binary rounding never reaches the totals.
+    """
+    kind = type(value)
+    if kind is int:
+        if not -MAX_AMOUNT < value < MAX_AMOUNT:
+            raise ValueError(f"Amount out of range, got {value!r}")
+        return value, 0
+    if kind is float:
+        # Same reasoning as the vectorized path: below 2**32 at most one
+        # multiple of 1e-6 rounds to a given float, so when one does it is
+        # the float's shortest repr. Cents are tried first since most
+        # prices have them, and small scales keep the integers small.
+        if -MAX_VECTOR_PRICE < value < MAX_VECTOR_PRICE:
+            fixed = round(value * 100)
+            if fixed / 100 == value:
+                return fixed, 2
+            fixed = round(value * PRICE_SCALE)
+            if fixed / PRICE_SCALE == value:
+                return fixed, 6
+        text = repr(value)
+        if 'e' not in text and 'n' not in text:  # not an exponent, nan or inf
+            whole, _, fraction = text.partition('.')
+            if fraction == '0':
+                return int(whole), 0
+            return int(whole + fraction), len(fraction)
+    number = Decimal(repr(value) if kind is float else value)
+    if not number.is_finite():
+        raise ValueError(f"Amount must be finite, got {value!r}")
+    sign, digits, exponent = number.as_tuple()
+    if abs(exponent) > MAX_EXPONENT or number.adjusted() >= MAX_AMOUNT_DIGITS:
+        raise ValueError(f"Amount out of range, got {str(value)[:40]!r}")
+    integer = int(''.join(map(str, digits)) or '0')
+    if sign:
+        integer = -integer
+    if exponent >= 0:
+        return integer * _pow10(exponent), 0
+    return integer, -exponent
+
+
+def to_cents(integer, decimals):
+    """Round a non-negative fixed-point amount half-up to whole cents."""
+    if decimals <= 2:
+        return integer * _POW10[2 - decimals]
+    unit = _pow10(decimals - 2)
+    # unit is a power of ten, so unit // 2 is exactly half of it
+    return (integer + unit // 2) // unit
+
+
+def _line(item, quantity, price, cents):
+    return {
+        'description': item.get('description', 'No description'),
+        'quantity': quantity,
+        'price': price,
+        'total': cents / 100
+    }
+
+
+class InvoiceEngine:
+    """Totals line items on integer cents and builds invoices.
+
+    One engine can build many invoices: the tax table is looked up once and
+    parsed amounts are shared, since usage-based invoices repeat the same
+    unit prices thousands of times. Line totals are quantity x price
+    rounded half-up to the cent, tax is rounded half-up on the exact
+    subtotal, and nothing accumulates float drift.
+    """
+
+    def __init__(self, table=None):
+        self.table = table or get_tax_table()
+        self._scaled = {}
+
+    def _scale(self, value):
+        if len(self._scaled) >= MAX_CACHED_AMOUNTS:
+            self._scaled.clear()
+        scaled = self._scaled[value] = scale_amount(value)
+        return scaled
+
+    def line_cents(self, item, quantity=None, price=None):
+        """Validate one item and return its total in cents."""
+        if quantity is None:
+            quantity, price = item.get('quantity', 0), item.get('price', 0)
+        scaled = self._scaled
+        try:
+            quantity, quantity_decimals = scaled.get(quantity) or self._scale(quantity)
+            price, price_decimals = scaled.get(price) or self._scale(price)
+        except (ValueError, TypeError, ArithmeticError) as e:
+            raise ValueError(f"Invalid quantity or price format for item: {item.get('description', 'Unknown')}") from e
+        if quantity <= 0:
+            raise ValueError(f"Quantity must be greater than 0 for item: {item.get('description', 'Unknown')}")
+        if price < 0:
+            raise ValueError(f"Price cannot be negative for item: {item.get('description', 'Unknown')}")
+        return to_cents(quantity * price, quantity_decimals + price_decimals)
+
+    def _vector_cents(self, items):
+        """Column-wise line totals, or None when the exact loop has to run."""
+        quantities = [item.get('quantity', 0) for item in items]
+        prices = [item.get('price', 0) for item in items]
+        if not {type(value) for value in quantities}.union(map(type, prices)) <= {int, float}:
+            return None
+        try:
+            quantity = np.array(quantities, dtype=np.float64)
+            price = np.array(prices, dtype=np.float64)
+        except OverflowError:  # ints beyond float range
+            return None
+        # Invalid items fall back so the loop reports the first one in order
+        if not (np.isfinite(quantity).all() and np.isfinite(price).all()
+                and (quantity > 0).all() and (price >= 0).all()):
+            return None
+        quantity_fixed = np.rint(quantity * QUANTITY_SCALE)
+        price_fixed = np.rint(price * PRICE_SCALE)
+        exact = ((quantity_fixed / QUANTITY_SCALE == quantity) & (price_fixed / PRICE_SCALE == price)
+                 & (quantity < MAX_VECTOR_QUANTITY) & (price < MAX_VECTOR_PRICE)
+                 & (quantity_fixed * price_fixed < MAX_VECTOR_PRODUCT))
+        product = np.where(exact, quantity_fixed, 0).astype(np.int64) * np.where(exact, price_fixed, 0).astype(np.int64)
+        unit = QUANTITY_SCALE * PRICE_SCALE // 100
+        # Half-up without doubling: 2 * product would pass int64 for
+        # products above 2**62, well inside MAX_VECTOR_PRODUCT
+        cents = ((product + unit // 2) // unit).tolist()
+        if not exact.all():
+            for index in np.flatnonzero(~exact).tolist():
+                cents[index] = self.line_cents(items[index])
+        return cents
+
+    def line_totals(self, items, lines=None):
+        """Validated per-item cents, in item order.
+
+        When lines is a list, the invoice's item entries are appended to it
+        in the same pass.
+        """
+        if len(items) >= VECTOR_MIN_ITEMS and load_numpy() is not None:
+            cents = self._vector_cents(items)
+            if cents is not None:
+                if lines is not None:
+                    lines.extend(_line(item, float(item.get('quantity', 0)), float(item.get('price', 0)), total)
+                                 for item, total in zip(items, cents))
+                return cents
+        cents = []
+        append = cents.append
+        for item, quantity, price, total in self.iter_lines(items):
+            append(total)
+            if lines is not None:
+                lines.append(_line(item, float(quantity), float(price), total))
+        return cents
+
+    def iter_lines(self, items):
+        """Validated (item, quantity, price, cents) tuples, one item at a time.
+
+        For renderers that stream an invoice out as it is totalled; an
+        invalid item raises when it is reached.
+        """
+        line_cents = self.line_cents
+        for item in items:
+            quantity = item.get('quantity', 0)
+            price = item.get('price', 0)
+            # Whole units at whole prices need no parsing at all
+            if type(quantity) is int and type(price) is int and quantity > 0 and price >= 0:
+                total = quantity * price * 100
+            else:
+                total = line_cents(item, quantity, price)
+            yield item, quantity, price, total
+
+    def header(self, client_info):
+        """The invoice fields that do not depend on the line items."""
+        now = datetime.now(timezone.utc)
+        return {
+            'invoice_number': f"INV-{os.urandom(4).hex().upper()}",
+            'date': now.strftime('%Y-%m-%d'),
+            'due_date': (now + timedelta(days=30)).strftime('%Y-%m-%d'),
+            'client': {
+                'name': client_info.get('name', 'Unknown Client'),
+                'email': client_info.get('email', ''),
+                'address': client_info.get('address', '')
+            },
+        }
+
+    def summary(self, client_info, subtotal, item_count):
+        """Totals for a subtotal in cents, with the client's tax rate."""
+        rate = self.table.lookup(client_info)
+        tax = rate.tax_cents(subtotal)
+        return {
+            'item_count': item_count,
+            'subtotal': subtotal / 100,
+            'tax_rate': rate.rate,
+            'tax_region': rate.key,
+            'tax_amount': tax / 100,
+            'total': (subtotal + tax) / 100,
+            'status': 'pending'
+        }
+
+    def invoice(self, client_info, items, include_items=True):
+        if not items:
+            raise ValueError("Items list cannot be empty")
+        lines = [] if include_items else None
+        subtotal = sum(self.line_totals(items, lines))
+        invoice = self.header(client_info)
+        if include_items:
+            invoice['items'] = lines
+        invoice.update(self.summary(client_info, subtotal, len(items)))
+        return invoice
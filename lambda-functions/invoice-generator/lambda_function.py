@@ -1,44 +1,59 @@
-import json
-from datetime import datetime, timedelta, timezone
-import uuid
+from datetime import datetime, timezone
 import logging
+import time
+from invoice_engine import InvoiceEngine
+from tax_tables import get_tax_table
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Kept across warm invocations, so unit prices parsed for one invoice are
+# reused by the next; replaced when the tax table is reloaded
+_engine = None
+
+def warm_engine():
+    global _engine
+    table = get_tax_table()
+    if _engine is None or _engine.table is not table:
+        _engine = InvoiceEngine(table)
+    return _engine
+
 def lambda_handler(event, context):
+    started = time.perf_counter()
+    timings = {}
     try:
-        logger.info(f"Processing invoice generation: {context.aws_request_id}")
-        
-        if not event:
-            raise ValueError("Missing event data")
-            
-        client_info = event.get('client_info', {})
-        items = event.get('items', [])
+        logger.info("Processing invoice generation: %s", context.aws_request_id)
         
-        # Validate required fields
-        if not client_info.get('name'):
-            raise ValueError("Client name is required")
-        
-        if not items or not isinstance(items, list):
-            raise ValueError("At least one invoice item is required")
+        if event and 'records' in event:
+            results = process_batch(event['records'], timings)
+            logger.info("Invoice batch generated: %s records (%s)", len(results), context.aws_request_id)
+            return {
+                'statusCode': 200,
+                'body': {
+                    'success': True,
+                    'results': results,
+                    'timings': report_timings(timings, started),
+                    'generated_at': datetime.now(timezone.utc).isoformat()
+                }
+            }
         
-        invoice = generate_invoice(client_info, items)
+        invoice = invoice_event(event, timings)
         
-        logger.info(f"Invoice generated successfully: {invoice['invoice_number']}")
+        logger.info("Invoice generated successfully: %s", invoice['invoice_number'])
         
         return {
             'statusCode': 200,
             'body': {
                 'success': True,
                 'invoice': invoice,
+                'timings': report_timings(timings, started),
                 'generated_at': datetime.now(timezone.utc).isoformat()
             }
         }
         
     except ValueError as ve:
-        logger.error(f"Validation error: {str(ve)}")
+        logger.error("Validation error: %s", ve)
         return {
             'statusCode': 400,
             'body': {
@@ -47,7 +62,7 @@ def lambda_handler(event, context):
             }
         }
     except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
+        logger.error("Unexpected error: %s", e)
         return {
             'statusCode': 500,
             'body': {
@@ -56,69 +71,67 @@ def lambda_handler(event, context):
             }
         }
 
-def generate_invoice(client_info, items):
-    try:
-        invoice_number = f"INV-{uuid.uuid4().hex[:8].upper()}"
-        
-        # Validate and calculate totals
-        if not items:
-            raise ValueError("Items list cannot be empty")
-        
-        validated_items = []
-        subtotal = 0
-        
-        for item in items:
-            try:
-                quantity = float(item.get('quantity', 0))
-                price = float(item.get('price', 0))
-            except (ValueError, TypeError) as e:
-                raise ValueError(f"Invalid quantity or price format for item: {item.get('description', 'Unknown')}") from e
-            
-            if quantity <= 0:
-                raise ValueError(f"Quantity must be greater than 0 for item: {item.get('description', 'Unknown')}")
-            
-            if price < 0:
-                raise ValueError(f"Price cannot be negative for item: {item.get('description', 'Unknown')}")
-            
-            item_total = round(quantity * price, 2)
-            validated_items.append({
-                'description': item.get('description', 'No description'),
-                'quantity': quantity,
-                'price': price,
-                'total': item_total
-            })
-            
-            subtotal += item_total
-        
-        # Tax rate should be configurable
-        tax_rate = 0.08  # 8% tax - consider making this configurable
-        tax_amount = round(subtotal * tax_rate, 2)
-        total = round(subtotal + tax_amount, 2)
-        
-        now = datetime.now(timezone.utc)
-        
-        invoice = {
-            'invoice_number': invoice_number,
-            'date': now.strftime('%Y-%m-%d'),
-            'due_date': (now + timedelta(days=30)).strftime('%Y-%m-%d'),
-            'client': {
-                'name': client_info.get('name', 'Unknown Client'),
-                'email': client_info.get('email', ''),
-                'address': client_info.get('address', '')
-            },
-            'items': validated_items,
-            'subtotal': round(subtotal, 2),
-            'tax_rate': tax_rate,
-            'tax_amount': round(tax_amount, 2),
-            'total': round(total, 2),
-            'status': 'pending'
-        }
-        
-        return invoice
+def invoice_event(event, timings=None, engine=None):
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    client_info, items = validate_event(event)
+    started = stage_done(timings, 'validation', started)
+    # include_items=false keeps bulk usage invoices within the response limit
+    invoice = generate_invoice(client_info, items, event.get('include_items', True), engine)
+    stage_done(timings, 'generation', started)
+    return invoice
+
+def validate_event(event):
+    if not event:
+        raise ValueError("Missing event data")
+    if not isinstance(event, dict):
+        raise ValueError("Invoice data must be an object")
         
-    except (ValueError, TypeError) as e:
-        logger.error(f"Error generating invoice: {str(e)}")
+    client_info = event.get('client_info', {})
+    items = event.get('items', [])
+    
+    # Validate required fields
+    if not isinstance(client_info, dict) or not client_info.get('name'):
+        raise ValueError("Client name is required")
+    
+    if not items or not isinstance(items, list):
+        raise ValueError("At least one invoice item is required")
+    
+    return client_info, items
+
+def process_batch(records, timings=None):
+    if not isinstance(records, list):
+        raise ValueError("records must be a list")
+    
+    # Per-record failures are reported inline so one bad invoice
+    # does not fail the whole chunk. One engine serves the whole batch, so
+    # the tax table and parsed amounts are shared between invoices.
+    engine = warm_engine()
+    results = []
+    for record in records:
+        try:
+            results.append({'success': True, 'invoice': invoice_event(record, timings, engine)})
+        except (ValueError, TypeError, AttributeError, OverflowError) as e:
+            results.append({'success': False, 'error': str(e)})
+    return results
+
+def stage_done(timings, stage, started):
+    # Accumulates per-stage milliseconds and returns the next stage's start
+    now = time.perf_counter()
+    timings[stage] = timings.get(stage, 0.0) + (now - started) * 1000
+    return now
+
+def report_timings(timings, started):
+    timings['total'] = (time.perf_counter() - started) * 1000
+    return {stage: round(ms, 3) for stage, ms in timings.items()}
+
+def generate_invoice(client_info, items, include_items=True, engine=None):
+    try:
+        engine = engine or warm_engine()
+        return engine.invoice(client_info, items, include_items)
+    except (ValueError, TypeError, AttributeError, OverflowError) as e:
+        logger.error("Error generating invoice: %s", e)
         raise ValueError(f"Invoice generation failed: {str(e)}")
     except Exception as e:
-        logger.error(f"Unexpected error in invoice generation: {str(e)}")
-        raise
\ No newline at end of file
+        logger.error("Unexpected error in invoice generation: %s", e)
+        raise
@@ -0,0 +1,101 @@
+import json
+import logging
+import os
+import time
+from decimal import Decimal, InvalidOperation
+
+logger = logging.getLogger()
+
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tax_rates.json')
+TABLE_PATH = os.getenv('INVOICE_TAX_TABLE_PATH') or DEFAULT_TABLE_PATH
+# How often a warm container re-checks the table file for a new version
+REFRESH_SECONDS = float(os.getenv('INVOICE_TAX_TABLE_REFRESH', '60'))
+
+
+class TaxRate:
+    """One rate as an exact fraction, so tax is computed on integer cents."""
+
+    __slots__ = ('key', 'rate', 'numerator', 'denominator')
+
+    def __init__(self, key, value):
+        try:
+            rate = Decimal(str(value))
+        except InvalidOperation as e:
+            raise ValueError(f"Invalid tax rate for {key}: {value!r}") from e
+        if not rate.is_finite() or rate < 0 or rate >= 1:
+            raise ValueError(f"Tax rate for {key} must be between 0 and 1, got {value!r}")
+        self.key = key
+        self.rate = float(rate)
+        self.numerator, self.denominator = rate.as_integer_ratio()
+
+    def tax_cents(self, subtotal_cents):
+        # Half-up to the cent, on integers
+        return (2 * subtotal_cents * self.numerator + self.denominator) // (2 * self.denominator)
+
+
+class TaxTable:
+    """Tax rates indexed by client id and region.
+
+    Lookup order: an explicit client entry, then "<COUNTRY>-<STATE>", the
+    client's "region", its country, and finally the default rate.
+    """
+
+    __slots__ = ('version', 'default', 'regions', 'clients')
+
+    def lookup(self, client_info):
+        client_id = client_info.get('id')
+        if client_id is not None:
+            rate = self.clients.get(str(client_id))
+            if rate is not None:
+                return rate
+        if self.regions:
+            country = str(client_info.get('country') or '').strip().upper()
+            state = str(client_info.get('state') or '').strip().upper()
+            region = str(client_info.get('region') or '').strip().upper()
+            for key in (f"{country}-{state}" if country and state else None, region, country):
+                if key:
+                    rate = self.regions.get(key)
+                    if rate is not None:
+                        return rate
+        return self.default
+
+
+def compile_table(data):
+    table = TaxTable()
+    table.version = str(data.get('version', 'unversioned'))
+    table.default = TaxRate('default', data.get('default', '0.08'))
+    table.regions = {key.strip().upper(): TaxRate(key.strip().upper(), value)
+                     for key, value in data.get('regions', {}).items()}
+    table.clients = {str(key): TaxRate(f"client:{key}", value) for key, value in data.get('clients', {}).items()}
+    return table
+
+
+def load_table(path):
+    with open(path) as f:
+        return compile_table(json.load(f))
+
+
+# path -> (mtime, compiled table, next check time); survives warm invocations
+_cache = {}
+
+
+def get_tax_table(path=None):
+    """Return the compiled tax table, recompiling only when the file changes.
+
+    INVOICE_TAX_TABLE_PATH points a function at another table without a
+    code change; edits are picked up within INVOICE_TAX_TABLE_REFRESH seconds.
+    """
+    path = path or TABLE_PATH
+    now = time.monotonic()
+    cached = _cache.get(path)
+    if cached is not None and now < cached[2]:
+        return cached[1]
+    mtime = os.stat(path).st_mtime
+    if cached is not None and cached[0] == mtime:
+        table = cached[1]
+    else:
+        table = load_table(path)
+        if cached is not None:
+            logger.info("Tax table reloaded: %s -> %s", cached[1].version, table.version)
+    _cache[path] = (mtime, table, now + REFRESH_SECONDS)
+    return table
@@ -1,38 +1,51 @@
-import json
 from datetime import datetime, timezone
 import logging
+import time
+from bisect import bisect_left, bisect_right
+from lead_columnar import score_leads
+from lead_rules import get_rules
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 def lambda_handler(event, context):
+    started = time.perf_counter()
+    timings = {}
     try:
-        logger.info(f"Processing lead scoring: {context.aws_request_id}")
+        logger.info("Processing lead scoring: %s", context.aws_request_id)
         
-        if not event or 'lead_data' not in event:
-            raise ValueError("Missing required parameter: lead_data")
-            
-        lead_data = event.get('lead_data', {})
-        
-        if not lead_data:
-            raise ValueError("Lead data cannot be empty")
+        if event and 'records' in event:
+            results = process_batch(event['records'], event.get('include_factors', False), timings)
+            logger.info("Lead batch scored: %s records (%s)", len(results), context.aws_request_id)
+            return {
+                'statusCode': 200,
+                'body': {
+                    'success': True,
+                    'results': results,
+                    'rules_version': get_rules().version,
+                    'timings': report_timings(timings, started),
+                    'scored_at': datetime.now(timezone.utc).isoformat()
+                }
+            }
         
-        score_result = calculate_lead_score(lead_data)
+        score_result = score_event(event, timings)
         
-        logger.info(f"Lead scoring completed: {score_result['quality']} ({score_result['score']} points)")
+        logger.info("Lead scoring completed: %s (%s points)", score_result['quality'], score_result['score'])
         
         return {
             'statusCode': 200,
             'body': {
                 'success': True,
                 'lead_score': score_result,
+                'rules_version': get_rules().version,
+                'timings': report_timings(timings, started),
                 'scored_at': datetime.now(timezone.utc).isoformat()
             }
         }
         
     except ValueError as ve:
-        logger.error(f"Validation error: {str(ve)}")
+        logger.error("Validation error: %s", ve)
         return {
             'statusCode': 400,
             'body': {
@@ -41,7 +54,7 @@ def lambda_handler(event, context):
             }
         }
     except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
+        logger.error("Unexpected error: %s", e)
         return {
             'statusCode': 500,
             'body': {
@@ -50,8 +63,63 @@ def lambda_handler(event, context):
             }
         }
 
-def calculate_lead_score(lead_data):
+def score_event(event, timings=None):
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    if not isinstance(event, dict) or 'lead_data' not in event:
+        raise ValueError("Missing required parameter: lead_data")
+        
+    lead_data = event.get('lead_data', {})
+    
+    if not lead_data:
+        raise ValueError("Lead data cannot be empty")
+    
+    started = stage_done(timings, 'validation', started)
+    score_result = calculate_lead_score(lead_data)
+    stage_done(timings, 'scoring', started)
+    return score_result
+
+def process_batch(records, include_factors=False, timings=None):
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    if not isinstance(records, list):
+        raise ValueError("records must be a list")
+    
+    # Per-record failures are reported inline so one bad lead
+    # does not fail the whole chunk; valid leads are scored together
+    # by the columnar engine. Bulk callers rarely read the factors, and
+    # building them costs about as much as scoring, so they are opt-in.
+    results = [None] * len(records)
+    leads, positions = [], []
+    for index, record in enumerate(records):
+        if not isinstance(record, dict) or 'lead_data' not in record:
+            results[index] = {'success': False, 'error': "Missing required parameter: lead_data"}
+        elif not record.get('lead_data'):
+            results[index] = {'success': False, 'error': "Lead data cannot be empty"}
+        else:
+            leads.append(record['lead_data'])
+            positions.append(index)
+    
+    started = stage_done(timings, 'validation', started)
+    
+    for position, result in zip(positions, score_leads(leads, include_factors)):
+        results[position] = result
+    stage_done(timings, 'scoring', started)
+    return results
+
+def stage_done(timings, stage, started):
+    # Accumulates per-stage milliseconds and returns the next stage's start
+    now = time.perf_counter()
+    timings[stage] = timings.get(stage, 0.0) + (now - started) * 1000
+    return now
+
+def report_timings(timings, started):
+    timings['total'] = (time.perf_counter() - started) * 1000
+    return {stage: round(ms, 3) for stage, ms in timings.items()}
+
+def calculate_lead_score(lead_data, rules=None):
     try:
+        rules = rules or get_rules()
         score = 0
         factors = []
         
@@ -59,68 +127,48 @@ def calculate_lead_score(lead_data):
         company_size = int(lead_data.get('company_size', 0))
         if company_size < 0:
             raise ValueError("Company size cannot be negative")
-            
-        if company_size > 1000:
-            score += 30
-            factors.append('Large company (+30)')
-        elif company_size > 100:
-            score += 20
-            factors.append('Medium company (+20)')
-        elif company_size > 10:
-            score += 10
-            factors.append('Small company (+10)')
+        
+        tier = bisect_left(rules.size_thresholds, company_size)
+        if tier:
+            score += rules.size_points[tier]
+            factors.append(rules.size_labels[tier])
         
         # Validate and score industry
         industry = str(lead_data.get('industry', '')).lower().strip()
-        high_value_industries = ['technology', 'finance', 'healthcare']
-        if industry in high_value_industries:
-            score += 25
-            factors.append(f'High-value industry: {industry} (+25)')
+        if industry in rules.high_value_industries:
+            score += rules.industry_points
+            factors.append(rules.industry_label(industry))
         
         # Validate and score budget
         budget = float(lead_data.get('budget', 0))
         if budget < 0:
             raise ValueError("Budget cannot be negative")
-            
-        if budget > 100000:
-            score += 40
-            factors.append('High budget (+40)')
-        elif budget > 50000:
-            score += 25
-            factors.append('Medium budget (+25)')
-        elif budget > 10000:
-            score += 15
-            factors.append('Low budget (+15)')
+        
+        # NaN fails every comparison, so it never earns budget points
+        tier = bisect_left(rules.budget_thresholds, budget) if budget == budget else 0
+        if tier:
+            score += rules.budget_points[tier]
+            factors.append(rules.budget_labels[tier])
         
         # Validate and score engagement level
-        engagement_level = str(lead_data.get('engagement_level', 'low')).lower().strip()
-        valid_engagement_levels = ['low', 'medium', 'high']
-        if engagement_level not in valid_engagement_levels:
-            logger.warning(f"Invalid engagement level: {engagement_level}, defaulting to 'low'")
-            engagement_level = 'low'
-            
-        if engagement_level == 'high':
-            score += 20
-            factors.append('High engagement (+20)')
-        elif engagement_level == 'medium':
-            score += 10
-            factors.append('Medium engagement (+10)')
+        engagement_level = str(lead_data.get('engagement_level', rules.default_engagement)).lower().strip()
+        if engagement_level not in rules.engagement_points:
+            logger.warning("Invalid engagement level: %s, defaulting to '%s'",
+                           engagement_level, rules.default_engagement)
+            engagement_level = rules.default_engagement
+        
+        score += rules.engagement_points[engagement_level]
+        if rules.engagement_labels[engagement_level]:
+            factors.append(rules.engagement_labels[engagement_level])
         
         # Score decision maker status
         is_decision_maker = bool(lead_data.get('is_decision_maker', False))
-        if is_decision_maker:
-            score += 15
-            factors.append('Decision maker (+15)')
+        if is_decision_maker and rules.decision_maker_points:
+            score += rules.decision_maker_points
+            factors.append(rules.decision_maker_label)
         
         # Determine quality based on score
-        if score >= 80:
-            quality = 'hot'
-        elif score >= 50:
-            quality = 'warm'
-        elif score >= 25:
-            quality = 'cold'
-        else:
-            quality = 'unqualified'
+        quality = rules.quality_bands[bisect_right(rules.quality_cutoffs, score)]
         
         return {
             'score': score,
@@ -135,9 +183,9 @@ def calculate_lead_score(lead_data):
             }
         }
         
-    except (ValueError, TypeError) as e:
-        logger.error(f"Error calculating lead score: {str(e)}")
+    except (ValueError, TypeError, AttributeError, OverflowError) as e:
+        logger.error("Error calculating lead score: %s", e)
         raise ValueError(f"Lead scoring failed: {str(e)}")
     except Exception as e:
-        logger.error(f"Unexpected error in lead scoring: {str(e)}")
+        logger.error("Unexpected error in lead scoring: %s", e)
         raise
\ No newline at end of file
@@ -0,0 +1,239 @@
+from array import array
+from bisect import bisect_right
+
+from lead_rules import get_rules
+
+# NumPy is optional: the Lambda package does not bundle it, so without it
+# the same column layout is scored with array-backed Python loops. It is
+# imported by load_numpy() on the first batch, so single-lead invocations
+# never pay for it in their cold start.
+np = None
+_numpy_loaded = False
+
+
+def load_numpy():
+    global np, _numpy_loaded
+    if not _numpy_loaded:
+        _numpy_loaded = True
+        try:
+            import numpy
+        except ImportError:  # pragma: no cover - depends on the deployment
+            return None
+        np = numpy
+    return np
+
+# Tier lookups only compare against the thresholds, so sizes are clamped
+# to fit an int64 column; lead_data still echoes the original value.
+SIZE_CLAMP = 2 ** 62
+
+
+class LeadColumns:
+    """Normalised lead attributes stored column by column."""
+
+    __slots__ = ('rules', 'engagement_levels', 'company_size', 'budget', 'high_value', 'engagement',
+                 'decision_maker', 'industries', 'lead_data', 'errors')
+
+    def __init__(self, rules):
+        self.rules = rules
+        # Engagement is stored as an index into this tuple
+        self.engagement_levels = tuple(rules.engagement_points)
+        self.company_size = array('q')
+        self.budget = array('d')
+        self.high_value = array('b')
+        self.engagement = array('b')
+        self.decision_maker = array('b')
+        self.industries = []
+        self.lead_data = []
+        self.errors = {}
+
+    def __len__(self):
+        return len(self.company_size)
+
+
+def columns_from_leads(leads, rules=None):
+    """Validate and normalise lead_data dicts exactly like calculate_lead_score.
+
+    Records that calculate_lead_score would reject are kept as zero rows and
+    their error message is stored in columns.errors by position.
+    """
+    rules = rules or get_rules()
+    columns = LeadColumns(rules)
+    # Collected in lists, which append faster than arrays, and packed once
+    sizes, budgets, high_values, engagements, decision_makers = [], [], [], [], []
+    add_size, add_budget = sizes.append, budgets.append
+    add_high_value, add_engagement = high_values.append, engagements.append
+    add_decision_maker, add_industry = decision_makers.append, columns.industries.append
+    add_lead_data = columns.lead_data.append
+    engagement_codes = {level: code for code, level in enumerate(columns.engagement_levels)}
+    default_engagement = rules.default_engagement
+    default_code = engagement_codes[default_engagement]
+    high_value_industries = rules.high_value_industries
+    industry_names, engagement_names = {}, {}
+    for index, lead_data in enumerate(leads):
+        try:
+            company_size = int(lead_data.get('company_size', 0))
+            if company_size < 0:
+                raise ValueError("Company size cannot be negative")
+            raw = lead_data.get('industry', '')
+            industry = industry_names.get(raw) if type(raw) is str else None
+            if industry is None:
+                industry = str(raw).lower().strip()
+                if type(raw) is str:
+                    industry_names[raw] = industry
+            budget = float(lead_data.get('budget', 0))
+            if budget < 0:
+                raise ValueError("Budget cannot be negative")
+            raw = lead_data.get('engagement_level', default_engagement)
+            level = engagement_names.get(raw) if type(raw) is str else None
+            if level is None:
+                engagement_level = str(raw).lower().strip()
+                engagement = engagement_codes.get(engagement_level)
+                if engagement is None:
+                    engagement_level, engagement = default_engagement, default_code
+                level = (engagement_level, engagement)
+                if type(raw) is str:
+                    engagement_names[raw] = level
+            engagement_level, engagement = level
+            is_decision_maker = bool(lead_data.get('is_decision_maker', False))
+        # Non-dict lead_data, unparseable or infinite numbers
+        except (ValueError, TypeError, AttributeError, OverflowError) as e:
+            columns.errors[index] = f"Lead scoring failed: {str(e)}"
+            company_size, industry, budget = 0, '', 0.0
+            engagement_level, engagement, is_decision_maker = default_engagement, default_code, False
+
+        add_size(company_size if company_size < SIZE_CLAMP else SIZE_CLAMP)
+        add_budget(budget)
+        add_high_value(industry in high_value_industries)
+        add_engagement(engagement)
+        add_decision_maker(is_decision_maker)
+        add_industry(industry)
+        add_lead_data({
+            'company_size': company_size,
+            'industry': industry,
+            'budget': budget,
+            'engagement_level': engagement_level,
+            'is_decision_maker': is_decision_maker
+        })
+    columns.company_size = array('q', sizes)
+    columns.budget = array('d', budgets)
+    columns.high_value = array('b', high_values)
+    columns.engagement = array('b', engagements)
+    columns.decision_maker = array('b', decision_makers)
+    return columns
+
+
+def score_tiers(company_size, budget, rules=None):
+    """Map size and budget columns to their tier index (0 = no points)."""
+    rules = rules or get_rules()
+    if load_numpy() is not None:
+        company_size = np.asarray(company_size, dtype=np.int64)
+        budget = np.asarray(budget, dtype=np.float64)
+        size_tier = np.searchsorted(rules.size_thresholds, company_size, side='left')
+        budget_tier = np.where(np.isnan(budget), 0, np.searchsorted(rules.budget_thresholds, budget, side='left'))
+        return size_tier, budget_tier
+    size_tier = array('b', [rules.size_tier(size) for size in company_size])
+    budget_tier = array('b', [rules.budget_tier(amount) for amount in budget])
+    return size_tier, budget_tier
+
+
+def score_arrays(company_size, budget, high_value, engagement, decision_maker, rules=None, tiers=None):
+    """Score whole columns at once; returns (scores, quality band indexes).
+
+    engagement holds indexes into the rules' engagement levels, in the
+    order they are defined.
+    """
+    rules = rules or get_rules()
+    size_tier, budget_tier = tiers or score_tiers(company_size, budget, rules)
+    engagement_points = tuple(rules.engagement_points.values())
+    industry_points, decision_maker_points = rules.industry_points, rules.decision_maker_points
+    if load_numpy() is not None:
+        scores = (
+            np.asarray(rules.size_points)[size_tier]
+            + np.asarray(rules.budget_points)[budget_tier]
+            + np.asarray(high_value, dtype=np.int64) * industry_points
+            + np.asarray(engagement_points)[np.asarray(engagement, dtype=np.int64)]
+            + np.asarray(decision_maker, dtype=np.int64) * decision_maker_points
+        )
+        return scores, np.searchsorted(rules.quality_cutoffs, scores, side='right')
+
+    size_points, budget_points = rules.size_points, rules.budget_points
+    scores = array('l', [
+        size_points[size] + budget_points[amount] + hv * industry_points
+        + engagement_points[level] + dm * decision_maker_points
+        for size, amount, hv, level, dm in zip(size_tier, budget_tier, high_value, engagement, decision_maker)
+    ])
+    cutoffs = rules.quality_cutoffs
+    return scores, array('b', [bisect_right(cutoffs, score) for score in scores])
+
+
+def explain(columns, index, size_tier, budget_tier):
+    """Build the human-readable factors list for one scored row."""
+    rules = columns.rules
+    factors = []
+    if size_tier:
+        factors.append(rules.size_labels[size_tier])
+    if columns.high_value[index]:
+        factors.append(rules.industry_label(columns.industries[index]))
+    if budget_tier:
+        factors.append(rules.budget_labels[budget_tier])
+    engagement_label = rules.engagement_labels[columns.engagement_levels[columns.engagement[index]]]
+    if engagement_label:
+        factors.append(engagement_label)
+    if columns.decision_maker[index] and rules.decision_maker_points:
+        factors.append(rules.decision_maker_label)
+    return factors
+
+
+def explain_all(columns, size_tiers, budget_tiers):
+    """factors for every row.
+
+    A row's factors depend only on its tiers, engagement, decision-maker
+    flag and (for high-value industries) its industry, so rows are coded
+    by that combination and each distinct one is explained once.
+    """
+    budget_count = len(columns.rules.budget_points)
+    levels = len(columns.engagement_levels)
+    if np is not None:
+        codes = (((size_tiers * budget_count + budget_tiers) * levels
+                  + np.frombuffer(columns.engagement, dtype=np.int8)) * 2
+                 + np.frombuffer(columns.decision_maker, dtype=np.int8)).tolist()
+        size_tiers, budget_tiers = size_tiers.tolist(), budget_tiers.tolist()
+    else:
+        codes = [((size * budget_count + amount) * levels + level) * 2 + dm for size, amount, level, dm
+                 in zip(size_tiers, budget_tiers, columns.engagement, columns.decision_maker)]
+    explained = {}
+    factors = []
+    add = factors.append
+    for index, (code, high_value, industry) in enumerate(zip(codes, columns.high_value, columns.industries)):
+        labels = explained.get((code, industry) if high_value else code)
+        if labels is None:
+            labels = explained[(code, industry) if high_value else code] = tuple(
+                explain(columns, index, size_tiers[index], budget_tiers[index]))
+        add([*labels])
+    return factors
+
+
+def score_leads(leads, include_factors=True, rules=None):
+    """Score a list of lead_data dicts; results use the batch handler shape."""
+    columns = columns_from_leads(leads, rules)
+    rules = columns.rules
+    tiers = score_tiers(columns.company_size, columns.budget, rules)
+    scores, bands = score_arrays(columns.company_size, columns.budget, columns.high_value,
+                                 columns.engagement, columns.decision_maker, rules, tiers)
+    factors = explain_all(columns, *tiers) if include_factors else None
+    if np is not None:
+        scores, bands = scores.tolist(), bands.tolist()
+    quality_bands = rules.quality_bands
+    errors = columns.errors
+    results = []
+    add = results.append
+    for index, lead_data in enumerate(columns.lead_data):
+        if errors and index in errors:
+            add({'success': False, 'error': errors[index]})
+        elif factors is None:
+            add({'success': True, 'lead_score': {'score': scores[index], 'quality': quality_bands[bands[index]],
+                                                  'lead_data': lead_data}})
+        else:
+            add({'success': True, 'lead_score': {'score': scores[index], 'quality': quality_bands[bands[index]],
+                                                  'factors': factors[index], 'lead_data': lead_data}})
+    return results
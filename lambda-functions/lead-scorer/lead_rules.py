@@ -0,0 +1,126 @@
+import json
+import logging
+import os
+import time
+from bisect import bisect_left, bisect_right
+
+logger = logging.getLogger()
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scoring_rules.json')
+RULES_PATH = os.getenv('LEAD_SCORING_RULES_PATH') or DEFAULT_RULES_PATH
+# How often a warm container re-checks the rules file for a new version
+REFRESH_SECONDS = float(os.getenv('LEAD_SCORING_RULES_REFRESH', '60'))
+
+
+class CompiledRules:
+    """Scoring rules compiled into sorted threshold tuples and lookup tables.
+
+    Tier lookups are a single bisect: thresholds are strict lower bounds
+    ("above"), so bisect_left counts how many a value exceeds. Index 0 of
+    every points/labels table is the no-points tier.
+    """
+
+    __slots__ = ('version', 'size_thresholds', 'size_points', 'size_labels',
+                 'budget_thresholds', 'budget_points', 'budget_labels',
+                 'high_value_industries', 'industry_points',
+                 'engagement_points', 'engagement_labels', 'default_engagement',
+                 'decision_maker_points', 'decision_maker_label',
+                 'quality_cutoffs', 'quality_bands')
+
+    def size_tier(self, company_size):
+        return bisect_left(self.size_thresholds, company_size)
+
+    def budget_tier(self, budget):
+        # NaN fails every comparison, so it never earns budget points
+        return 0 if budget != budget else bisect_left(self.budget_thresholds, budget)
+
+    def quality(self, score):
+        return self.quality_bands[bisect_right(self.quality_cutoffs, score)]
+
+    def industry_label(self, industry):
+        return f'High-value industry: {industry} (+{self.industry_points})'
+
+
+def _factor(label, points):
+    return f'{label} (+{points})' if label and points else None
+
+
+def _compile_tiers(section, name):
+    tiers = sorted(section.get('tiers', []), key=lambda tier: tier['above'])
+    thresholds = tuple(tier['above'] for tier in tiers)
+    if len(set(thresholds)) != len(thresholds):
+        raise ValueError(f"Duplicate {name} thresholds in scoring rules")
+    points = (0,) + tuple(tier['points'] for tier in tiers)
+    labels = (None,) + tuple(_factor(tier.get('label'), tier['points']) for tier in tiers)
+    return thresholds, points, labels
+
+
+def compile_rules(data):
+    rules = CompiledRules()
+    rules.version = str(data.get('version', 'unversioned'))
+    rules.size_thresholds, rules.size_points, rules.size_labels = _compile_tiers(data['company_size'], 'company_size')
+    rules.budget_thresholds, rules.budget_points, rules.budget_labels = _compile_tiers(data['budget'], 'budget')
+
+    industry = data.get('industry', {})
+    rules.high_value_industries = frozenset(name.lower().strip() for name in industry.get('high_value', []))
+    rules.industry_points = industry.get('points', 0)
+
+    engagement = data['engagement']
+    levels = engagement['levels']
+    rules.default_engagement = engagement.get('default', 'low')
+    if rules.default_engagement not in levels:
+        raise ValueError("Default engagement level must be one of the defined levels")
+    rules.engagement_points = {level: spec.get('points', 0) for level, spec in levels.items()}
+    rules.engagement_labels = {
+        level: _factor(spec.get('label', f'{level.title()} engagement'), spec.get('points', 0))
+        for level, spec in levels.items()
+    }
+
+    decision_maker = data.get('decision_maker', {})
+    rules.decision_maker_points = decision_maker.get('points', 0)
+    rules.decision_maker_label = _factor(decision_maker.get('label', 'Decision maker'), rules.decision_maker_points)
+
+    quality = data['quality']
+    bands = sorted(quality['bands'], key=lambda band: band['min_score'])
+    rules.quality_cutoffs = tuple(band['min_score'] for band in bands)
+    rules.quality_bands = (quality.get('default', 'unqualified'),) + tuple(band['band'] for band in bands)
+    return rules
+
+
+def load_rules(path):
+    with open(path) as f:
+        return compile_rules(json.load(f))
+
+
+# path -> (mtime, compiled rules, next check time); survives warm invocations
+_cache = {}
+_active = None
+
+
+def get_rules(path=None):
+    """Return the compiled rules, recompiling only when the file changes.
+
+    LEAD_SCORING_RULES_PATH lets ops point a function at another rules
+    version without a code change; edits to the file itself are picked up
+    within LEAD_SCORING_RULES_REFRESH seconds.
+    """
+    global _active
+    now = time.monotonic()
+    if path is None:
+        if _active is not None and now < _active[2]:
+            return _active[1]
+        path = RULES_PATH
+    cached = _cache.get(path)
+    if cached is not None and now < cached[2]:
+        return cached[1]
+    mtime = os.stat(path).st_mtime
+    if cached is not None and cached[0] == mtime:
+        rules = cached[1]
+    else:
+        rules = load_rules(path)
+        if cached is not None:
+            logger.info("Lead scoring rules reloaded: %s -> %s", cached[1].version, rules.version)
+    _cache[path] = (mtime, rules, now + REFRESH_SECONDS)
+    if path == RULES_PATH:
+        _active = _cache[path]
+    return rules
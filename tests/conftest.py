@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# backend/ and lambda-functions/* are flat directories, not packages; the
+# benchmarks package already knows how to put them on the path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from benchmarks import use_backend  # noqa: E402
+
+use_backend()
+
+
+@pytest.fixture(scope='session')
+def api():
+    """A TestClient for backend/main.py answering from mock responses."""
+    os.environ.setdefault('USE_MOCK_RESPONSES', 'true')
+    from fastapi.testclient import TestClient
+    import main
+    with TestClient(main.app) as client:
+        yield client
@@ -0,0 +1,105 @@
+import asyncio
+import json
+
+import pytest
+
+from benchmarks import load_lambda
+from pipeline import TaskPipeline
+from result_cache import ResultCache
+from task_registry import default_registry
+from task_store import MemoryTaskStore
+
+email_parser = load_lambda('email-parser')
+invoice_generator = load_lambda('invoice-generator')
+lead_scorer = load_lambda('lead-scorer')
+
+
+class Context:
+    aws_request_id = 'test-request'
+
+
+def run_batch(handler, records):
+    # Records arrive JSON-decoded, like a Lambda event; 1e400 decodes to inf
+    records = json.loads(json.dumps(records).replace('"INF"', '1e400'))
+    response = handler.lambda_handler({'records': records}, Context())
+    assert response['statusCode'] == 200, response
+    return response['body']['results']
+
+
+def test_lead_batch_reports_bad_records_inline():
+    results = run_batch(lead_scorer, [
+        {'lead_data': {'company_size': 500, 'industry': 'technology', 'budget': 50000}},
+        7,
+        {'lead_data': 7},
+        {'lead_data': ['not', 'a', 'dict']},
+        {'lead_data': {'company_size': 'INF'}},
+        {'lead_data': {'budget': 'INF', 'company_size': 10}},
+        {'lead_data': {'company_size': 100, 'engagement_level': 'high'}},
+    ])
+    assert [result['success'] for result in results] == [True, False, False, False, False, True, True]
+    assert all(result['error'] for result in results if not result['success'])
+
+
+@pytest.mark.parametrize('lead_data', [7, ['x'], {'company_size': float('inf')}, {'company_size': 'big'}])
+def test_scalar_and_columnar_reject_the_same_leads(lead_data):
+    results = lead_scorer.score_leads([lead_data])
+    with pytest.raises(ValueError) as error:
+        lead_scorer.calculate_lead_score(lead_data)
+    assert results == [{'success': False, 'error': str(error.value)}]
+
+
+def test_invoice_batch_reports_bad_records_inline():
+    good = {'client_info': {'name': 'Acme'}, 'items': [{'description': 'Work', 'quantity': 1, 'unit_price': 10}]}
+    results = run_batch(invoice_generator, [
+        good,
+        7,
+        {'client_info': 'Acme', 'items': good['items']},
+        {'client_info': {'name': 'Acme'}, 'items': [7]},
+        {'client_info': {'name': 'Acme'}, 'items': [{'description': 'Work', 'quantity': 'INF', 'unit_price': 10}]},
+    ])
+    assert [result['success'] for result in results] == [True, False, False, False, False]
+
+
+def test_email_batch_reports_bad_records_inline():
+    results = run_batch(email_parser, [
+        {'email_content': 'From: a@example.com\nSubject: Hi\n\nTODO: reply'},
+        7,
+        {'email_content': 7},
+        ['email_content'],
+    ])
+    assert [result['success'] for result in results] == [True, False, False, False]
+
+
+def test_non_positive_chunk_size_is_rejected(api):
+    for chunk_size in (0, -5):
+        response = api.post('/tasks/lead-score/batch', json={
+            'task_type': 'lead_score', 'records': [{'lead_data': {'company_size': 5}}], 'chunk_size': chunk_size})
+        assert response.status_code == 400
+
+
+def batch_status(consume):
+    """Stream a three-chunk mock batch through consume and return the stored task status."""
+    registry = default_registry()
+    tasks = MemoryTaskStore()
+    pipeline = TaskPipeline(registry, tasks, ResultCache(cached_tasks=()))
+    records = [{'lead_data': {'company_size': size}} for size in (5, 50, 500)]
+    response = pipeline.stream_batch(registry.get('lead_score'), records, chunk_size=1)
+    asyncio.run(consume(response.body_iterator))
+    return tasks.get(response.headers['X-Task-Id'])['status']
+
+
+def test_streamed_batch_completes():
+    async def read_all(body):
+        async for _ in body:
+            pass
+
+    assert batch_status(read_all) == 'completed'
+
+
+def test_abandoned_batch_is_not_reported_completed():
+    async def disconnect_after_first_chunk(body):
+        async for _ in body:
+            break
+        await body.aclose()
+
+    assert batch_status(disconnect_after_first_chunk) == 'cancelled'
@@ -0,0 +1,152 @@
+import asyncio
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+from benchmarks import percentile
+from benchmarks.stub_lambda import StubLambdaClient
+from dispatcher import CircuitOpen, DispatchTimeout, LambdaDispatcher
+from resilience import OPEN, ResiliencePolicy
+
+LATENCY = 0.05
+
+
+async def burst_p99(call, concurrency, rounds=3):
+    latencies = []
+
+    async def one(arrived):
+        await call()
+        latencies.append(time.perf_counter() - arrived)
+
+    for _ in range(rounds):
+        arrived = time.perf_counter()
+        await asyncio.gather(*(one(arrived) for _ in range(concurrency)))
+    return percentile(latencies, 99)
+
+
+def test_p99_stays_flat_as_concurrency_grows():
+    client = StubLambdaClient(latency=LATENCY)
+    dispatcher = LambdaDispatcher(client, max_workers=64, default_limit=64)
+
+    async def run():
+        call = lambda: dispatcher.invoke('lead-scorer', {'lead_data': {'company_size': 500}})  # noqa: E731
+        return {concurrency: await burst_p99(call, concurrency) for concurrency in (1, 8, 32, 64)}
+
+    try:
+        p99 = asyncio.run(run())
+    finally:
+        dispatcher.shutdown()
+    # Every call sleeps LATENCY in a worker thread; run serially on the
+    # event loop, 64 of them would take 64 x LATENCY
+    assert p99[64] < LATENCY * 4, p99
+    assert p99[64] < p99[1] * 4, p99
+
+
+def test_concurrency_limit_queues_calls_per_function():
+    client = StubLambdaClient(latency=LATENCY)
+    dispatcher = LambdaDispatcher(client, max_workers=16, default_limit=16, limits={'lead-scorer': 2})
+
+    async def run():
+        started = time.perf_counter()
+        await asyncio.gather(*(dispatcher.invoke('lead-scorer', {}) for _ in range(4)))
+        return time.perf_counter() - started
+
+    try:
+        elapsed = asyncio.run(run())
+    finally:
+        dispatcher.shutdown()
+    # Two at a time: four calls take two rounds
+    assert elapsed >= LATENCY * 2
+
+
+def run_calls(dispatcher, count, hedge=False):
+    """count sequential invokes; returns each call's outcome and latency."""
+    async def run():
+        outcomes = []
+        for _ in range(count):
+            started = time.perf_counter()
+            try:
+                outcome = await dispatcher.invoke('lead-scorer', {}, hedge=hedge)
+            except Exception as e:
+                outcome = e
+            outcomes.append((outcome, time.perf_counter() - started))
+        return outcomes
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize('result, function_error', [
+    ({'statusCode': 500, 'body': {'success': False, 'error': 'boom'}}, False),
+    (None, True),
+])
+def test_function_failures_open_the_circuit(result, function_error):
+    client = StubLambdaClient(latency=0.001, result=result)
+    client.function_error = function_error
+    dispatcher = LambdaDispatcher(client, policy=ResiliencePolicy(failure_threshold=3, cooldown=60))
+    try:
+        outcomes = run_calls(dispatcher, 4)
+    finally:
+        dispatcher.shutdown()
+    # The function's error response still reaches the caller...
+    assert all(isinstance(outcome, dict) for outcome, _ in outcomes[:3])
+    # ...but counts against the function like a raised error
+    assert isinstance(outcomes[3][0], CircuitOpen)
+    assert client.calls == 3
+
+
+def test_client_errors_do_not_open_the_circuit():
+    client = StubLambdaClient(latency=0.001, result={'statusCode': 400, 'body': {'success': False}})
+    dispatcher = LambdaDispatcher(client, policy=ResiliencePolicy(failure_threshold=3))
+    try:
+        outcomes = run_calls(dispatcher, 5)
+    finally:
+        dispatcher.shutdown()
+    assert all(outcome['statusCode'] == 400 for outcome, _ in outcomes)
+    assert dispatcher.policy.function('lead-scorer').breaker.state != OPEN
+
+
+def test_throttling_opens_the_circuit():
+    client = StubLambdaClient(latency=0.001, throttle_rate=1.0)
+    dispatcher = LambdaDispatcher(client, policy=ResiliencePolicy(failure_threshold=3, cooldown=60))
+    try:
+        outcomes = run_calls(dispatcher, 4)
+    finally:
+        dispatcher.shutdown()
+    assert all(isinstance(outcome, ClientError) for outcome, _ in outcomes[:3])
+    assert isinstance(outcomes[3][0], CircuitOpen)
+    assert client.throttled == 3
+
+
+def test_hedging_cuts_injected_tail_latency():
+    def mean_latency(hedging):
+        client = StubLambdaClient(latency=0.01, tail_latency=0.15, seed=7)
+        policy = ResiliencePolicy(hedging=hedging, hedge_percentile=50, hedge_budget=1.0)
+        dispatcher = LambdaDispatcher(client, policy=policy)
+        try:
+            run_calls(dispatcher, policy.min_samples)
+            client.tail_rate = 0.2
+            latencies = [seconds for _, seconds in run_calls(dispatcher, 30, hedge=True)]
+        finally:
+            dispatcher.shutdown()
+        return sum(latencies) / len(latencies), policy.function('lead-scorer').hedge_wins
+
+    plain, _ = mean_latency(False)
+    hedged, wins = mean_latency(True)
+    assert wins > 0
+    assert hedged < plain / 1.5, (hedged, plain)
+
+
+def test_adaptive_timeout_fails_fast_when_the_function_hangs():
+    client = StubLambdaClient(latency=0.01, outage_latency=0.5)
+    policy = ResiliencePolicy(min_timeout=0.05, failure_threshold=2, cooldown=60)
+    dispatcher = LambdaDispatcher(client, default_timeout=5.0, policy=policy)
+    try:
+        run_calls(dispatcher, policy.min_samples)
+        client.outage = True
+        outcomes = run_calls(dispatcher, 3)
+    finally:
+        dispatcher.shutdown()
+    # Learned from the warm calls: far below the configured 5s
+    assert all(isinstance(outcome, DispatchTimeout) and seconds < 0.2 for outcome, seconds in outcomes[:2])
+    assert isinstance(outcomes[2][0], CircuitOpen)
@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+
+import boto3
+import pytest
+from moto import mock_aws
+
+import task_ids
+from dynamo_store import DynamoTaskStore, create_table
+from task_store import MemoryTaskStore
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    with mock_aws():
+        client = boto3.client('dynamodb', region_name='us-east-1')
+        create_table(client)
+        yield client
+
+
+def worker(client, **options):
+    # A long flush interval: tests flush explicitly
+    return DynamoTaskStore(client=client, cache=MemoryTaskStore(), flush_interval=60, **options)
+
+
+def record(task_type='lead_score', status='queued'):
+    return {'task_id': task_ids.new_task_id('task'), 'task_type': task_type, 'status': status,
+            'result': None, 'timestamp': time.time()}
+
+
+def test_writes_reach_the_table_in_batches(client):
+    store = worker(client)
+    tasks = [record() for _ in range(60)]
+    for task in tasks:
+        store.put(task)
+    store.flush()
+    assert store.stats()['flushed'] == 60
+    other = worker(client)
+    assert other.get(tasks[0]['task_id']) == tasks[0]
+    store.close()
+    other.close()
+
+
+def test_other_workers_see_status_changes(client):
+    first, second = worker(client, refresh_interval=0), worker(client, refresh_interval=0)
+    task = record()
+    first.put(task)
+    first.flush()
+    assert second.get(task['task_id'])['status'] == 'queued'
+    first.update(task['task_id'], {'status': 'completed', 'result': {'score': 80}})
+    first.flush()
+    assert second.get(task['task_id'])['status'] == 'completed'
+    first.close()
+    second.close()
+
+
+def test_cached_tasks_refresh_after_interval(client):
+    first, second = worker(client), worker(client, refresh_interval=0.2)
+    task = record()
+    first.put(task)
+    first.flush()
+    second.get(task['task_id'])
+    first.update(task['task_id'], {'status': 'running'})
+    first.flush()
+    assert second.get(task['task_id'])['status'] == 'queued'
+    time.sleep(0.25)
+    assert second.get(task['task_id'])['status'] == 'running'
+    first.close()
+    second.close()
+
+
+def test_own_unflushed_writes_win_over_the_table(client):
+    store = worker(client, refresh_interval=0)
+    task = record()
+    store.put(task)
+    store.flush()
+    store.update(task['task_id'], {'status': 'completed'})
+    assert store.get(task['task_id'])['status'] == 'completed'
+    page, _ = store.list(status='completed')
+    assert [t['task_id'] for t in page] == [task['task_id']]
+    page, _ = store.list(status='queued')
+    assert page == []
+    store.close()
+
+
+def test_listing_is_shared_and_paginated(client):
+    first, second = worker(client), worker(client)
+    tasks = [record(task_type='lead_score' if n % 3 else 'email_parse') for n in range(25)]
+    for task in tasks[:20]:
+        first.put(task)
+    first.flush()
+    for task in tasks[20:]:
+        second.put(task)  # not flushed yet
+    newest_first = [task['task_id'] for task in reversed(tasks)]
+
+    page, cursor = second.list(limit=10)
+    seen = [t['task_id'] for t in page]
+    while cursor:
+        page, cursor = second.list(limit=10, cursor=cursor)
+        seen.extend(t['task_id'] for t in page)
+    assert seen == newest_first
+
+    page, _ = first.list(limit=100, task_type='email_parse')
+    assert [t['task_id'] for t in page] == [task['task_id'] for task in reversed(tasks[:20])
+                                            if task['task_type'] == 'email_parse']
+    first.close()
+    second.close()
+
+
+def test_async_reads_run_off_the_event_loop(client):
+    store, other = worker(client), worker(client)
+    task = record()
+    store.put(task)
+    store.flush()
+    threads = []
+    read, query = other._read, other._query
+    other._read = lambda *args: threads.append(threading.current_thread()) or read(*args)
+    other._query = lambda *args: threads.append(threading.current_thread()) or query(*args)
+
+    async def run():
+        return await other.get_async(task['task_id']), await other.list_async()
+
+    fetched, (listed, _) = asyncio.run(run())
+    assert fetched == task
+    assert [t['task_id'] for t in listed] == [task['task_id']]
+    assert len(threads) == 2 and threading.main_thread() not in threads
+    store.close()
+    other.close()
+
+
+def test_load_warms_the_cache_with_newest_tasks(client):
+    store = worker(client)
+    tasks = [record() for _ in range(5)]
+    for task in tasks:
+        store.put(task)
+    store.close()
+    restarted = worker(client)
+    assert restarted.load() == 5
+    assert len(restarted.cache) == 5
+    restarted.close()
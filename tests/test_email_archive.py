@@ -0,0 +1,191 @@
+import asyncio
+import mailbox
+import os
+from email.message import EmailMessage
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from benchmarks import load_lambda
+from pipeline import TaskPipeline
+from result_cache import ResultCache
+from task_registry import default_registry
+from task_store import MemoryTaskStore
+
+email_parser = load_lambda('email-parser')
+
+
+class Context:
+    aws_request_id = 'test-request'
+
+
+def handle(event):
+    return email_parser.lambda_handler(event, Context())
+
+
+def write_mbox(path, count=3):
+    archive = mailbox.mbox(path)
+    for number in range(count):
+        message = EmailMessage()
+        message['From'] = f"sender{number}@example.com"
+        message['Subject'] = f"Message {number}"
+        message.set_content("TODO: reply")
+        archive.add(message)
+    archive.flush()
+    archive.close()
+
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    root = tmp_path / 'archives'
+    root.mkdir()
+    write_mbox(str(root / 'inbox.mbox'))
+    (tmp_path / 'secret.txt').write_text('DB_PASSWORD=hunter2\n')
+    monkeypatch.setattr(email_parser, 'ARCHIVE_DIR', str(root))
+    monkeypatch.setattr(email_parser, 'ARCHIVE_BUCKET', '')
+    return root
+
+
+def test_reads_archives_from_the_configured_directory(archive_dir):
+    response = handle({'archive_key': 'inbox.mbox', 'limit': 2})
+    assert response['statusCode'] == 200
+    body = response['body']
+    assert [record['sender'] for record in body['results']] == ['sender0@example.com', 'sender1@example.com']
+    assert body['next_start'] == 2
+    assert body['next_offset'] > 0
+
+
+def page_through(event, pages):
+    """Senders page by page, following next_start and next_offset."""
+    senders = []
+    for _ in range(pages):
+        body = handle(event)['body']
+        senders.append([record['sender'] for record in body['results']])
+        if body['next_start'] is None:
+            break
+        event = dict(event, start=body['next_start'], offset=body['next_offset'])
+    return senders
+
+
+def test_pages_resume_at_the_byte_offset(archive_dir):
+    write_mbox(str(archive_dir / 'big.mbox'), count=7)
+    expected = [[f"sender{n}@example.com" for n in range(first, min(first + 3, 7))] for first in (0, 3, 6)]
+    assert page_through({'archive_key': 'big.mbox', 'limit': 3}, 5) == expected
+    # Paging by message index alone gives the same pages
+    by_index = [handle({'archive_key': 'big.mbox', 'limit': 3, 'start': start})['body']['results']
+                for start in (0, 3, 6)]
+    assert [[record['sender'] for record in page] for page in by_index] == expected
+
+
+def test_skipped_messages_are_not_parsed(archive_dir, monkeypatch):
+    import email_stream  # the module parse_archive reads archives with
+    parsed = []
+    parser = email_stream._MessageParser
+    monkeypatch.setattr(email_stream, '_MessageParser', lambda *args: parsed.append(args) or parser(*args))
+    write_mbox(str(archive_dir / 'big.mbox'), count=20)
+    body = handle({'archive_key': 'big.mbox', 'start': 18})['body']
+    assert [record['message_index'] for record in body['results']] == [18, 19]
+    assert len(parsed) == 2
+
+
+@pytest.mark.parametrize('event', [
+    {'start': ['1']},
+    {'start': 1.5},
+    {'limit': {'n': 1}},
+    {'start': -1},
+    {'offset': 'abc'},
+    {'offset': 5},          # inside the first message
+    {'offset': 10 ** 9},    # past the end
+])
+def test_rejects_bad_paging_parameters(archive_dir, event):
+    assert handle(dict(event, archive_key='inbox.mbox'))['statusCode'] == 400
+
+
+@pytest.mark.parametrize('event', [
+    {'mbox_path': '/etc/passwd'},
+    {'s3_bucket': 'other-bucket', 's3_key': 'secret.txt'},
+    {'archive_key': 'inbox.mbox', 'mbox_path': '/etc/passwd'},
+    {'archive_key': '../secret.txt'},
+    {'archive_key': '/etc/passwd'},
+    {'archive_key': 'nested/../../secret.txt'},
+    {'archive_key': ''},
+    {'archive_key': ['inbox.mbox']},
+])
+def test_rejects_paths_outside_the_archive(archive_dir, event):
+    response = handle(event)
+    assert response['statusCode'] == 400
+    assert 'hunter2' not in repr(response)
+
+
+def test_symlinks_cannot_leave_the_archive(archive_dir):
+    os.symlink(archive_dir.parent / 'secret.txt', archive_dir / 'link.mbox')
+    response = handle({'archive_key': 'link.mbox'})
+    assert response['statusCode'] == 400
+    assert 'hunter2' not in repr(response)
+
+
+def test_unconfigured_archive_is_refused(monkeypatch):
+    monkeypatch.setattr(email_parser, 'ARCHIVE_DIR', '')
+    monkeypatch.setattr(email_parser, 'ARCHIVE_BUCKET', '')
+    assert handle({'archive_key': 'inbox.mbox'})['statusCode'] == 400
+
+
+def test_reads_archives_under_the_configured_bucket_prefix(tmp_path, monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setattr(email_parser, 'ARCHIVE_BUCKET', 'mail-archives')
+    monkeypatch.setattr(email_parser, 'ARCHIVE_PREFIX', 'archives/')
+    path = str(tmp_path / 'inbox.mbox')
+    write_mbox(path)
+    with mock_aws():
+        s3 = boto3.client('s3', region_name='us-east-1')
+        s3.create_bucket(Bucket='mail-archives')
+        with open(path, 'rb') as f:
+            s3.put_object(Bucket='mail-archives', Key='archives/2024/inbox.mbox', Body=f.read())
+        response = handle({'archive_key': '2024/inbox.mbox'})
+        pages = page_through({'archive_key': '2024/inbox.mbox', 'limit': 2}, 3)
+        past_end = handle({'archive_key': '2024/inbox.mbox', 'offset': 10 ** 9})
+    assert response['statusCode'] == 200
+    assert len(response['body']['results']) == 3
+    assert pages == [['sender0@example.com', 'sender1@example.com'], ['sender2@example.com']]
+    assert past_end['statusCode'] == 400
+
+
+@pytest.mark.parametrize('parameters', [
+    {'mbox_path': '/tmp/probe/secret.txt'},
+    {'email_content': 'From: a@example.com', 's3_bucket': 'b', 's3_key': 'k'},
+])
+def test_api_refuses_location_parameters(api, parameters):
+    response = api.post('/tasks/email-parse', json={'task_type': 'email_parse', 'parameters': parameters})
+    assert response.status_code == 400
+    response = api.post('/tasks/email-parse/batch', json={'task_type': 'email_parse', 'records': [parameters]})
+    assert response.status_code == 400
+
+
+class RecordingDispatcher:
+    def __init__(self):
+        self.hedges = []
+
+    async def invoke(self, function_name, event, label=None, hedge=False):
+        self.hedges.append(hedge)
+        return {'statusCode': 200, 'body': {'success': True, 'results': []}}
+
+
+@pytest.mark.parametrize('parameters, calls, hedged', [
+    ({'email_content': 'TODO: reply'}, 1, True),
+    ({'archive_key': 'inbox.mbox'}, 2, False),
+])
+def test_archive_reads_are_neither_cached_nor_hedged(parameters, calls, hedged):
+    registry = default_registry()
+    dispatcher = RecordingDispatcher()
+    pipeline = TaskPipeline(registry, MemoryTaskStore(), ResultCache(cached_tasks=registry.cacheable()),
+                            dispatcher=dispatcher)
+
+    async def twice():
+        for _ in range(2):
+            await pipeline.invoke('email_parse', parameters)
+
+    asyncio.run(twice())
+    assert dispatcher.hedges == [hedged] * calls
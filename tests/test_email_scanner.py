@@ -0,0 +1,76 @@
+import pytest
+from hypothesis import given, settings, strategies as st
+
+from benchmarks import load_lambda
+from benchmarks.data import synthetic_email
+
+parser_module = load_lambda('email-parser')
+scanner = load_lambda('email-parser', 'email_scanner')
+
+# Defaults the per-field extractors return where scan() reports None
+DEFAULTS = {'sender': 'Unknown', 'subject': 'No Subject'}
+
+CORPUS = [
+    '',
+    'no markers at all, just text',
+    'From: alice@example.com\nSubject: Hello\nDate: Mon, 15 Jan 2024 09:00:00 +0000\n\nBody',
+    # Case variants of every marker
+    'FROM: Bob\nsubject: lower\nDATE: today\nATTACHMENTS: a.pdf\nTodo: call\nFOLLOW UP: mail\nAction Items: x',
+    # Repeated keys: headers keep the first, lists keep all
+    'From: first\nFrom: second\nSubject: one\nSubject: two\nTODO: a\nTODO: b\nTODO: a\nAttachment: x\nAttachment: x',
+    # Missing fields and empty values
+    'Subject:\n\nTODO:   \nAttachment:\nFrom:',
+    # Non-ASCII, including a character whose lowercase form is longer
+    'From: Zoë Ünal <zoe@example.com>\nSubject: Résumé für İstanbul\nTODO: prüfen\nAttachment: ünterlagen.pdf',
+    'İİİ From: Şahin\nAction item: çay\nurgent',
+    # Markers inside other words and values that hold other markers
+    'Reply-From: x\nsubjects: y\nAttachment: Attachment: nested.pdf\nTODO: follow up: both\nASAP',
+    'windows line endings\r\nFrom: crlf\r\nSubject: crlf subject\r\nTODO: crlf item\r\n',
+    'action items: one\naction item: two\nattachments: three\nattachment: four',
+    synthetic_email(0.01, urgent=True),
+]
+
+
+def legacy(content):
+    return {
+        'sender': parser_module.extract_sender(content),
+        'subject': parser_module.extract_subject(content),
+        'date': parser_module.extract_date(content),
+        'attachments': parser_module.extract_attachments(content),
+        'action_items': sorted(parser_module.extract_action_items(content)),
+        'priority': parser_module.determine_priority(content),
+    }
+
+
+def scanned(content, expected_date):
+    result = scanner.scan(content)
+    for field, default in DEFAULTS.items():
+        if result[field] is None:
+            result[field] = default
+    if result['date'] is None:
+        # The extractor falls back to the current time
+        result['date'] = expected_date
+    result['action_items'] = sorted(set(result['action_items']))
+    return result
+
+
+def assert_same(content):
+    expected = legacy(content)
+    assert scanned(content, expected['date']) == expected
+
+
+@pytest.mark.parametrize('content', CORPUS)
+def test_scan_matches_the_extractors(content):
+    assert_same(content)
+
+
+FRAGMENTS = st.sampled_from([
+    'From', 'from', 'FROM', 'Subject', 'Date', 'Attachment', 'attachments', 'Action item', 'action items',
+    'TODO', 'todo', 'Follow up', 'follow  up', ':', ': ', '\n', '\r\n', ' ', 'x', 'Zoë', 'İ', 'ß', 'urgent', 'ASAP',
+])
+
+
+@settings(max_examples=300, deadline=None)
+@given(st.lists(FRAGMENTS, max_size=40).map(''.join))
+def test_scan_matches_the_extractors_on_marker_soup(content):
+    assert_same(content)
@@ -0,0 +1,67 @@
+import pytest
+
+from benchmarks import load_lambda
+from benchmarks.data import email_thread
+
+scanner = load_lambda('email-parser', 'email_scanner')
+threads = load_lambda('email-parser', 'email_threads')
+
+HEADERS = 'From: Alex Chen <alex@example.com>\nSubject: Re: Launch\n\n'
+FILLER = '\n'.join(f'Line {n} of the launch notes, nothing to act on here.' for n in range(8))
+
+
+def quote(text):
+    return '\n'.join(f'> {line}' if line else '>' for line in text.split('\n'))
+
+
+def reply(new_text, quoted_body):
+    body = f'{new_text}\n\nOn Mon, Jan 15, 2024, Priya Patel wrote:\n{quote(quoted_body)}'
+    return body, HEADERS + body
+
+
+def full_scan(content):
+    result = scanner.scan(content)
+    result['action_items'] = list(dict.fromkeys(result['action_items']))
+    return result
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    threads.clear()
+    yield
+    threads.clear()
+
+
+def test_normalize_collapses_whitespace_and_drops_quote_markers():
+    assert threads.normalize('> > Ship it\n>   to\tday\r\n') == threads.normalize('Ship it to day')
+    assert threads.normalize('Ship it to day') != threads.normalize('Ship it today')
+    assert threads.normalize('  \n> \n') == b''
+
+
+@pytest.mark.parametrize('outlook', [False, True])
+def test_thread_results_match_full_scans(outlook):
+    messages = email_thread(12, seed=3, outlook=outlook)
+    assert [threads.scan_thread(message) for message in messages] == [full_scan(message) for message in messages]
+    assert threads.stats['hits'] > 0
+
+
+def test_moved_word_boundaries_are_not_reused():
+    original = f'Kickoff notes.\n{FILLER}'
+    first_body, first = reply('Plan below.\nTODO: ship the fix to day', original)
+    second_body, second = reply('Plan below.\nTODO: ship the fix today', original)
+    threads.scan_thread(first)
+    # Replies to the two messages quote text that differs only in a space
+    for body in (first_body, second_body):
+        _, content = reply('Thanks.', body)
+        assert threads.scan_thread(content) == full_scan(content)
+
+
+def test_rewrapped_history_is_reused():
+    original = f'Kickoff notes.\n{FILLER}'
+    body, content = reply('Plan below.\nTODO: ship the fix today', original)
+    threads.scan_thread(content)
+    # A client re-wraps the quoted history: different line breaks, same words
+    _, answer = reply('Thanks.', body.replace('nothing to act', 'nothing\nto  act'))
+    hits = threads.stats['hits']
+    threads.scan_thread(answer)
+    assert threads.stats['hits'] == hits + 1
@@ -0,0 +1,58 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+import time
+
+import pytest
+
+from benchmarks import load_lambda
+
+invoice_engine = load_lambda('invoice-generator', 'invoice_engine')
+
+needs_numpy = pytest.mark.skipif(invoice_engine.load_numpy() is None, reason='needs numpy')
+
+
+def decimal_cents(quantity, price):
+    total = Decimal(repr(quantity)) * Decimal(repr(price)) * 100
+    return int(total.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+@needs_numpy
+@pytest.mark.parametrize('quantity, price', [
+    (5_000_000, 1000.5),    # fixed-point product 5.0025e18, past 2**62
+    (8_999_999, 1000.0),    # just under MAX_VECTOR_PRODUCT
+    (4_611_686, 1000.005),  # half a cent on a product near 2**62
+])
+def test_vector_totals_match_decimal_near_the_int64_bound(quantity, price):
+    engine = invoice_engine.InvoiceEngine()
+    items = [{'description': 'usage', 'quantity': quantity, 'price': price}] * invoice_engine.VECTOR_MIN_ITEMS
+    cents = engine._vector_cents(items)
+    assert cents is not None
+    assert set(cents) == {decimal_cents(quantity, price)}
+    assert cents == [engine.line_cents(item) for item in items[:1]] * len(items)
+
+
+@needs_numpy
+def test_reported_invoice_totals():
+    engine = invoice_engine.InvoiceEngine()
+    items = [{'description': 'usage', 'quantity': 5_000_000, 'price': 1000.5}] * 4096
+    cents = engine.line_totals(items)
+    assert cents[0] == 500250000000
+    assert sum(cents) == 4096 * 500250000000
+
+
+@pytest.mark.parametrize('amount', ['1e10000000', '1e30000000', '1e-3000000', '-1e999999', 1e308, 10 ** 40,
+                                    '1000000000000000000'])
+def test_out_of_range_amounts_fail_fast(amount):
+    engine = invoice_engine.InvoiceEngine()
+    started = time.perf_counter()
+    with pytest.raises(ValueError):
+        engine.line_cents({'description': 'huge', 'quantity': 1, 'price': amount})
+    with pytest.raises(ValueError):
+        engine.line_cents({'description': 'huge', 'quantity': amount, 'price': 1})
+    assert time.perf_counter() - started < 0.1
+
+
+def test_amounts_within_range_still_total():
+    engine = invoice_engine.InvoiceEngine()
+    assert engine.line_cents({'quantity': '999999999999999999', 'price': '0.01'}) == 999999999999999999
+    assert engine.line_cents({'quantity': 1, 'price': '1e-30'}) == 0
@@ -0,0 +1,46 @@
+import json
+
+import invoice_export
+from local_engine import load_handler
+
+CLIENT = {'name': 'Acme', 'email': 'billing@acme.example'}
+
+
+def invoice(price):
+    return {'client_info': CLIENT, 'items': [{'description': 'usage', 'quantity': 1, 'price': price}]}
+
+
+def export_records(api, invoices):
+    response = api.post('/invoices/export?format=ndjson', json={'invoices': invoices})
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_amounts_too_large_to_total_are_reported_inline(api):
+    records = export_records(api, [invoice(10), {'client_info': CLIENT, 'items': [
+        {'description': 'huge', 'quantity': 1e308, 'price': 1e308}]}, invoice(20)])
+    assert [record['type'] for record in records if record['type'] in ('summary', 'error')] == \
+        ['summary', 'error', 'summary']
+
+
+def test_arithmetic_errors_do_not_end_the_export(monkeypatch):
+    engine = load_handler('invoice-generator').InvoiceEngine
+    summary = engine.summary
+
+    def overflowing(self, client_info, subtotal, item_count):
+        if subtotal > 1000:
+            raise OverflowError('int too large to convert to float')
+        return summary(self, client_info, subtotal, item_count)
+
+    monkeypatch.setattr(engine, 'summary', overflowing)
+    stats = {}
+    output = b''.join(invoice_export.render_invoices([invoice(20), invoice(20), invoice(5)], 'ndjson', stats))
+    records = [json.loads(line) for line in output.splitlines()]
+    assert [record['index'] for record in records if record['type'] == 'error'] == [0, 1]
+    assert stats['invoices'] == 1 and stats['failed'] == 2
+
+
+def test_exports_above_the_item_cap_are_refused(api, monkeypatch):
+    monkeypatch.setattr(invoice_export, 'MAX_ITEMS', 2)
+    response = api.post('/invoices/export?format=ndjson', json={'invoices': [invoice(1)] * 3})
+    assert response.status_code == 413
@@ -0,0 +1,117 @@
+import json
+import logging
+
+from hypothesis import given, settings, strategies as st
+
+from benchmarks import load_lambda
+from lead_index import LeadIndex
+
+scorer = load_lambda('lead-scorer')
+columnar = load_lambda('lead-scorer', 'lead_columnar')
+lead_rules = load_lambda('lead-scorer', 'lead_rules')
+
+RULES = lead_rules.get_rules()
+
+# What JSON can carry for each field, weighted towards values the rules
+# distinguish: tier thresholds and their neighbours, known industries and
+# engagement levels in any case and padding
+thresholds = sorted(set(RULES.size_thresholds) | set(RULES.budget_thresholds))
+numbers = st.one_of(
+    st.sampled_from(thresholds).flatmap(lambda t: st.sampled_from([t - 1, t, t + 1, t - 0.5, t + 0.5])),
+    st.integers(min_value=-10, max_value=10 ** 7),
+    st.floats(allow_nan=True, allow_infinity=True),
+    st.integers(min_value=2 ** 62, max_value=2 ** 70),
+)
+words = st.sampled_from(sorted(RULES.high_value_industries) + list(RULES.engagement_points) + ['retail', ''])
+texts = st.one_of(words, words.map(str.upper), words.map(lambda w: f"  {w.title()} "), st.text(max_size=8))
+values = st.one_of(numbers, texts, numbers.map(str), st.booleans(), st.none(), st.lists(st.integers(), max_size=2))
+lead_data = st.one_of(
+    st.fixed_dictionaries({}, optional={
+        'company_size': values,
+        'industry': values,
+        'budget': values,
+        'engagement_level': values,
+        'is_decision_maker': values,
+    }),
+    st.integers(),
+    st.lists(st.integers(), max_size=2),
+)
+
+
+def scalar_result(lead, include_factors):
+    try:
+        lead_score = scorer.calculate_lead_score(lead)
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}
+    if not include_factors:
+        del lead_score['factors']
+    return {'success': True, 'lead_score': lead_score}
+
+
+def same(a, b):
+    # NaN budgets are echoed back and never compare equal to themselves
+    return repr(a) == repr(b)
+
+
+def setup_module():
+    logging.disable(logging.CRITICAL)  # scalar scoring logs every rejected lead
+
+
+def teardown_module():
+    logging.disable(logging.NOTSET)
+
+
+@settings(max_examples=300, deadline=None)
+@given(st.lists(lead_data, min_size=1, max_size=40), st.booleans())
+def test_columnar_matches_scalar(leads, include_factors):
+    actual = columnar.score_leads(leads, include_factors=include_factors)
+    expected = [scalar_result(lead, include_factors) for lead in leads]
+    for lead, a, e in zip(leads, actual, expected):
+        assert same(a, e), (lead, a, e)
+
+
+@settings(max_examples=100, deadline=None)
+@given(st.lists(lead_data, min_size=1, max_size=40))
+def test_array_fallback_matches_numpy(leads):
+    with_numpy = columnar.score_leads(leads)
+    numpy, columnar.np = columnar.np, None
+    try:
+        without = columnar.score_leads(leads)
+    finally:
+        columnar.np = numpy
+    assert same(with_numpy, without)
+
+
+def test_factor_lists_are_not_shared():
+    lead = {'company_size': 600, 'industry': 'technology', 'budget': 60000, 'is_decision_maker': True}
+    first, second = columnar.score_leads([lead, dict(lead)])
+    assert first['lead_score']['factors'] == second['lead_score']['factors']
+    assert first['lead_score']['factors'] is not second['lead_score']['factors']
+
+
+def changed_rules():
+    with open(lead_rules.RULES_PATH) as f:
+        data = json.load(f)
+    data['version'] = 'test-changed'
+    data['company_size']['tiers'][0]['above'] += 1
+    data['industry']['high_value'] = data['industry']['high_value'][1:] + ['retail']
+    data['decision_maker']['points'] = data['decision_maker'].get('points', 0) + 5
+    return lead_rules.compile_rules(data)
+
+
+@settings(max_examples=100, deadline=None)
+@given(st.lists(st.tuples(st.sampled_from('abcde'), lead_data), min_size=1, max_size=40))
+def test_lead_index_scores_like_the_scorer(leads):
+    index = LeadIndex(RULES)
+    index.upsert_many(leads)
+    # Rejected updates leave a lead's previous valid data in place
+    latest = {}
+    for lead_id, data in leads:
+        if scalar_result(data, False)['success']:
+            latest[lead_id] = data
+    for rules in (RULES, changed_rules()):
+        if rules is not RULES:
+            index.rescore(rules)
+        for lead_id, data in latest.items():
+            assert index.get(lead_id)['score'] == scorer.calculate_lead_score(data, rules)['score'], (lead_id, data)
+        assert sum(index.score_counts.values()) == len(index) == len(latest)
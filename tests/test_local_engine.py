@@ -0,0 +1,56 @@
+import asyncio
+import time
+import types
+
+import pytest
+from fastapi import HTTPException
+
+import local_engine
+from dispatcher import DispatchTimeout
+from local_engine import LocalEngine, TaskRouter
+from pipeline import TaskPipeline
+from result_cache import ResultCache
+from task_registry import TaskRegistry, TaskType
+from task_store import MemoryTaskStore
+
+
+@pytest.fixture
+def slow_handler(monkeypatch):
+    """A handler directory that sleeps for event['sleep'] seconds."""
+    def lambda_handler(event, context):
+        time.sleep(event.get('sleep', 0))
+        return {'statusCode': 200, 'body': {'success': True}}
+
+    monkeypatch.setitem(local_engine._handlers, 'slow-handler',
+                        types.SimpleNamespace(lambda_handler=lambda_handler))
+    return 'slow-handler'
+
+
+@pytest.fixture
+def engine():
+    engine = LocalEngine(mode='thread', workers=2, timeout=0.1)
+    engine.start()
+    yield engine
+    engine.shutdown()
+
+
+def test_local_calls_within_the_timeout_return(engine, slow_handler):
+    response = asyncio.run(engine.invoke(slow_handler, {'sleep': 0}))
+    assert response['body'] == {'success': True}
+
+
+def test_local_calls_past_the_timeout_raise_dispatch_timeout(engine, slow_handler):
+    started = time.perf_counter()
+    with pytest.raises(DispatchTimeout):
+        asyncio.run(engine.invoke(slow_handler, {'sleep': 0.5}))
+    assert time.perf_counter() - started < 0.4
+
+
+def test_local_timeouts_map_to_504(engine, slow_handler):
+    registry = TaskRegistry()
+    task = registry.register(TaskType('slow', 'slow', local=slow_handler))
+    pipeline = TaskPipeline(registry, MemoryTaskStore(), ResultCache(cached_tasks=()),
+                            local_engine=engine, router=TaskRouter(default='local'))
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(pipeline.run(task, {'sleep': 0.5}))
+    assert raised.value.status_code == 504
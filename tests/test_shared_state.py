@@ -0,0 +1,119 @@
+import time
+
+import pytest
+
+import serve
+from lead_index import LeadIndex, LeadIndexServer, SharedLeadIndex
+from shared_store import SharedTaskStore, TaskStoreServer
+from task_store import MemoryTaskStore
+
+LEAD = {'company_size': 500, 'budget': 50000, 'industry': 'technology',
+        'engagement_level': 'high', 'decision_maker': True}
+
+
+@pytest.fixture
+def lead_server():
+    server = LeadIndexServer(LeadIndex())
+    server.start()
+    yield server
+    server.close()
+
+
+def connect(server, cls):
+    return cls(server.address, server.authkey)
+
+
+def test_workers_share_one_lead_index(lead_server):
+    first, second = connect(lead_server, SharedLeadIndex), connect(lead_server, SharedLeadIndex)
+    try:
+        first.observe([{'lead_id': 'acme', 'lead_data': LEAD}, {'lead_id': 'failed', 'lead_data': LEAD}],
+                      [{'success': True}, {'success': False}])
+        # Scored through one worker, queried through another
+        assert len(second) == 1
+        assert second.get('acme')['lead_id'] == 'acme'
+        assert [lead['lead_id'] for lead in second.top(10)] == ['acme']
+        assert second.stats()['leads'] == 1
+        assert second.rules_version == lead_server.target.rules.version
+        assert second.refresh() is None
+    finally:
+        first.close()
+        second.close()
+
+
+def test_bad_lead_queries_raise_value_error(lead_server):
+    index = connect(lead_server, SharedLeadIndex)
+    try:
+        with pytest.raises(ValueError):
+            index.top(10, quality='lukewarm')
+    finally:
+        index.close()
+
+
+def test_lead_server_refuses_other_methods(lead_server):
+    index = connect(lead_server, SharedLeadIndex)
+    try:
+        with pytest.raises(RuntimeError):
+            index._call('upsert_many', [])
+    finally:
+        index.close()
+
+
+def test_task_store_changes_reach_other_workers():
+    server = TaskStoreServer(MemoryTaskStore())
+    server.start()
+    first, second = connect(server, SharedTaskStore), connect(server, SharedTaskStore)
+    changes = []
+    try:
+        second.watch(lambda task_id, task_type, fields: changes.append((task_id, fields.get('status'))))
+        time.sleep(0.05)
+        first.put({'task_id': 'lead_1', 'task_type': 'lead_score', 'status': 'queued',
+                   'timestamp': '2024-01-15T08:00:00+00:00'})
+        first.update('lead_1', {'status': 'completed'})
+        assert second.get('lead_1')['status'] == 'completed'
+        deadline = time.monotonic() + 2
+        while len(changes) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert changes == [('lead_1', 'queued'), ('lead_1', 'completed')]
+    finally:
+        first.close()
+        second.close()
+        server.close()
+
+
+@pytest.mark.parametrize('backend, shared', [(None, True), ('memory', True), ('dynamodb', False)])
+def test_launcher_shares_memory_stores_and_passes_dynamodb_through(monkeypatch, backend, shared):
+    if backend is None:
+        monkeypatch.delenv('TASK_STORE', raising=False)
+    else:
+        monkeypatch.setenv('TASK_STORE', backend)
+    store = serve.task_store_server()
+    if store is not None:
+        store.start()
+    try:
+        env = serve.Supervisor(None, store, 2, {})._worker_env(1)
+    finally:
+        if store is not None:
+            store.close()
+    assert (env.get('TASK_STORE') == 'shared') is shared
+    assert ('TASK_STORE_ADDRESS' in env) is shared
+    # Workers inherit the launcher's environment, so dynamodb reaches them as set
+    assert env.get('TASK_STORE', backend or 'memory') in ('shared', 'dynamodb')
+
+
+def test_launcher_refuses_unknown_task_stores(monkeypatch):
+    monkeypatch.setenv('TASK_STORE', 'redis')
+    with pytest.raises(ValueError):
+        serve.task_store_server()
+
+
+def test_rescore_runs_in_the_background(api):
+    scored = api.post('/tasks/lead-score', json={'task_type': 'lead_score',
+                                                  'parameters': {'lead_id': 'rescored', 'lead_data': LEAD}})
+    assert scored.status_code == 200
+    response = api.post('/leads/rescore')
+    assert response.status_code == 202
+    task = api.get(f"/tasks/{response.json()['task_id']}", params={'wait': 5}).json()
+    assert task['status'] == 'completed'
+    assert task['result']['rules_version'] == api.get('/leads/stats').json()['rules_version']
+    assert api.get('/leads/rescored').json()['lead_id'] == 'rescored'
+    assert 'rescored' in [lead['lead_id'] for lead in api.get('/leads/top').json()['leads']]
@@ -0,0 +1,38 @@
+import random
+import sys
+import threading
+
+import task_ids
+
+
+def test_encode_round_trips_across_threads():
+    # Every thread encodes values from its own millisecond, so a prefix
+    # cached for one thread and used by another would not decode back
+    errors = []
+
+    def encode_many(ms):
+        rng = random.Random(ms)
+        for _ in range(20000):
+            value = (ms << task_ids.TIME_SHIFT) | rng.getrandbits(task_ids.TIME_SHIFT)
+            if task_ids.decode(task_ids.encode(value)) != value:
+                errors.append(value)
+                return
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    threads = [threading.Thread(target=encode_many, args=(1_700_000_000_000 + offset,)) for offset in range(8)]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
+
+
+def test_generated_ids_increase():
+    generator = task_ids.TaskIdGenerator(worker_id=1)
+    ids = [generator.new_id('t') for _ in range(1000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+import task_ids
+from task_store import MemoryTaskStore, parse_cursor
+
+
+def record(task_type='lead_score', status='queued'):
+    return {'task_id': task_ids.new_task_id('task'), 'task_type': task_type, 'status': status,
+            'created_at': time.time()}
+
+
+def listed_ids(store, **filters):
+    page, _ = store.list(**filters)
+    return [task['task_id'] for task in page]
+
+
+def test_put_again_lists_task_once():
+    store = MemoryTaskStore()
+    task = record()
+    store.put(task)
+    store.put(dict(task))
+    assert listed_ids(store) == [task['task_id']]
+    store.update(task['task_id'], {'status': 'completed'})
+    assert listed_ids(store) == [task['task_id']]
+    assert listed_ids(store, status='completed') == [task['task_id']]
+    assert listed_ids(store, status='queued') == []
+    assert listed_ids(store, task_type='lead_score') == [task['task_id']]
+
+
+def test_put_again_with_new_status_moves_index():
+    store = MemoryTaskStore()
+    task = record()
+    store.put(task)
+    store.put(dict(task, status='completed'))
+    store.update(task['task_id'], {'status': 'queued'})
+    assert listed_ids(store, status='queued') == [task['task_id']]
+    assert listed_ids(store) == [task['task_id']]
+    assert store.stats()['by_status'] == {'queued': 1}
+
+
+def test_evicted_task_put_again_lists_once():
+    store = MemoryTaskStore(max_tasks=100)
+    tasks = [record() for _ in range(150)]
+    for task in tasks:
+        store.put(task)
+    # The first 50 were evicted; loading them back (as DynamoTaskStore.get
+    # does on a cache miss) keeps their creation keys
+    store.max_tasks = 1000
+    for task in tasks[:50]:
+        store.put(dict(task))
+    ids = listed_ids(store, limit=1000)
+    assert sorted(ids) == sorted(task['task_id'] for task in tasks)
+    assert len(ids) == len(set(ids))
+
+
+def test_pages_do_not_repeat():
+    store = MemoryTaskStore()
+    tasks = [record(status='completed' if number % 2 else 'queued') for number in range(30)]
+    for task in tasks:
+        store.put(task)
+    for task in tasks[::3]:
+        store.put(dict(task))
+    seen, cursor = [], None
+    while True:
+        page, cursor = store.list(limit=7, cursor=cursor)
+        seen.extend(task['task_id'] for task in page)
+        if cursor is None:
+            break
+    assert seen == [task['task_id'] for task in reversed(tasks)]
+
+
+@pytest.mark.parametrize('cursor', ['abc', '-1', '1.5', ' 12'])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        parse_cursor(cursor)
+    with pytest.raises(ValueError):
+        MemoryTaskStore().list(cursor=cursor)
+
+
+def test_invalid_cursor_is_a_bad_request(api):
+    response = api.get('/tasks', params={'cursor': 'abc'})
+    assert response.status_code == 400